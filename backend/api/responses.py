@@ -1,6 +1,10 @@
-from typing import Any
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any, override
 
 from fastapi import status
+from fastapi.responses import ORJSONResponse
+import orjson
 
 from schemas.errors import MessageError
 
@@ -29,3 +33,37 @@ NOT_FOUND: _Response = {
         'model': MessageError,
     },
 }
+
+SERVICE_UNAVAILABLE: _Response = {
+    status.HTTP_503_SERVICE_UNAVAILABLE: {
+        'model': MessageError,
+    },
+}
+
+
+class RowsResponse(ORJSONResponse):
+    """Serializes database rows as they are.
+
+    Endpoints return it to skip the response model validation, so the rows
+    must already be shaped like the documented model. Values are encoded
+    the same way pydantic does: decimals as strings, UTC datetimes with Z.
+    """
+
+    @override
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_encode_row_value,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+def _encode_row_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+
+    # sqlalchemy row mappings
+    if isinstance(value, Mapping):
+        return dict(value)
+
+    raise TypeError
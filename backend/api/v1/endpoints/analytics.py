@@ -1,19 +1,103 @@
-from typing import Annotated
+from datetime import date
+from typing import Annotated, Self
 
 from fastapi import APIRouter
 from fastapi.params import Query
+from pydantic import BaseModel, Field, model_validator
 
-from api.responses import UNAUTHORIZED
+from api.responses import (
+    FORBIDDEN,
+    RowsResponse,
+    SERVICE_UNAVAILABLE,
+    UNAUTHORIZED,
+)
 from dependencies.db import Session
-from dependencies.users import CurrentUser
-from schemas.analytics import DynamicsByInterval, Interval, StartEnd
-from services.analytics.analytics import DynamicsByIntervalService
+from dependencies.users import AdminUser, CurrentUser
+from schemas.analytics import (
+    AccountBalance,
+    Accuracy,
+    AmountDistributions,
+    AnalyticsDashboard,
+    AnalyticsParams,
+    BalanceSeries,
+    Comparison,
+    DynamicsByInterval,
+    DynamicsByIntervalSeries,
+    DynamicsComparison,
+    Interval,
+    MAX_DATETIME,
+    MIN_DATETIME,
+    SplitBy,
+    StartEnd,
+)
+from services.analytics.admin import (
+    AllUsersDashboardService,
+    AllUsersDynamicsByIntervalService,
+)
+from services.analytics.analytics import (
+    AmountDistributionService,
+    DashboardService,
+    DynamicsByIntervalService,
+    MAX_BINS,
+)
+from services.analytics.balances import BalanceService
+from services.analytics.downsampling import MIN_POINTS
 
 router = APIRouter()
 
 
-class QueryParams(StartEnd):
+class IntervalParams(AnalyticsParams):
     interval: Interval
+    # the width of day buckets in days
+    step: int = Field(default=1, ge=1, le=366)
+
+    @model_validator(mode='after')
+    def check_step(self) -> Self:
+        if self.step != 1 and self.interval is not Interval.DAY:
+            raise ValueError('only day buckets can be stepped')
+
+        return self
+
+
+class QueryParams(IntervalParams):
+    # long ranges are downsampled to at most this many intervals
+    max_points: int | None = Field(default=None, ge=MIN_POINTS)
+
+
+class AllUsersDynamicsQueryParams(QueryParams):
+    accuracy: Accuracy = Accuracy.EXACT
+    # the percent of the table pages approximate counts are estimated from,
+    # the pages of a single user's data are too few to sample
+    sample_percent: float = Field(default=1, gt=0, le=100)
+
+    def sampling(self) -> float | None:
+        if self.accuracy is Accuracy.APPROXIMATE:
+            return self.sample_percent
+        return None
+
+
+class SeriesQueryParams(QueryParams):
+    split_by: list[SplitBy] = Field(default_factory=list)
+
+
+class ComparisonQueryParams(IntervalParams):
+    compare_to: Comparison = Comparison.PREVIOUS_PERIOD
+
+
+class BalanceParams(BaseModel):
+    account_number: str
+    date: Annotated[date, Field(ge=MIN_DATETIME, le=MAX_DATETIME)]
+
+
+class BalanceSeriesParams(StartEnd):
+    account_number: str
+    interval: Interval
+
+
+class DistributionQueryParams(AnalyticsParams):
+    split_by: list[SplitBy] = Field(default_factory=list)
+    # chosen by the number of amounts by default
+    bins: int | None = Field(default=None, ge=1, le=MAX_BINS)
 
 
 @router.get(
@@ -30,4 +114,165 @@ async def dynamics_by_interval(
         start=params.start,
         end=params.end,
         interval=params.interval,
+        filters=params.filters(),
+        step=params.step,
+        max_points=params.max_points,
+    )
+
+
+@router.get(
+    path='/dynamics_by_interval/series',
+    responses=UNAUTHORIZED,
+)
+async def dynamics_by_interval_series(
+    session: Session,
+    user: CurrentUser,
+    params: Annotated[SeriesQueryParams, Query()],
+) -> DynamicsByIntervalSeries:
+    """Counts and amount sums per interval, one series for every
+    combination of the split_by values."""
+    service = DynamicsByIntervalService(session, user)
+    return await service.series(
+        start=params.start,
+        end=params.end,
+        interval=params.interval,
+        split_by=params.split_by,
+        filters=params.filters(),
+        step=params.step,
+        max_points=params.max_points,
+    )
+
+
+@router.get(
+    path='/dynamics_by_interval/comparison',
+    responses=UNAUTHORIZED,
+)
+async def dynamics_by_interval_comparison(
+    session: Session,
+    user: CurrentUser,
+    params: Annotated[ComparisonQueryParams, Query()],
+) -> DynamicsComparison:
+    """Counts and amount sums per interval next to the ones
+    of the previous interval or of the same interval a year before."""
+    service = DynamicsByIntervalService(session, user)
+    return await service.compare(
+        start=params.start,
+        end=params.end,
+        interval=params.interval,
+        compare_to=params.compare_to,
+        filters=params.filters(),
+        step=params.step,
+    )
+
+
+@router.get(
+    path='/dashboard',
+    responses=UNAUTHORIZED,
+)
+async def dashboard(
+    session: Session,
+    user: CurrentUser,
+    params: Annotated[AnalyticsParams, Query()],
+) -> AnalyticsDashboard:
+    service = DashboardService(session, user)
+    return await service.get(
+        start=params.start,
+        end=params.end,
+        filters=params.filters(),
+    )
+
+
+@router.get(
+    path='/distribution',
+    responses=UNAUTHORIZED,
+    response_model=AmountDistributions,
+)
+async def amount_distribution(
+    session: Session,
+    user: CurrentUser,
+    params: Annotated[DistributionQueryParams, Query()],
+) -> RowsResponse:
+    """Histograms and percentiles of the amounts, one for every
+    combination of the split_by values."""
+    service = AmountDistributionService(session, user)
+    distributions = await service.get(
+        start=params.start,
+        end=params.end,
+        split_by=params.split_by,
+        filters=params.filters(),
+        bins=params.bins,
+    )
+    return RowsResponse(distributions)
+
+
+@router.get(
+    path='/balance',
+    responses=UNAUTHORIZED,
+)
+async def balance(
+    session: Session,
+    user: CurrentUser,
+    params: Annotated[BalanceParams, Query()],
+) -> AccountBalance:
+    """The balance of the account at the end of the day."""
+    service = BalanceService(session, user)
+    return await service.at(params.account_number, params.date)
+
+
+@router.get(
+    path='/balance/series',
+    responses=UNAUTHORIZED,
+)
+async def balance_series(
+    session: Session,
+    user: CurrentUser,
+    params: Annotated[BalanceSeriesParams, Query()],
+) -> BalanceSeries:
+    """The balances of the account at the end of every interval."""
+    service = BalanceService(session, user)
+    return await service.series(
+        account_number=params.account_number,
+        start=params.start,
+        end=params.end,
+        interval=params.interval,
+    )
+
+
+@router.get(
+    path='/admin/dynamics_by_interval',
+    responses=UNAUTHORIZED | FORBIDDEN | SERVICE_UNAVAILABLE,
+)
+async def all_users_dynamics_by_interval(
+    session: Session,
+    user: AdminUser,
+    params: Annotated[AllUsersDynamicsQueryParams, Query()],
+) -> DynamicsByInterval:
+    """The dynamics of the transactions of all users."""
+    service = AllUsersDynamicsByIntervalService(session, user)
+    return await service.get(
+        start=params.start,
+        end=params.end,
+        interval=params.interval,
+        filters=params.filters(),
+        step=params.step,
+        max_points=params.max_points,
+        sample_percent=params.sampling(),
+    )
+
+
+@router.get(
+    path='/admin/dashboard',
+    responses=UNAUTHORIZED | FORBIDDEN | SERVICE_UNAVAILABLE,
+)
+async def all_users_dashboard(
+    session: Session,
+    user: AdminUser,
+    params: Annotated[AnalyticsParams, Query()],
+) -> AnalyticsDashboard:
+    """The dashboard of the transactions of all users."""
+    service = AllUsersDashboardService(session, user)
+    return await service.get(
+        start=params.start,
+        end=params.end,
+        filters=params.filters(),
     )
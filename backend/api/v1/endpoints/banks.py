@@ -1,9 +1,13 @@
-from collections.abc import Sequence
-
 from fastapi import APIRouter, status
 
 from api.params import EntityID
-from api.responses import BAD_REQUEST, FORBIDDEN, NOT_FOUND, UNAUTHORIZED
+from api.responses import (
+    BAD_REQUEST,
+    FORBIDDEN,
+    NOT_FOUND,
+    RowsResponse,
+    UNAUTHORIZED,
+)
 from dependencies.db import Session
 from dependencies.users import admin_token_dependency
 from models.bank import Bank
@@ -64,5 +68,8 @@ async def delete_bank(
     responses=UNAUTHORIZED | FORBIDDEN,
     response_model=list[BankOutShort],
 )
-async def all_banks(session: Session) -> Sequence[Bank]:
-    return await BankService(session).list()
+async def all_banks(session: Session) -> RowsResponse:
+    rows = await BankService(session).list_rows(
+        columns=list(BankOutShort.model_fields),
+    )
+    return RowsResponse(rows)
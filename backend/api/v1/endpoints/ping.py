@@ -8,8 +8,11 @@ from sqlalchemy.ext.asyncio import AsyncEngine
 
 from api.responses import FORBIDDEN, UNAUTHORIZED
 from core.logging import logger
+from db.prepared import statements
 from dependencies.db import Session
 from dependencies.users import AdminUser
+from services.analytics.cache import analytics_cache
+from services.analytics.cube import analytics_cubes
 
 router = APIRouter()
 
@@ -24,6 +27,31 @@ class PingExpanded(Ping):
     server_time: datetime
 
 
+class PreparedStatementStats(BaseModel):
+    prepares: int
+    prepare_seconds: float
+    calls: int
+    seconds: float
+
+
+class ResultCacheStats(BaseModel):
+    hits: int
+    misses: int
+    entries: int
+
+
+class CubeCacheStats(BaseModel):
+    hits: int
+    misses: int
+    cubes: int
+    size: int
+
+
+class AnalyticsCacheStats(BaseModel):
+    results: ResultCacheStats
+    cubes: CubeCacheStats
+
+
 @router.get('')
 async def ping() -> Ping:
     logger.info('ping')
@@ -41,3 +69,31 @@ async def ping_extra(session: Session, user: AdminUser) -> PingExpanded:
         current_user=user.username,
         server_time=datetime.now(timezone.utc),
     )
+
+
+@router.get(
+    path='/statements',
+    responses=UNAUTHORIZED | FORBIDDEN,
+)
+async def prepared_statements(
+    user: AdminUser,
+) -> dict[str, PreparedStatementStats]:
+    """The timings of the prepared statements collected by this process:
+    of preparing them on the new connections and of executing them."""
+    return {
+        name: PreparedStatementStats(**stats._asdict())
+        for name, stats in statements.stats().items()
+    }
+
+
+@router.get(
+    path='/caches',
+    responses=UNAUTHORIZED | FORBIDDEN,
+)
+async def analytics_caches(user: AdminUser) -> AnalyticsCacheStats:
+    """The hits and misses of the analytics caches of this process:
+    of the cached results and of the cubes."""
+    return AnalyticsCacheStats(
+        results=ResultCacheStats(**analytics_cache.stats()._asdict()),
+        cubes=CubeCacheStats(**analytics_cubes.stats()._asdict()),
+    )
@@ -1,23 +1,41 @@
-from collections.abc import Sequence
 from typing import Annotated
 
-from fastapi import APIRouter, Query, status
+from fastapi import APIRouter, status
 from fastapi.params import Depends
 
 from api.params import EntityID
-from api.responses import BAD_REQUEST, FORBIDDEN, NOT_FOUND, UNAUTHORIZED
+from api.responses import (
+    BAD_REQUEST,
+    FORBIDDEN,
+    NOT_FOUND,
+    RowsResponse,
+    UNAUTHORIZED,
+)
 from dependencies.db import Session
-from dependencies.params import order_by_dependency, OrderByItem
+from dependencies.params import (
+    fields_dependency,
+    get_pagination,
+    order_by_dependency,
+    OrderByItem,
+    PaginationParams,
+)
 from dependencies.users import AdminUser, CurrentUser
 from models.transaction import Transaction, TransactionCategory
 from schemas.common import SequenceResponse
 from schemas.transactions import (
+    TransactionBatchCreate,
+    TransactionBatchResult,
+    TransactionBulkDelete,
+    TransactionBulkResult,
+    TransactionBulkStatusUpdate,
     TransactionCategoryCreate,
     TransactionCategoryOut,
     TransactionCategoryOutShort,
     TransactionCategoryUpdate,
     TransactionCreate,
+    TransactionFilters,
     TransactionOut,
+    TransactionOutSparse,
     TransactionUpdate,
 )
 from services.transactions import (
@@ -36,23 +54,36 @@ _OrderBy = Depends(
 )
 
 
+_Fields = Depends(fields_dependency(TransactionOut.model_fields))
+
+
 @router.get(
     path='',
     responses=UNAUTHORIZED | BAD_REQUEST,
-    response_model=SequenceResponse[TransactionOut],
+    response_model=SequenceResponse[TransactionOutSparse],
 )
-async def my_transactions(
+async def my_transactions(  # noqa: PLR0913
     user: CurrentUser,
     session: Session,
     order_by: Annotated[list[OrderByItem], _OrderBy],
-    offset: Annotated[int, Query(ge=0)] = 0,
-    limit: Annotated[int, Query(gt=0, lt=100)] = 10,
-) -> SequenceResponse[Transaction]:
-    return await TransactionService(session, user).user_transactions(
+    pagination: Annotated[PaginationParams, Depends(get_pagination)],
+    filters: Annotated[TransactionFilters, Depends()],
+    fields: Annotated[list[str] | None, _Fields],
+) -> RowsResponse:
+    """
+    Lists the transactions of the current user.
+
+    `fields` limits the response to the given fields (the id is always
+    returned) and only these columns are read from the database.
+    Without it every field of `TransactionOut` is returned.
+    """
+    page = await TransactionService(session, user).user_transactions(
+        fields or list(TransactionOut.model_fields),
         order_by=order_by,
-        offset=offset,
-        limit=limit,
+        pagination=pagination,
+        filters=filters,
     )
+    return RowsResponse(dict(page))
 
 
 @router.post(
@@ -71,6 +102,47 @@ async def create_transaction(
     )
 
 
+@router.post(
+    path='/batch',
+    responses=UNAUTHORIZED | BAD_REQUEST,
+)
+async def create_transactions(
+    user: CurrentUser,
+    session: Session,
+    batch: TransactionBatchCreate,
+) -> TransactionBatchResult:
+    return await TransactionService(session, user).create_transactions(
+        batch.items,
+    )
+
+
+@router.post(
+    path='/batch/delete',
+    responses=UNAUTHORIZED | BAD_REQUEST,
+)
+async def delete_transactions(
+    user: CurrentUser,
+    session: Session,
+    batch: TransactionBulkDelete,
+) -> TransactionBulkResult:
+    return await TransactionService(session, user).delete_transactions(
+        batch.ids,
+    )
+
+
+@router.post(
+    path='/batch/status',
+    responses=UNAUTHORIZED | BAD_REQUEST,
+)
+async def update_transactions_status(
+    user: CurrentUser,
+    session: Session,
+    batch: TransactionBulkStatusUpdate,
+) -> TransactionBulkResult:
+    service = TransactionService(session, user)
+    return await service.update_transactions_status(batch.ids, batch.status)
+
+
 @router.patch(
     path='/{transaction_id}',
     responses=UNAUTHORIZED | FORBIDDEN | BAD_REQUEST | NOT_FOUND,
@@ -141,5 +213,8 @@ async def delete_category(
     responses=UNAUTHORIZED | FORBIDDEN,
     response_model=list[TransactionCategoryOutShort],
 )
-async def all_categories(session: Session) -> Sequence[TransactionCategory]:
-    return await TransactionCategoryService(session).list()
+async def all_categories(session: Session) -> RowsResponse:
+    rows = await TransactionCategoryService(session).list_rows(
+        columns=list(TransactionCategoryOutShort.model_fields),
+    )
+    return RowsResponse(rows)
@@ -13,6 +13,14 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    ADMIN_ANALYTICS_STATEMENT_TIMEOUT_MS: int = 10_000
+    # the memory the in-process analytics cubes may take, 0 turns them off
+    ANALYTICS_CUBE_MEMORY_BYTES: int = 0
+    # where the columnar replica of the transactions is exported to
+    ANALYTICS_REPLICA_DIR: Path = BASE_DIR / '.replica'
+    # how old the replica may be to serve the reports of all users,
+    # 0 keeps them on the database
+    ANALYTICS_REPLICA_MAX_STALENESS_SECONDS: int = 0
 
     model_config = SettingsConfigDict(
         env_file='.env',
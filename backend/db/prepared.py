@@ -0,0 +1,218 @@
+"""Named statements prepared once per pooled connection.
+
+A statement is registered as an SQLAlchemy construct whose variable
+parts are named bind parameters. It is compiled once, at registration,
+and prepared by every new connection of the engine right after it
+connects, next to the type codecs. Executing it by name skips both
+the SQLAlchemy compilation and the parse round trip to the server.
+
+The timings of the preparation and of the executions are collected
+per statement, so the overhead that remains can be told apart.
+
+A migration changing a table under a prepared statement invalidates it.
+The statement is prepared again on the connection and retried once,
+unless the connection is in a transaction, which the error has aborted:
+then the connection forgets it and builds the statement as usual.
+"""
+
+from collections.abc import Mapping, Sequence
+import time
+import typing
+from typing import Any, Final
+
+from asyncpg import Connection, PostgresError, Record
+from asyncpg.exceptions import InvalidCachedStatementError
+from asyncpg.prepared_stmt import PreparedStatement
+from sqlalchemy import AdaptedConnection, event, Select
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.pool import ConnectionPoolEntry
+from sqlalchemy.types import TypeEngine
+
+from core.logging import logger
+
+# the key of the prepared statements in the pooled connection's info
+INFO_KEY: Final = 'prepared_statements'
+
+type _Processor = typing.Callable[[Any], Any] | None
+
+
+class StatementStats(typing.NamedTuple):
+    prepares: int
+    # the round trips parsing and analysing the statement
+    prepare_seconds: float
+    calls: int
+    seconds: float
+
+
+class _Statement:
+    def __init__(self, statement: Select[Any], dialect: PGDialect_asyncpg):
+        compiled = statement.compile(
+            dialect=dialect,
+            compile_kwargs={'render_postcompile': True},
+        )
+        self.dialect = dialect
+        self.sql = str(compiled)
+        self.defaults = compiled.params
+        self.bind_processors: list[tuple[str, _Processor]] = [
+            (
+                name,
+                self._impl(compiled.binds[name].type).bind_processor(dialect),
+            )
+            for name in compiled.positiontup or ()
+        ]
+        self.column_types = [
+            self._impl(column.type) for column in statement.selected_columns
+        ]
+        # the processors depend on the types of the columns
+        # returned by the server, known once the statement is prepared
+        self.result_processors: list[_Processor] = []
+
+    def _impl(self, type_: TypeEngine[Any]) -> TypeEngine[Any]:
+        return type_.dialect_impl(self.dialect)
+
+    def prepared(self, prepared: PreparedStatement) -> None:
+        self.result_processors = [
+            type_.result_processor(self.dialect, attribute.type.oid)
+            for type_, attribute in zip(
+                self.column_types,
+                prepared.get_attributes(),
+                strict=True,
+            )
+        ]
+
+    def arguments(self, params: Mapping[str, Any]) -> list[Any]:
+        arguments = []
+        for name, processor in self.bind_processors:
+            value = params.get(name, self.defaults[name])
+            arguments.append(value if processor is None else processor(value))
+
+        return arguments
+
+    def row(self, record: Record) -> dict[str, Any]:
+        return {
+            key: value if processor is None else processor(value)
+            for key, value, processor in zip(
+                record.keys(),
+                record.values(),
+                self.result_processors,
+                strict=True,
+            )
+        }
+
+
+class PreparedStatements:
+    def __init__(self) -> None:
+        self.dialect = PGDialect_asyncpg()  # type: ignore[no-untyped-call]
+        self._statements: dict[str, _Statement] = {}
+        self._prepares: dict[str, tuple[int, float]] = {}
+        self._calls: dict[str, tuple[int, float]] = {}
+
+    def register(self, name: str, statement: Select[Any]) -> None:
+        """Registers the statement, it will be prepared
+        by the connections made from now on."""
+        self._statements[name] = _Statement(statement, self.dialect)
+
+    def register_for_engine(self, engine: AsyncEngine) -> None:
+        on_connect = event.listens_for(engine.sync_engine, 'connect')
+        on_connect(self._prepare_for_adapter)
+
+    async def fetch(
+        self,
+        session: AsyncSession,
+        name: str,
+        params: Mapping[str, Any],
+    ) -> Sequence[Mapping[str, Any]] | None:
+        """Executes the statement with the params, the missing ones
+        get the values the statement was registered with.
+
+        Returns None if the session's connection hasn't got
+        the statement prepared, so the caller falls back to building
+        and executing the statement itself.
+        """
+        connection = await session.connection()
+        prepared = connection.info.get(INFO_KEY, {})
+        if name not in prepared:
+            return None
+
+        statement = self._statements[name]
+        arguments = statement.arguments(params)
+        started = time.perf_counter()
+        try:
+            records = await prepared[name].fetch(*arguments)
+        except InvalidCachedStatementError:
+            # a migration has changed a table the statement reads
+            del prepared[name]
+            driver = await _driver(connection)
+            if driver.is_in_transaction():
+                # aborted by the error, so the statement can't be
+                # prepared again, it is built on this connection instead
+                raise
+
+            prepared |= await self._prepare(driver, [name])
+            if name not in prepared:
+                return None
+
+            records = await prepared[name].fetch(*arguments)
+        self._count(self._calls, name, time.perf_counter() - started)
+
+        return [statement.row(record) for record in records]
+
+    def stats(self) -> dict[str, StatementStats]:
+        return {
+            name: StatementStats(
+                *self._prepares.get(name, (0, 0.0)),
+                *self._calls.get(name, (0, 0.0)),
+            )
+            for name in self._statements
+        }
+
+    def _prepare_for_adapter(
+        self,
+        adapter: AdaptedConnection,
+        record: ConnectionPoolEntry,
+    ) -> None:
+        record.info[INFO_KEY] = adapter.run_async(self._prepare)
+
+    async def _prepare(
+        self,
+        connection: Connection,
+        names: Sequence[str] | None = None,
+    ) -> dict[str, Any]:
+        prepared = {}
+        for name in self._statements if names is None else names:
+            statement = self._statements[name]
+            started = time.perf_counter()
+            try:
+                prepared[name] = await connection.prepare(statement.sql)
+                statement.prepared(prepared[name])
+            except PostgresError as e:
+                # e.g. the database isn't migrated yet, the statement
+                # is built and executed as usual on this connection
+                logger.warning(f'{name} statement is not prepared: {e}')
+                continue
+
+            self._count(self._prepares, name, time.perf_counter() - started)
+
+        return prepared
+
+    @staticmethod
+    def _count(
+        counters: dict[str, tuple[int, float]],
+        name: str,
+        seconds: float,
+    ) -> None:
+        count, total = counters.get(name, (0, 0.0))
+        counters[name] = (count + 1, total + seconds)
+
+
+async def _driver(connection: AsyncConnection) -> Connection:
+    raw_connection = await connection.get_raw_connection()
+    return typing.cast(Connection, raw_connection.driver_connection)
+
+
+statements = PreparedStatements()
+
+
+def register(engine: AsyncEngine) -> None:
+    statements.register_for_engine(engine)
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import create_async_engine as _create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from core.config import settings
-from db import pg_custom_types
+from db import pg_custom_types, prepared
 
 
 def create_async_engine(
@@ -22,6 +22,8 @@ def create_async_engine(
         engine=engine,
         types=(pg_custom_types.Interval(),),
     )
+    # after the types, the statements are prepared with their codecs
+    prepared.register(engine)
 
     return engine
 
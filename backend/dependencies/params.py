@@ -1,4 +1,5 @@
 from collections.abc import Callable, Iterable
+from enum import Enum
 from typing import (
     Annotated,
     cast,
@@ -17,6 +18,33 @@ class OrderByItem(BaseModel):
     desc: bool = False
 
 
+class TotalCount(str, Enum):
+    NONE = 'none'
+    EXACT = 'exact'
+    ESTIMATE = 'estimate'
+
+
+class PaginationParams(BaseModel):
+    offset: int = 0
+    limit: int = 10
+    cursor: str | None = None
+    total_count: TotalCount = TotalCount.EXACT
+
+
+def get_pagination(
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(gt=0, lt=100)] = 10,
+    cursor: Annotated[str | None, Query()] = None,
+    total_count: Annotated[TotalCount, Query()] = TotalCount.EXACT,
+) -> PaginationParams:
+    return PaginationParams(
+        offset=offset,
+        limit=limit,
+        cursor=cursor,
+        total_count=total_count,
+    )
+
+
 def order_by_dependency(
     fields: Iterable[str],
     default: Iterable[str] | None = None,
@@ -45,6 +73,25 @@ def order_by_dependency(
     return _get_order_by
 
 
+def fields_dependency(
+    fields: Iterable[str],
+) -> Callable[[list[str] | None], list[str] | None]:
+    if TYPE_CHECKING:
+        type_ = list[str] | None
+    else:
+        type_ = list[Literal[tuple(fields)]] | None
+
+    def _get_fields(
+        fields: Annotated[type_, Query()] = None,
+    ) -> list[str] | None:
+        if fields is None:
+            return None
+        # keep the requested order, but drop the duplicates
+        return list(dict.fromkeys(fields))
+
+    return _get_fields
+
+
 def _validate_order_by(items: Iterable[str]) -> None:
     seen = set()
 
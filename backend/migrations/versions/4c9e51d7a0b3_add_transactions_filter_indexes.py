@@ -0,0 +1,73 @@
+"""add transactions filter indexes
+
+Revision ID: 4c9e51d7a0b3
+Revises: b81f3c2a9d47
+Create Date: 2026-10-18 13:21:07.842615
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '4c9e51d7a0b3'
+down_revision: Union[str, None] = 'b81f3c2a9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# every listing filter is backed by one of them, so a filtered page
+# stays a bounded scan in the default ordering; the foreign keys
+# get no indexes of their own, only the rare deletes of the banks
+# and the categories would read them
+EQUALITY_FILTER_COLUMNS = (
+    'status',
+    'transaction_type',
+    'category_id',
+    'sender_bank_id',
+    'recipient_bank_id',
+    'recipient_inn',
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        for column in EQUALITY_FILTER_COLUMNS:
+            op.create_index(
+                f'ix_transactions_user_id_{column}',
+                'transactions',
+                [
+                    'user_id',
+                    column,
+                    sa.text('occurred_at DESC'),
+                    sa.text('id DESC'),
+                ],
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+        # the amount ranges of the listing and the analytics
+        op.create_index(
+            'ix_transactions_user_id_amount',
+            'transactions',
+            ['user_id', 'amount'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for column in (*EQUALITY_FILTER_COLUMNS, 'amount'):
+            op.drop_index(
+                f'ix_transactions_user_id_{column}',
+                table_name='transactions',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
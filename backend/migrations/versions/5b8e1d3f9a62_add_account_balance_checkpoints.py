@@ -0,0 +1,83 @@
+"""add account balance checkpoints
+
+Revision ID: 5b8e1d3f9a62
+Revises: e2a7c4f19b6d
+Create Date: 2026-10-18 19:24:53.518042
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e1d3f9a62'
+down_revision: Union[str, None] = 'e2a7c4f19b6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'account_balance_checkpoints',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('account_number', sa.String(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('transactions_count', sa.Integer(), nullable=False),
+        sa.Column(
+            'balance_change',
+            sa.Numeric(precision=24, scale=5),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint(
+            'user_id',
+            'account_number',
+            'month',
+            name=op.f('pk_account_balance_checkpoints'),
+        ),
+    )
+    op.execute(
+        """
+        INSERT INTO account_balance_checkpoints (
+            user_id, account_number, month,
+            transactions_count, balance_change
+        )
+        SELECT
+            user_id, account_number,
+            CAST(date_trunc(
+                'month', CAST(timezone('UTC', occurred_at) AS DATE)
+            ) AS DATE),
+            count(*),
+            sum(CASE WHEN transaction_type = 'DEBIT' THEN -amount
+                ELSE amount END)
+        FROM transactions
+        WHERE status NOT IN ('DELETED', 'CANCELLED', 'REFUNDED')
+        GROUP BY 1, 2, 3
+        """,
+    )
+    # CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        # the balances read the transactions of an account
+        # made after its last checkpoint
+        op.create_index(
+            'ix_transactions_user_id_account_number_occurred_at',
+            'transactions',
+            ['user_id', 'account_number', 'occurred_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_user_id_account_number_occurred_at',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table('account_balance_checkpoints')
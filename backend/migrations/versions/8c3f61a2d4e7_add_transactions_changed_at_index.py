@@ -0,0 +1,48 @@
+"""add transactions changed_at index
+
+Revision ID: 8c3f61a2d4e7
+Revises: 5b8e1d3f9a62
+Create Date: 2026-10-18 21:07:41.283915
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3f61a2d4e7'
+down_revision: Union[str, None] = '5b8e1d3f9a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        # the exports of the analytics replica read the rows changed
+        # since the previous one; BRIN is a summarizing index, it doesn't
+        # keep the updates of the column every update changes from being HOT
+        op.create_index(
+            'ix_transactions_changed_at',
+            'transactions',
+            [sa.text('coalesce(updated_at, created_at)')],
+            unique=False,
+            postgresql_using='brin',
+            postgresql_with={'autosummarize': 'on'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_changed_at',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
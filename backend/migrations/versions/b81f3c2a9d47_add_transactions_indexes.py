@@ -0,0 +1,58 @@
+"""add transactions indexes
+
+Revision ID: b81f3c2a9d47
+Revises: 939d2c4e88e8
+Create Date: 2026-10-18 12:05:41.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f3c2a9d47'
+down_revision: Union[str, None] = '939d2c4e88e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the orderings the listing offers, id is the tiebreaker of the keyset
+# pages; every update sets updated_at, so no update is HOT with its
+# index, which is kept as the common updates change the indexed status
+ORDERING_INDEXES = {
+    'ix_transactions_user_id_occurred_at': 'occurred_at',
+    'ix_transactions_user_id_created_at': 'created_at',
+    'ix_transactions_user_id_updated_at': 'updated_at',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, column in ORDERING_INDEXES.items():
+            op.create_index(
+                name,
+                'transactions',
+                [
+                    'user_id',
+                    sa.text(f'{column} DESC'),
+                    sa.text('id DESC'),
+                ],
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in ORDERING_INDEXES:
+            op.drop_index(
+                name,
+                table_name='transactions',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,81 @@
+"""add transaction daily rollups
+
+Revision ID: e2a7c4f19b6d
+Revises: 4c9e51d7a0b3
+Create Date: 2026-10-18 16:02:41.310274
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c4f19b6d'
+down_revision: Union[str, None] = '4c9e51d7a0b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'transaction_daily_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column(
+            'transaction_type',
+            postgresql.ENUM(name='transactiontype', create_type=False),
+            nullable=False,
+        ),
+        sa.Column(
+            'status',
+            postgresql.ENUM(name='transactionstatus', create_type=False),
+            nullable=False,
+        ),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('sender_bank_id', sa.Integer(), nullable=False),
+        sa.Column('recipient_bank_id', sa.Integer(), nullable=False),
+        sa.Column('transactions_count', sa.Integer(), nullable=False),
+        sa.Column(
+            'amount_sum',
+            sa.Numeric(precision=24, scale=5),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint(
+            'user_id',
+            'day',
+            'transaction_type',
+            'status',
+            'category_id',
+            'sender_bank_id',
+            'recipient_bank_id',
+            name=op.f('pk_transaction_daily_rollups'),
+        ),
+    )
+    op.execute(
+        """
+        INSERT INTO transaction_daily_rollups (
+            user_id, day, transaction_type, status, category_id,
+            sender_bank_id, recipient_bank_id,
+            transactions_count, amount_sum
+        )
+        SELECT
+            user_id, CAST(timezone('UTC', occurred_at) AS DATE),
+            transaction_type, status, category_id,
+            sender_bank_id, recipient_bank_id,
+            count(*), sum(amount)
+        FROM transactions
+        GROUP BY
+            user_id, CAST(timezone('UTC', occurred_at) AS DATE),
+            transaction_type, status, category_id,
+            sender_bank_id, recipient_bank_id
+        """,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('transaction_daily_rollups')
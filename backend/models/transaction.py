@@ -1,10 +1,10 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 import enum
 import typing
 
-from sqlalchemy import DateTime, VARCHAR
-from sqlmodel import Field, Relationship
+from sqlalchemy import DateTime, func, Index, VARCHAR
+from sqlmodel import col, Field, Relationship
 
 from core.validators import INN, PhoneNumber
 from models.base import BaseModel
@@ -96,3 +96,136 @@ class Transaction(
     )
 
     category: TransactionCategory = Relationship(back_populates='transactions')
+
+
+# Listing is always scoped to a user and ordered by one of the timestamps,
+# id makes the ordering total for keyset pagination. Every update sets
+# updated_at, so its index makes none of them HOT; it stays as the API
+# orders by it and the common updates change the indexed status anyway
+Index(
+    'ix_transactions_user_id_occurred_at',
+    col(Transaction.user_id),
+    col(Transaction.occurred_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_created_at',
+    col(Transaction.user_id),
+    col(Transaction.created_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_updated_at',
+    col(Transaction.user_id),
+    col(Transaction.updated_at).desc(),
+    col(Transaction.id).desc(),
+)
+
+# Filtered listing, equality filters keep the default ordering
+# index-backed, so the filtered pages stay bounded scans as well.
+# The foreign keys get no indexes of their own, only the rare deletes
+# of the banks and the categories would read them
+Index(
+    'ix_transactions_user_id_status',
+    col(Transaction.user_id),
+    col(Transaction.status),
+    col(Transaction.occurred_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_transaction_type',
+    col(Transaction.user_id),
+    col(Transaction.transaction_type),
+    col(Transaction.occurred_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_category_id',
+    col(Transaction.user_id),
+    col(Transaction.category_id),
+    col(Transaction.occurred_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_sender_bank_id',
+    col(Transaction.user_id),
+    col(Transaction.sender_bank_id),
+    col(Transaction.occurred_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_recipient_bank_id',
+    col(Transaction.user_id),
+    col(Transaction.recipient_bank_id),
+    col(Transaction.occurred_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_recipient_inn',
+    col(Transaction.user_id),
+    col(Transaction.recipient_inn),
+    col(Transaction.occurred_at).desc(),
+    col(Transaction.id).desc(),
+)
+Index(
+    'ix_transactions_user_id_amount',
+    col(Transaction.user_id),
+    col(Transaction.amount),
+)
+# the balances read the transactions of an account within a month
+Index(
+    'ix_transactions_user_id_account_number_occurred_at',
+    col(Transaction.user_id),
+    col(Transaction.account_number),
+    col(Transaction.occurred_at),
+)
+# the exports of the analytics replica read the rows changed since
+# the previous one, the rows never updated have got no updated_at;
+# the recent changes are in the last pages and the pages of the rows
+# updated in place, the page ranges a BRIN index tells apart
+Index(
+    'ix_transactions_changed_at',
+    func.coalesce(col(Transaction.updated_at), col(Transaction.created_at)),
+    postgresql_using='brin',
+    postgresql_with={'autosummarize': 'on'},
+)
+
+
+class TransactionDailyRollup(BaseModel, table=True):
+    """Transactions aggregated per user and day.
+
+    Derived from `transactions`: kept in sync by `TransactionCRUD`
+    and can be rebuilt from scratch with `scripts/rollups.py`.
+    The primary key starts with (user_id, day), so the analytics
+    read a range of days with a single index scan.
+    """
+
+    __tablename__ = 'transaction_daily_rollups'
+
+    user_id: int = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    transaction_type: TransactionType = Field(primary_key=True)
+    status: TransactionStatus = Field(primary_key=True)
+    category_id: int = Field(primary_key=True)
+    sender_bank_id: int = Field(primary_key=True)
+    recipient_bank_id: int = Field(primary_key=True)
+    transactions_count: int
+    amount_sum: Decimal = Field(max_digits=24, decimal_places=5)
+
+
+class AccountBalanceCheckpoint(BaseModel, table=True):
+    """The change of the balance of an account over a calendar month.
+
+    Derived from `transactions` like the daily rollups: kept in sync
+    by `TransactionCRUD` and rebuilt with `scripts/rollups.py`.
+    The balance at the start of a month is the sum of the account's
+    earlier checkpoints, read with a range scan of the primary key.
+    """
+
+    __tablename__ = 'account_balance_checkpoints'
+
+    user_id: int = Field(primary_key=True)
+    account_number: str = Field(primary_key=True)
+    month: date = Field(primary_key=True)
+    transactions_count: int
+    balance_change: Decimal = Field(max_digits=24, decimal_places=5)
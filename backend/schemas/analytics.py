@@ -4,8 +4,10 @@ from enum import Enum
 from typing import Final, Self
 
 from dateutil.relativedelta import relativedelta
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
+from core.validators import INN
+from models.transaction import TransactionStatus, TransactionType
 from schemas.banks import BankOutShort
 from schemas.transactions import TransactionCategoryOutShort
 
@@ -28,21 +30,135 @@ class StartEnd(BaseModel):
         return self
 
 
+class AnalyticsFilters(BaseModel):
+    # frozen, so the filters can be a part of a cache key
+    model_config = ConfigDict(frozen=True)
+
+    sender_bank_id: int | None = None
+    recipient_bank_id: int | None = None
+    status: TransactionStatus | None = None
+    recipient_inn: INN | None = None
+    amount_min: Decimal | None = None
+    amount_max: Decimal | None = None
+    transaction_type: TransactionType | None = None
+    category_id: int | None = None
+
+    @model_validator(mode='after')
+    def check_amount(self) -> Self:
+        if (
+            self.amount_min is not None
+            and self.amount_max is not None
+            and self.amount_min > self.amount_max
+        ):
+            raise ValueError('amount_min must not be greater than amount_max')
+
+        return self
+
+
+class AnalyticsParams(AnalyticsFilters, StartEnd):
+    """The query of the analytics endpoints: the range and the filters.
+
+    FastAPI expands a single query model only, so they come together.
+    """
+
+    def filters(self) -> AnalyticsFilters | None:
+        """None without any filter given, so the unfiltered statements
+        may be served by the prepared ones."""
+        data = self.model_dump(
+            include=set(AnalyticsFilters.model_fields),
+            exclude_none=True,
+        )
+        if not data:
+            return None
+        return AnalyticsFilters.model_validate(data)
+
+
 class Interval(str, Enum):
+    DAY = 'day'
     WEEK = 'week'
     MONTH = 'month'
     QUARTER = 'quarter'
     YEAR = 'year'
 
 
+class Accuracy(str, Enum):
+    EXACT = 'exact'
+    # estimated from a sample of the data
+    APPROXIMATE = 'approximate'
+
+
+class ConfidenceInterval(BaseModel):
+    """The bounds the exact value falls into with 95% confidence."""
+
+    low: int
+    high: int
+
+
 class DynamicsByIntervalEntry(BaseModel):
     date: date
     count: int
+    # only the approximate counts have one
+    confidence_interval: ConfidenceInterval | None = None
 
 
 class DynamicsByInterval(StartEnd):
     interval: Interval
     entries: list[DynamicsByIntervalEntry]
+    # the percent of the data the approximate counts are estimated from
+    sample_percent: float | None = None
+
+
+class Comparison(str, Enum):
+    # the interval right before
+    PREVIOUS_PERIOD = 'previous_period'
+    # the interval a year before
+    PREVIOUS_YEAR = 'previous_year'
+
+
+class DynamicsComparisonEntry(BaseModel):
+    # the start of the interval the entry is compared to,
+    # declared first as the next field shadows the type
+    previous_date: date
+    date: date
+    count: int
+    previous_count: int
+    count_delta: int
+    # the change in percent of the previous value, None if it is zero
+    count_percent: Decimal | None
+    amount: Decimal
+    previous_amount: Decimal
+    amount_delta: Decimal
+    amount_percent: Decimal | None
+
+
+class DynamicsComparison(StartEnd):
+    interval: Interval
+    compare_to: Comparison
+    entries: list[DynamicsComparisonEntry]
+
+
+class SplitBy(str, Enum):
+    TYPE = 'type'
+    STATUS = 'status'
+    CATEGORY = 'category'
+
+
+class DynamicsSeries(BaseModel):
+    # the values of the split_by dimensions, empty without a split
+    key: dict[SplitBy, TransactionType | TransactionStatus | int]
+    counts: list[int]
+    amounts: list[Decimal]
+
+
+class DynamicsByIntervalSeries(StartEnd):
+    """A pivot of the dynamics: the series share the dates,
+    so the n-th count and amount of every series belong
+    to the n-th date."""
+
+    interval: Interval
+    split_by: list[SplitBy]
+    dates: list[date]
+    series: list[DynamicsSeries]
 
 
 class DynamicsByType(StartEnd):
@@ -81,3 +197,53 @@ class CategoryStatistics(BaseModel):
 class DynamicsByCategories(StartEnd):
     spending_categories: list[CategoryStatistics]
     income_categories: list[CategoryStatistics]
+
+
+class AnalyticsDashboard(StartEnd):
+    by_type: dict[TransactionType, DynamicsByType]
+    received_and_spent: ReceivedAndSpentComparison
+    by_status: DynamicsByStatus
+    by_banks: DynamicsByBanks
+    by_categories: DynamicsByCategories
+
+
+class AmountBucket(BaseModel):
+    # the last bucket includes its high bound, the rest don't
+    low: Decimal
+    high: Decimal
+    count: int
+
+
+class AmountDistribution(BaseModel):
+    # the values of the split_by dimensions, empty without a split
+    key: dict[SplitBy, TransactionType | TransactionStatus | int]
+    count: int
+    min: Decimal
+    max: Decimal
+    # the amounts below which the given percent of the amounts fall
+    percentiles: dict[int, Decimal]
+    buckets: list[AmountBucket]
+
+
+class AmountDistributions(StartEnd):
+    split_by: list[SplitBy]
+    distributions: list[AmountDistribution]
+
+
+class AccountBalance(BaseModel):
+    account_number: str
+    # the balance is at the end of the day
+    date: date
+    balance: Decimal
+
+
+class BalanceEntry(BaseModel):
+    date: date
+    # at the end of the interval
+    balance: Decimal
+
+
+class BalanceSeries(StartEnd):
+    account_number: str
+    interval: Interval
+    entries: list[BalanceEntry]
@@ -5,4 +5,5 @@ from pydantic import BaseModel
 
 class SequenceResponse[T](BaseModel):
     items: Sequence[T]
-    total_count: int
+    total_count: int | None
+    next_cursor: str | None = None
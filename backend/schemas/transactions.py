@@ -1,5 +1,7 @@
 from datetime import datetime
 from decimal import Decimal
+from enum import Enum
+from typing import Final
 
 from pydantic import BaseModel
 from sqlmodel import Field
@@ -37,6 +39,51 @@ class TransactionCreate(TransactionBase):
     pass
 
 
+TRANSACTION_BATCH_MAX_SIZE: Final = 5000
+
+
+class TransactionBatchCreate(BaseModel):
+    items: list[TransactionCreate] = Field(
+        min_length=1,
+        max_length=TRANSACTION_BATCH_MAX_SIZE,
+    )
+
+
+class BatchItemStatus(str, Enum):
+    CREATED = 'created'
+    FAILED = 'failed'
+
+
+class TransactionBatchItemResult(BaseModel):
+    index: int
+    status: BatchItemStatus
+    id: int | None = None
+    detail: str | None = None
+
+
+class TransactionBatchResult(BaseModel):
+    items: list[TransactionBatchItemResult]
+
+
+class TransactionBulkDelete(BaseModel):
+    ids: set[int] = Field(min_length=1, max_length=TRANSACTION_BATCH_MAX_SIZE)
+
+
+class TransactionBulkStatusUpdate(TransactionBulkDelete):
+    status: TransactionStatus
+
+
+class BulkRejection(BaseModel):
+    id: int
+    status_code: int
+    detail: str
+
+
+class TransactionBulkResult(BaseModel):
+    updated: list[int]
+    rejected: list[BulkRejection]
+
+
 class TransactionUpdate(BaseModel):
     party_type: PartyType | None = None
     occurred_at: datetime | None = None
@@ -64,3 +111,37 @@ class TransactionOutShort(TransactionBase):
 class TransactionOut(TransactionOutShort):
     created_at: datetime
     updated_at: datetime | None
+
+
+class TransactionOutSparse(BaseModel):
+    """`TransactionOut` restricted to the fields requested by the client."""
+
+    id: int
+    party_type: PartyType | None = None
+    occurred_at: datetime | None = None
+    transaction_type: TransactionType | None = None
+    comment: str | None = None
+    amount: Decimal | None = None
+    status: TransactionStatus | None = None
+    sender_bank_id: int | None = None
+    account_number: str | None = None
+    recipient_bank_id: int | None = None
+    recipient_inn: INN | None = None
+    recipient_account_number: str | None = None
+    category_id: int | None = None
+    recipient_phone: PhoneNumber | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
+class TransactionFilters(BaseModel):
+    sender_bank_id: int | None = None
+    recipient_bank_id: int | None = None
+    occurred_from: datetime | None = None
+    occurred_to: datetime | None = None
+    status: TransactionStatus | None = None
+    recipient_inn: INN | None = None
+    amount_min: Decimal | None = None
+    amount_max: Decimal | None = None
+    transaction_type: TransactionType | None = None
+    category_id: int | None = None
@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+
+from core.config import settings
+from db.session import create_async_engine, create_async_session_factory
+from services.analytics.replica import analytics_replica, Manifest
+
+
+async def run(full: bool) -> Manifest:
+    engine = create_async_engine(settings.DATABASE_URL)
+    async_session = create_async_session_factory(engine)
+
+    async with async_session() as session:
+        manifest = await analytics_replica.export(session, full=full)
+
+    await engine.dispose()
+
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Export the changed transactions to the analytics replica',
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='export all of them, dropping the parts and the deleted rows',
+    )
+    args = parser.parse_args()
+    full: bool = args.full
+
+    with warnings.catch_warnings(action='ignore'):
+        manifest = asyncio.run(run(full=full))
+
+    print(  # noqa: T201
+        f'The replica has the changes made before {manifest.watermark} '
+        f'in {len(manifest.parts)} parts.',
+    )
+
+
+if __name__ == '__main__':
+    main()
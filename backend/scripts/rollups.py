@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+
+from core.config import settings
+from db.session import create_async_engine, create_async_session_factory
+from services.ledger import rebuild_ledger, verify_ledger
+from services.rollups import rebuild_rollups, verify_rollups
+
+
+async def run(rebuild: bool) -> int:
+    engine = create_async_engine(settings.DATABASE_URL)
+    async_session = create_async_session_factory(engine)
+
+    async with async_session() as session:
+        if rebuild:
+            await rebuild_rollups(session)
+            await rebuild_ledger(session)
+
+        mismatches = [
+            *await verify_rollups(session),
+            *await verify_ledger(session),
+        ]
+
+    await engine.dispose()
+
+    for mismatch in mismatches:
+        print(dict(mismatch))  # noqa: T201
+
+    return len(mismatches)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Check the daily rollups and the balance checkpoints',
+    )
+    parser.add_argument(
+        '--rebuild',
+        action='store_true',
+        help='recompute them from the transactions before checking',
+    )
+    args = parser.parse_args()
+    rebuild: bool = args.rebuild
+
+    with warnings.catch_warnings(action='ignore'):
+        mismatches = asyncio.run(run(rebuild=rebuild))
+
+    if mismatches:
+        print(f'{mismatches} rows do not match the transactions.')  # noqa: T201
+        sys.exit(1)
+
+    print('Rollups and checkpoints match the transactions.')  # noqa: T201
+
+
+if __name__ == '__main__':
+    main()
@@ -18,13 +18,17 @@ from core.config import settings
 from db.session import create_async_engine, create_async_session_factory
 from models.bank import Bank
 from models.transaction import (
+    AccountBalanceCheckpoint,
     PartyType,
     Transaction,
     TransactionCategory,
+    TransactionDailyRollup,
     TransactionStatus,
     TransactionType,
 )
 from models.user import User
+from services.ledger import rebuild_ledger
+from services.rollups import rebuild_rollups
 
 faker = Faker(locale='ru-RU')
 faker.seed_instance(2)
@@ -185,6 +189,8 @@ async def create_transactions(
 async def clear_database(session: AsyncSession) -> None:
     # https://github.com/fastapi/sqlmodel/issues/909#issuecomment-2242435908
     # как вызвать .exec(), чтобы mypy не ругался?
+    await session.execute(delete(TransactionDailyRollup))
+    await session.execute(delete(AccountBalanceCheckpoint))
     await session.execute(delete(Transaction))
     await session.execute(delete(User))
     await session.execute(delete(TransactionCategory))
@@ -207,6 +213,11 @@ async def seed(clear_only: bool) -> None:
             users: list[User] = await create_users(session)
             await create_transactions(session, users, banks, categories)
 
+        # the transactions are inserted directly,
+        # bypassing the rollups and the checkpoints
+        await rebuild_rollups(session)
+        await rebuild_ledger(session)
+
     await engine.dispose()
 
 
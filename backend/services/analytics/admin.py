@@ -0,0 +1,103 @@
+"""Analytics over the transactions of all users, for admins.
+
+The statements are the same as the per-user ones without the user
+condition. They read whole tables rather than a range of an index,
+which Postgres can split among parallel workers as long as the
+aggregation is a plain GROUP BY. Every statement runs with a timeout,
+so an unexpectedly heavy request can't hold the database for long.
+The reports are read from the columnar replica instead while it is
+fresh enough, they don't need the latest writes. The per-user reports
+are never read from it, they must show the user's writes at once.
+"""
+
+from collections.abc import Awaitable, Callable, Hashable, Mapping, Sequence
+import typing
+from typing import override
+
+from fastapi import HTTPException, status
+from sqlalchemy import Executable, func, Result, Select, select
+from sqlalchemy.exc import DBAPIError
+
+from core.config import settings
+from services.analytics.analytics import (
+    DashboardService,
+    DynamicsByIntervalService,
+)
+from services.analytics.base import BaseAnalytics
+from services.analytics.replica import analytics_replica
+from services.common import is_query_canceled
+
+STATEMENT_TIMEOUT_EXCEPTION = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail='the analytics query took too long',
+)
+
+
+class AllUsersAnalytics(BaseAnalytics):
+    @property
+    @override
+    def user_id(self) -> int | None:
+        return None
+
+    @override
+    async def cached[T](
+        self,
+        name: str,
+        params: Hashable,
+        compute: Callable[[], Awaitable[T]],
+    ) -> T:
+        # a write of any user would invalidate the results,
+        # so they aren't worth keeping
+        return await compute()
+
+    @override
+    async def rows(
+        self,
+        build: Callable[[], Select[typing.Any]],
+        prepared: str | None = None,
+        **params: typing.Any,
+    ) -> Sequence[Mapping[str, typing.Any]]:
+        statement = build()
+        # the range of days the statements read, the replica
+        # skips the files of the other months
+        rows = await analytics_replica.fetch(
+            statement,
+            params.get('start'),
+            params.get('end'),
+        )
+        if rows is not None:
+            return rows
+
+        return await super().rows(lambda: statement, prepared, **params)
+
+    @override
+    async def execute(self, query: Executable) -> Result[typing.Any]:
+        # local to the transaction, so the pooled connection
+        # gets its default timeout back
+        await self.session.execute(
+            select(
+                func.set_config(
+                    'statement_timeout',
+                    f'{settings.ADMIN_ANALYTICS_STATEMENT_TIMEOUT_MS}ms',
+                    True,
+                ),
+            ),
+        )
+        try:
+            return await super().execute(query)
+        except DBAPIError as e:
+            if is_query_canceled(e):
+                raise STATEMENT_TIMEOUT_EXCEPTION from e
+
+            raise e
+
+
+class AllUsersDashboardService(AllUsersAnalytics, DashboardService):
+    pass
+
+
+class AllUsersDynamicsByIntervalService(
+    AllUsersAnalytics,
+    DynamicsByIntervalService,
+):
+    pass
@@ -1,68 +1,1064 @@
+from collections.abc import Mapping, Sequence
 from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import math
 import typing
-import warnings
 
-from dateutil.relativedelta import relativedelta
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    and_,
+    ARRAY,
+    BigInteger,
+    bindparam,
+    case,
+    cast,
+    column,
+    ColumnElement,
+    Date,
+    func,
+    Integer,
+    literal,
+    Numeric,
+    RowMapping,
+    Select,
+    select,
+    true,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import array
+from sqlmodel import col
 
-from schemas.analytics import DynamicsByInterval, Interval
+from db.prepared import statements
+from models.bank import Bank
+from models.transaction import (
+    TransactionCategory,
+    TransactionStatus,
+    TransactionType,
+)
+from schemas.analytics import (
+    AnalyticsDashboard,
+    AnalyticsFilters,
+    BankStatistics,
+    CategoryStatistics,
+    Comparison,
+    ConfidenceInterval,
+    DynamicsByBanks,
+    DynamicsByCategories,
+    DynamicsByInterval,
+    DynamicsByIntervalEntry,
+    DynamicsByIntervalSeries,
+    DynamicsByStatus,
+    DynamicsByType,
+    DynamicsComparison,
+    DynamicsComparisonEntry,
+    DynamicsSeries,
+    Interval,
+    ReceivedAndSpentComparison,
+    SplitBy,
+)
+from schemas.banks import BankOutShort
+from schemas.transactions import TransactionCategoryOutShort
 from services.analytics.base import BaseAnalytics
+from services.analytics.buckets import Buckets
+from services.analytics.cube import Cube
+from services.analytics.downsampling import lttb
+from services.analytics.query_builder import AnalyticsQuery, RollupsQuery
+from services.analytics.sampling import estimate
 
+# TABLESAMPLE picks the pages before the user condition is applied,
+# so a user's rows in the sampled pages are too few to estimate from
+SAMPLING_PER_USER_EXCEPTION = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='approximate analytics are only computed for all users',
+)
 
-class _StatementParams(typing.TypedDict):
-    user_id: int
-    start_date: date
-    end_date: date
-    interval_unit: Interval
-    interval_value: timedelta | relativedelta
+_SPLIT_COLUMNS: typing.Final = {
+    SplitBy.TYPE: 'transaction_type',
+    SplitBy.STATUS: 'status',
+    SplitBy.CATEGORY: 'category_id',
+}
 
 
 class DynamicsByIntervalService(BaseAnalytics):
-    query_template = BaseAnalytics.QUERIES_DIR / 'dynamics_by_interval.sql'
+    async def get(  # noqa: PLR0913
+        self,
+        start: date,
+        end: date,
+        interval: Interval,
+        filters: AnalyticsFilters | None = None,
+        step: int = 1,
+        max_points: int | None = None,
+        sample_percent: float | None = None,
+    ) -> DynamicsByInterval:
+        """With `sample_percent` the counts are estimated from
+        a sample of the data and come with confidence intervals,
+        only for all users."""
+        if sample_percent is not None and self.user_id is not None:
+            raise SAMPLING_PER_USER_EXCEPTION
 
-    async def get(
+        return await self.cached(
+            'dynamics_by_interval',
+            (start, end, interval, filters, step, max_points, sample_percent),
+            lambda: self._compute(
+                start,
+                end,
+                Buckets(interval, start, step),
+                filters,
+                max_points,
+                sample_percent,
+            ),
+        )
+
+    async def series(  # noqa: PLR0913
+        self,
+        start: date,
+        end: date,
+        interval: Interval,
+        split_by: Sequence[SplitBy] = (),
+        filters: AnalyticsFilters | None = None,
+        step: int = 1,
+        max_points: int | None = None,
+    ) -> DynamicsByIntervalSeries:
+        """Counts and amount sums of every combination of the split_by
+        values, computed with a single GROUP BY."""
+        split_by = list(dict.fromkeys(split_by))
+        return await self.cached(
+            'dynamics_by_interval_series',
+            (start, end, interval, tuple(split_by), filters, step, max_points),
+            lambda: self._compute_series(
+                start,
+                end,
+                Buckets(interval, start, step),
+                split_by,
+                filters,
+                max_points,
+            ),
+        )
+
+    async def compare(  # noqa: PLR0913
         self,
         start: date,
         end: date,
         interval: Interval,
+        compare_to: Comparison,
+        filters: AnalyticsFilters | None = None,
+        step: int = 1,
+    ) -> DynamicsComparison:
+        """Counts and amount sums of every interval next to the ones
+        of the interval it is compared to, with the changes."""
+        return await self.cached(
+            'dynamics_comparison',
+            (start, end, interval, compare_to, filters, step),
+            lambda: self._compute_comparison(
+                start,
+                end,
+                Buckets(interval, start, step),
+                compare_to,
+                filters,
+            ),
+        )
+
+    async def _compute(  # noqa: PLR0913
+        self,
+        start: date,
+        end: date,
+        buckets: Buckets,
+        filters: AnalyticsFilters | None,
+        max_points: int | None,
+        sample_percent: float | None,
     ) -> DynamicsByInterval:
-        delta = self._get_delta(interval)
-        with warnings.catch_warnings(action='ignore'):
-            result = await self.session.execute(
-                self.get_query(),
-                params=_StatementParams(
-                    user_id=typing.cast(int, self.user.id),
-                    start_date=start,
-                    end_date=end,
-                    interval_unit=interval,
-                    interval_value=delta,
+        bounds: dict[date, ConfidenceInterval] = {}
+        if sample_percent is None:
+            rows = await self._dynamics_rows(start, end, buckets, filters)
+            counts: dict[date, int] = {
+                row['date']: row['count'] for row in rows
+            }
+        else:
+            counts, bounds = await self._estimate(
+                start,
+                end,
+                buckets,
+                filters,
+                sample_percent,
+            )
+
+        dates = buckets.dates(start, end)
+        end_date = dates[-1] + buckets.delta
+        if max_points is not None:
+            values = [counts.get(day, 0) for day in dates]
+            dates = [dates[i] for i in lttb(values, max_points)]
+
+        # an interval without a sampled row is estimated to be empty
+        no_rows = (
+            None
+            if sample_percent is None
+            else ConfidenceInterval(low=0, high=0)
+        )
+        # correct start and end according to the truncated interval
+        return DynamicsByInterval(
+            start=dates[0],
+            end=end_date,
+            interval=buckets.interval,
+            entries=[
+                # the values come from the database as is
+                DynamicsByIntervalEntry.model_construct(
+                    date=interval_start,
+                    count=counts.get(interval_start, 0),
+                    confidence_interval=bounds.get(interval_start, no_rows),
+                )
+                for interval_start in dates
+            ],
+            sample_percent=sample_percent,
+        )
+
+    async def _estimate(
+        self,
+        start: date,
+        end: date,
+        buckets: Buckets,
+        filters: AnalyticsFilters | None,
+        sample_percent: float,
+    ) -> tuple[dict[date, int], dict[date, ConfidenceInterval]]:
+        result = await self.execute(
+            self._build_estimate_query(
+                start,
+                end,
+                buckets,
+                filters,
+                sample_percent,
+            ),
+        )
+
+        counts: dict[date, int] = {}
+        bounds: dict[date, ConfidenceInterval] = {}
+        for row in result.mappings().all():
+            count = estimate(
+                float(row['count']),
+                float(row['page_squares']),
+                sample_percent / 100,
+            )
+            counts[row['date']] = round(count.value)
+            bounds[row['date']] = ConfidenceInterval.model_construct(
+                low=math.floor(count.low),
+                high=math.ceil(count.high),
+            )
+
+        return counts, bounds
+
+    async def _compute_series(  # noqa: PLR0913
+        self,
+        start: date,
+        end: date,
+        buckets: Buckets,
+        split_by: Sequence[SplitBy],
+        filters: AnalyticsFilters | None,
+        max_points: int | None,
+    ) -> DynamicsByIntervalSeries:
+        rows = await self._dynamics_rows(
+            start,
+            end,
+            buckets,
+            filters,
+            split_by,
+        )
+
+        dates = buckets.dates(start, end)
+        end_date = dates[-1] + buckets.delta
+        positions = {day: i for i, day in enumerate(dates)}
+        counts: dict[tuple[typing.Any, ...], list[int]] = {}
+        amounts: dict[tuple[typing.Any, ...], list[Decimal]] = {}
+        for row in rows:
+            key = tuple(row[dimension.value] for dimension in split_by)
+            if key not in counts:
+                counts[key] = [0] * len(dates)
+                amounts[key] = [Decimal(0)] * len(dates)
+
+            position = positions[row['date']]
+            counts[key][position] = row['count']
+            amounts[key][position] = row['amount']
+
+        kept: Sequence[int] = range(len(dates))
+        if max_points is not None:
+            # the same points of every series are kept,
+            # picked by the shape of their total
+            totals = [
+                sum(column) for column in zip(*counts.values(), strict=False)
+            ]
+            kept = lttb(totals or [0] * len(dates), max_points)
+
+        series = [
+            DynamicsSeries(
+                key=dict(zip(split_by, key, strict=True)),
+                counts=[counts[key][i] for i in kept],
+                amounts=[amounts[key][i] for i in kept],
+            )
+            for key in counts
+        ]
+        return DynamicsByIntervalSeries(
+            start=dates[0],
+            end=end_date,
+            interval=buckets.interval,
+            split_by=list(split_by),
+            dates=[dates[i] for i in kept],
+            # the largest series first, as they are usually charted
+            series=sorted(
+                series,
+                key=lambda s: (-sum(s.amounts), -sum(s.counts)),
+            ),
+        )
+
+    async def _dynamics_rows(
+        self,
+        start: date,
+        end: date,
+        buckets: Buckets,
+        filters: AnalyticsFilters | None,
+        split_by: Sequence[SplitBy] = (),
+    ) -> Sequence[Mapping[str, typing.Any]]:
+        """Reduces the user's cube when there is one,
+        otherwise executes the dynamics statement."""
+        # the range is widened to the whole intervals, so the edge
+        # intervals are counted completely, as the entries claim
+        first, last = buckets.truncate(start), buckets.last_day(end)
+        cube = await self.cube(filters)
+        if cube is not None:
+            return cube.rows(first, last, buckets.truncate, filters, split_by)
+
+        return await self.rows(
+            lambda: self._build_query(start, end, buckets, filters, split_by),
+            None if split_by else _prepared_dynamics(buckets, filters),
+            start=first,
+            end=last,
+        )
+
+    async def _compute_comparison(
+        self,
+        start: date,
+        end: date,
+        buckets: Buckets,
+        compare_to: Comparison,
+        filters: AnalyticsFilters | None,
+    ) -> DynamicsComparison:
+        dates = buckets.dates(start, end)
+        rows: Sequence[Mapping[str, typing.Any]]
+        cube = await self.cube(filters)
+        if cube is None:
+            result = await self.execute(
+                self._build_comparison_query(
+                    dates,
+                    buckets,
+                    compare_to,
+                    filters,
                 ),
             )
+            rows = typing.cast(
+                Sequence[Mapping[str, typing.Any]],
+                result.mappings().all(),
+            )
+        else:
+            rows = _comparison_rows(cube, dates, buckets, compare_to, filters)
+
+        return DynamicsComparison(
+            start=dates[0],
+            end=dates[-1] + buckets.delta,
+            interval=buckets.interval,
+            compare_to=compare_to,
+            entries=[
+                # the values come from the database as is
+                DynamicsComparisonEntry.model_construct(**row)
+                for row in rows
+            ],
+        )
+
+    def build_query(  # noqa: PLR0913
+        self,
+        start: date,
+        end: date,
+        interval: Interval,
+        filters: AnalyticsFilters | None = None,
+        split_by: Sequence[SplitBy] = (),
+        step: int = 1,
+    ) -> Select[typing.Any]:
+        buckets = Buckets(interval, start, step)
+        return self._build_query(start, end, buckets, filters, split_by)
+
+    def _build_query(
+        self,
+        start: date,
+        end: date,
+        buckets: Buckets,
+        filters: AnalyticsFilters | None,
+        split_by: Sequence[SplitBy] = (),
+    ) -> Select[typing.Any]:
+        # the range is widened to the whole intervals, so the edge
+        # intervals are counted completely, as the entries claim
+        query = self.query(
+            buckets.truncate(start),
+            buckets.last_day(end),
+            filters,
+        )
+        return _dynamics_statement(query, buckets, split_by)
+
+    def _build_estimate_query(
+        self,
+        start: date,
+        end: date,
+        buckets: Buckets,
+        filters: AnalyticsFilters | None,
+        sample_percent: float,
+    ) -> Select[typing.Any]:
+        query = self.query(
+            buckets.truncate(start),
+            buckets.last_day(end),
+            filters,
+            sample_percent,
+        )
+        interval_start = buckets.expression(query.day()).label('date')
+        page = query.page()
+        pages = (
+            query.select(interval_start, query.count().label('count'))
+            .group_by(interval_start, page)
+            .subquery('pages')
+        )
+
+        return select(
+            pages.c.date,
+            func.sum(pages.c.count).label('count'),
+            func.sum(pages.c.count * pages.c.count).label('page_squares'),
+        ).group_by(pages.c.date)
+
+    def _build_comparison_query(
+        self,
+        dates: Sequence[date],
+        buckets: Buckets,
+        compare_to: Comparison,
+        filters: AnalyticsFilters | None,
+    ) -> Select[typing.Any]:
+        previous_dates = [buckets.previous(day, compare_to) for day in dates]
+        # both windows are read by one statement, with a range scan each,
+        # or with a single one when they overlap or touch
+        previous_end = buckets.last_day(previous_dates[-1])
+        windows = [(previous_dates[0], buckets.last_day(dates[-1]))]
+        if previous_end + timedelta(days=1) < dates[0]:
+            windows = [
+                (previous_dates[0], previous_end),
+                (dates[0], buckets.last_day(dates[-1])),
+            ]
+        totals = union_all(
+            *(
+                _dynamics_statement(
+                    self.query(window_start, window_end, filters),
+                    buckets,
+                ).order_by(None)
+                for window_start, window_end in windows
+            ),
+        ).cte('totals')
+
+        pairs = (
+            func.unnest(
+                literal(list(dates), ARRAY(Date)),
+                literal(previous_dates, ARRAY(Date)),
+            )
+            .table_valued(
+                column('date', Date),
+                column('previous_date', Date),
+            )
+            .render_derived(name='pairs')
+        )
+        current = totals.alias('current')
+        previous = totals.alias('previous')
+        count = func.coalesce(current.c.count, 0)
+        previous_count = func.coalesce(previous.c.count, 0)
+        amount = func.coalesce(current.c.amount, 0)
+        previous_amount = func.coalesce(previous.c.amount, 0)
+
+        return (
+            select(
+                pairs.c.date,
+                pairs.c.previous_date,
+                count.label('count'),
+                previous_count.label('previous_count'),
+                (count - previous_count).label('count_delta'),
+                _percent(count, previous_count).label('count_percent'),
+                amount.label('amount'),
+                previous_amount.label('previous_amount'),
+                (amount - previous_amount).label('amount_delta'),
+                _percent(amount, previous_amount).label('amount_percent'),
+            )
+            .select_from(pairs)
+            .outerjoin(current, current.c.date == pairs.c.date)
+            .outerjoin(previous, previous.c.date == pairs.c.previous_date)
+            .order_by(pairs.c.date)
+        )
+
+
+def _comparison_rows(
+    cube: Cube,
+    dates: Sequence[date],
+    buckets: Buckets,
+    compare_to: Comparison,
+    filters: AnalyticsFilters | None,
+) -> list[dict[str, typing.Any]]:
+    """The rows of the comparison statement reduced from the cube."""
+    previous_dates = [buckets.previous(day, compare_to) for day in dates]
+    totals = {
+        row['date']: (row['count'], row['amount'])
+        for row in cube.rows(
+            min(previous_dates[0], dates[0]),
+            buckets.last_day(dates[-1]),
+            buckets.truncate,
+            filters,
+        )
+    }
+
+    rows = []
+    for day, previous_day in zip(dates, previous_dates, strict=True):
+        count, amount = totals.get(day, (0, Decimal(0)))
+        previous_count, previous_amount = totals.get(
+            previous_day,
+            (0, Decimal(0)),
+        )
+        rows.append(
+            {
+                'date': day,
+                'previous_date': previous_day,
+                'count': count,
+                'previous_count': previous_count,
+                'count_delta': count - previous_count,
+                'count_percent': _percent_of(count, previous_count),
+                'amount': amount,
+                'previous_amount': previous_amount,
+                'amount_delta': amount - previous_amount,
+                'amount_percent': _percent_of(amount, previous_amount),
+            },
+        )
+
+    return rows
+
+
+def _percent_of(
+    value: Decimal | int,
+    previous: Decimal | int,
+) -> Decimal | None:
+    """The same as `_percent`, for the rows reduced from a cube."""
+    if previous == 0:
+        return None
+    change = Decimal(value - previous) * 100 / previous
+    return change.quantize(Decimal('0.01'), ROUND_HALF_UP)
 
-        dynamics = DynamicsByInterval(
+
+def _percent(value: typing.Any, previous: typing.Any) -> typing.Any:
+    """The change in percent of the previous value, NULL if it is zero."""
+    change = cast(value - previous, Numeric) * 100 / func.nullif(previous, 0)
+    return func.round(change, 2)
+
+
+def _dynamics_statement(
+    query: AnalyticsQuery,
+    buckets: Buckets,
+    split_by: Sequence[SplitBy] = (),
+) -> Select[typing.Any]:
+    interval_start = buckets.expression(query.day()).label('date')
+    dimensions = [
+        query.column(_SPLIT_COLUMNS[dimension]).label(dimension.value)
+        for dimension in split_by
+    ]
+
+    return (
+        query.select(
+            interval_start,
+            *dimensions,
+            query.count().label('count'),
+            query.amount_sum().label('amount'),
+        )
+        .group_by(interval_start, *dimensions)
+        .order_by(interval_start)
+    )
+
+
+# GROUPING() sets a bit for every column absent from the grouping set,
+# the first argument being the most significant one
+_GROUPING_SETS: typing.Final = {
+    0b01111: 'type',
+    0b10111: 'status',
+    0b11011: 'sender_bank',
+    0b11101: 'recipient_bank',
+    0b01110: 'category',
+}
+
+
+class DashboardService(BaseAnalytics):
+    """Computes all the dashboard statistics with a single scan.
+
+    Deleted transactions are not taken into account. The cube can't
+    answer it, as it hasn't got the banks among its dimensions, and
+    the scan would read the rollups for them anyway.
+    """
+
+    async def get(
+        self,
+        start: date,
+        end: date,
+        filters: AnalyticsFilters | None = None,
+    ) -> AnalyticsDashboard:
+        return await self.cached(
+            'dashboard',
+            (start, end, filters),
+            lambda: self._compute(start, end, filters),
+        )
+
+    async def _compute(
+        self,
+        start: date,
+        end: date,
+        filters: AnalyticsFilters | None,
+    ) -> AnalyticsDashboard:
+        rows = await self.rows(
+            lambda: self.build_query(start, end, filters),
+            'dashboard' if filters is None else None,
             start=start,
             end=end,
-            interval=interval,
-            entries=[r._mapping for r in result.all()],
-        )
-
-        if dynamics.entries:
-            # correct start and end according to the truncated interval
-            dynamics.start = dynamics.entries[0].date
-            dynamics.end = dynamics.entries[-1].date + delta
-
-        return dynamics
-
-    def _get_delta(self, interval: Interval) -> relativedelta:
-        match interval:
-            case Interval.WEEK:
-                return relativedelta(weeks=1)
-            case Interval.MONTH:
-                return relativedelta(months=1)
-            case Interval.QUARTER:
-                return relativedelta(months=3)
-            case Interval.YEAR:
-                return relativedelta(years=1)
-            case _:
-                # Ensure all cases are exhausted
-                # otherwise mypy will throw an error
-                typing.assert_never(interval)
+        )
+
+        rows_by_set: dict[str, list[Mapping[str, typing.Any]]] = {}
+        for row in rows:
+            rows_by_set.setdefault(row['grouping_set'], []).append(row)
+
+        return _DashboardBuilder(start, end, rows_by_set).build()
+
+    def build_query(
+        self,
+        start: date,
+        end: date,
+        filters: AnalyticsFilters | None = None,
+    ) -> Select[typing.Any]:
+        return _dashboard_statement(self.query(start, end, filters))
+
+
+def _dashboard_statement(query: AnalyticsQuery) -> Select[typing.Any]:
+    dimensions = [
+        query.column(name)
+        for name in (
+            'transaction_type',
+            'status',
+            'sender_bank_id',
+            'recipient_bank_id',
+            'category_id',
+        )
+    ]
+    # a plain GROUP BY can be split among parallel workers while
+    # GROUPING SETS can't, so they only combine the groups found
+    groups = (
+        query.select(
+            *dimensions,
+            query.count().label('count'),
+            query.amount_sum().label('amount'),
+        )
+        .where(query.column('status') != TransactionStatus.DELETED)
+        .group_by(*dimensions)
+        .cte('groups')
+    )
+    transaction_type = groups.c.transaction_type
+    status = groups.c.status
+    sender_bank_id = groups.c.sender_bank_id
+    recipient_bank_id = groups.c.recipient_bank_id
+    category_id = groups.c.category_id
+    count = cast(func.sum(groups.c.count), BigInteger)
+
+    grouping = func.grouping(
+        transaction_type,
+        status,
+        sender_bank_id,
+        recipient_bank_id,
+        category_id,
+    )
+    stats = (
+        select(
+            case(_GROUPING_SETS, value=grouping).label('grouping_set'),
+            transaction_type,
+            status,
+            sender_bank_id,
+            recipient_bank_id,
+            category_id,
+            count.label('total_transactions'),
+            func.sum(groups.c.amount).label('total_funds'),
+        )
+        .group_by(
+            func.grouping_sets(
+                tuple_(transaction_type),
+                tuple_(status),
+                tuple_(sender_bank_id),
+                tuple_(recipient_bank_id),
+                tuple_(transaction_type, category_id),
+            ),
+        )
+        # the rollups of the keys whose transactions
+        # have all moved elsewhere are kept with zeros
+        .having(count > 0)
+        .cte('stats')
+    )
+
+    bank_id = func.coalesce(
+        stats.c.sender_bank_id,
+        stats.c.recipient_bank_id,
+    )
+    return (
+        select(
+            stats,
+            col(Bank.name).label('bank_name'),
+            col(TransactionCategory.name).label('category_name'),
+        )
+        .select_from(stats)
+        .outerjoin(Bank, col(Bank.id) == bank_id)
+        .outerjoin(
+            TransactionCategory,
+            col(TransactionCategory.id) == stats.c.category_id,
+        )
+        .order_by(
+            stats.c.total_funds.desc(),
+            stats.c.total_transactions.desc(),
+        )
+    )
+
+
+class _DashboardBuilder:
+    def __init__(
+        self,
+        start: date,
+        end: date,
+        rows_by_set: Mapping[str, Sequence[Mapping[str, typing.Any]]],
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.rows_by_set = rows_by_set
+
+    def build(self) -> AnalyticsDashboard:
+        by_type = self._by_type()
+        return AnalyticsDashboard(
+            start=self.start,
+            end=self.end,
+            by_type=by_type,
+            received_and_spent=self._received_and_spent(by_type),
+            by_status=self._by_status(),
+            by_banks=self._by_banks(),
+            by_categories=self._by_categories(),
+        )
+
+    def _by_type(self) -> dict[TransactionType, DynamicsByType]:
+        by_type = {
+            transaction_type: DynamicsByType(
+                start=self.start,
+                end=self.end,
+                total_transactions=0,
+                total_funds=Decimal(0),
+            )
+            for transaction_type in TransactionType
+        }
+        for row in self.rows_by_set.get('type', ()):
+            by_type[row['transaction_type']] = DynamicsByType(
+                start=self.start,
+                end=self.end,
+                total_transactions=row['total_transactions'],
+                total_funds=row['total_funds'],
+            )
+
+        return by_type
+
+    def _received_and_spent(
+        self,
+        by_type: Mapping[TransactionType, DynamicsByType],
+    ) -> ReceivedAndSpentComparison:
+        received = by_type[TransactionType.CREDIT].total_funds
+        spent = by_type[TransactionType.DEBIT].total_funds
+        return ReceivedAndSpentComparison(
+            start=self.start,
+            end=self.end,
+            total_received=received,
+            total_spent=spent,
+            received_to_spent=received / spent if spent else Decimal(0),
+        )
+
+    def _by_status(self) -> DynamicsByStatus:
+        counts = {
+            row['status']: row['total_transactions']
+            for row in self.rows_by_set.get('status', ())
+        }
+        return DynamicsByStatus(
+            start=self.start,
+            end=self.end,
+            total_successful_transactions=counts.get(
+                TransactionStatus.EXECUTED,
+                0,
+            ),
+            total_cancelled_transactions=counts.get(
+                TransactionStatus.CANCELLED,
+                0,
+            ),
+        )
+
+    def _by_banks(self) -> DynamicsByBanks:
+        return DynamicsByBanks(
+            start=self.start,
+            end=self.end,
+            sender_banks=self._bank_statistics('sender_bank'),
+            recipient_banks=self._bank_statistics('recipient_bank'),
+        )
+
+    def _bank_statistics(self, grouping_set: str) -> list[BankStatistics]:
+        return [
+            BankStatistics(
+                bank=BankOutShort(
+                    id=row[f'{grouping_set}_id'],
+                    name=row['bank_name'],
+                ),
+                total_transactions=row['total_transactions'],
+                total_funds=row['total_funds'],
+            )
+            for row in self.rows_by_set.get(grouping_set, ())
+        ]
+
+    def _by_categories(self) -> DynamicsByCategories:
+        spending, income = [], []
+        for row in self.rows_by_set.get('category', ()):
+            statistics = CategoryStatistics(
+                category=TransactionCategoryOutShort(
+                    id=row['category_id'],
+                    name=row['category_name'],
+                ),
+                total_transactions=row['total_transactions'],
+                total_funds=row['total_funds'],
+            )
+            if row['transaction_type'] == TransactionType.DEBIT:
+                spending.append(statistics)
+            else:
+                income.append(statistics)
+
+        return DynamicsByCategories(
+            start=self.start,
+            end=self.end,
+            spending_categories=spending,
+            income_categories=income,
+        )
+
+
+# the percents of the reported percentiles
+PERCENTILES: typing.Final = (25, 50, 75, 90, 99)
+MAX_BINS: typing.Final = 100
+# the precision of the amounts
+_AMOUNT_EXPONENT: typing.Final = Decimal('0.00001')
+
+
+class AmountDistributionService(BaseAnalytics):
+    """Histograms and percentiles of the amounts, per split_by values.
+
+    Computed by the database over the transactions themselves, as the
+    rollups and the cubes keep the sums only. The buckets divide
+    the range from the smallest to the largest amount evenly, into `bins`
+    or, by default, into as many as Sturges' rule suggests for
+    the number of amounts.
+    Deleted transactions are not taken into account.
+
+    The result is plain data shaped like `AmountDistributions`,
+    meant to be serialized as is.
+    """
+
+    async def get(
+        self,
+        start: date,
+        end: date,
+        split_by: Sequence[SplitBy] = (),
+        filters: AnalyticsFilters | None = None,
+        bins: int | None = None,
+    ) -> dict[str, typing.Any]:
+        split_by = list(dict.fromkeys(split_by))
+        return await self.cached(
+            'amount_distribution',
+            (start, end, tuple(split_by), filters, bins),
+            lambda: self._compute(start, end, split_by, filters, bins),
+        )
+
+    async def _compute(
+        self,
+        start: date,
+        end: date,
+        split_by: Sequence[SplitBy],
+        filters: AnalyticsFilters | None,
+        bins: int | None,
+    ) -> dict[str, typing.Any]:
+        result = await self.execute(
+            self.build_query(start, end, split_by, filters, bins),
+        )
+
+        distributions: dict[tuple[typing.Any, ...], dict[str, typing.Any]] = {}
+        for row in result.mappings().all():
+            key = tuple(row[dimension.value] for dimension in split_by)
+            if key not in distributions:
+                distributions[key] = _distribution(split_by, key, row)
+
+            buckets = distributions[key]['buckets']
+            buckets[row['bucket'] - 1]['count'] = row['bucket_count']
+
+        return {
+            'start': start,
+            'end': end,
+            'split_by': split_by,
+            'distributions': list(distributions.values()),
+        }
+
+    def build_query(
+        self,
+        start: date,
+        end: date,
+        split_by: Sequence[SplitBy] = (),
+        filters: AnalyticsFilters | None = None,
+        bins: int | None = None,
+    ) -> Select[typing.Any]:
+        query = self.transactions_query(start, end, filters)
+        amounts = (
+            query.select(
+                *(
+                    query.column(_SPLIT_COLUMNS[dimension]).label(
+                        dimension.value,
+                    )
+                    for dimension in split_by
+                ),
+                query.column('amount'),
+            )
+            .where(query.column('status') != TransactionStatus.DELETED)
+            .cte('amounts')
+        )
+        amount = amounts.c.amount
+
+        def dimensions(source: typing.Any) -> list[typing.Any]:
+            return [source.c[dimension.value] for dimension in split_by]
+
+        bins_count: ColumnElement[typing.Any]
+        if bins is None:
+            # Sturges' rule
+            bins_count = func.least(
+                cast(func.ceil(func.log(2, func.count())), Integer) + 1,
+                MAX_BINS,
+            )
+        else:
+            bins_count = literal(bins, Integer, literal_execute=True)
+
+        stats = (
+            select(
+                *dimensions(amounts),
+                func.count().label('count'),
+                func.min(amount).label('min'),
+                func.max(amount).label('max'),
+                cast(
+                    func.percentile_cont(
+                        array([percent / 100 for percent in PERCENTILES]),
+                    ).within_group(amount),
+                    ARRAY(Numeric(12, 5)),
+                ).label('percentiles'),
+                bins_count.label('bins'),
+            )
+            .group_by(*dimensions(amounts))
+            .cte('stats')
+        )
+
+        # the largest amounts fall into the last bucket instead of
+        # a bucket of their own, and all the amounts fall into the first
+        # one if they are the same, which width_bucket can't split
+        bucket = func.coalesce(
+            func.least(
+                func.width_bucket(
+                    amount,
+                    stats.c.min,
+                    func.nullif(stats.c.max, stats.c.min),
+                    stats.c.bins,
+                ),
+                stats.c.bins,
+            ),
+            literal(1, literal_execute=True),
+        ).label('bucket')
+        histogram = (
+            select(
+                *dimensions(amounts),
+                bucket,
+                func.count().label('bucket_count'),
+            )
+            .select_from(
+                amounts.join(stats, _same(dimensions(amounts), stats)),
+            )
+            .group_by(*dimensions(amounts), bucket)
+            .cte('histogram')
+        )
+
+        return (
+            select(stats, histogram.c.bucket, histogram.c.bucket_count)
+            .select_from(
+                stats.join(histogram, _same(dimensions(histogram), stats)),
+            )
+            .order_by(
+                stats.c.count.desc(),
+                *dimensions(stats),
+                histogram.c.bucket,
+            )
+        )
+
+
+def _same(columns: Sequence[typing.Any], other: typing.Any) -> typing.Any:
+    """Joins the rows with the same values of the columns."""
+    return and_(
+        true(),
+        *(column == other.c[column.name] for column in columns),
+    )
+
+
+def _distribution(
+    split_by: Sequence[SplitBy],
+    key: tuple[typing.Any, ...],
+    row: RowMapping,
+) -> dict[str, typing.Any]:
+    low, high = row['min'], row['max']
+    bins = row['bins'] if low != high else 1
+    width = (high - low) / bins
+    edges = [(low + width * i).quantize(_AMOUNT_EXPONENT) for i in range(bins)]
+    edges.append(high)
+
+    return {
+        'key': dict(zip(split_by, key, strict=True)),
+        'count': row['count'],
+        'min': low,
+        'max': high,
+        'percentiles': dict(
+            zip(PERCENTILES, row['percentiles'], strict=True),
+        ),
+        'buckets': [
+            {'low': edges[i], 'high': edges[i + 1], 'count': 0}
+            for i in range(bins)
+        ],
+    }
+
+
+def _prepared_dynamics(
+    buckets: Buckets,
+    filters: AnalyticsFilters | None,
+) -> str | None:
+    if filters is not None or buckets.interval is Interval.DAY:
+        return None
+    return f'dynamics_by_{buckets.interval.value}'
+
+
+def _register_statements() -> None:
+    """Registers the statements of the unfiltered dashboard
+    and calendar dynamics, the ones the clients ask for the most."""
+    # given at the execution
+    query = RollupsQuery(
+        bindparam('user_id', None, type_=Integer),
+        bindparam('start', None, type_=Date),
+        bindparam('end', None, type_=Date),
+    )
+    statements.register('dashboard', _dashboard_statement(query))
+    for interval in Interval:
+        buckets = Buckets(interval, origin=date.min)
+        if name := _prepared_dynamics(buckets, None):
+            statements.register(name, _dynamics_statement(query, buckets))
+
+
+_register_statements()
@@ -0,0 +1,283 @@
+"""Balances of the accounts of a user over time.
+
+A balance is the sum of the account's checkpoints before the month
+of the day it is asked for, a range scan of the checkpoints' primary
+key, and of the account's transactions within that month, so no more
+than a month of them is read however long the history is. A series
+of days or weeks is seeded the same way in every month it covers,
+it only reads the transactions of its own months.
+"""
+
+from collections.abc import Sequence
+from datetime import date, timedelta
+from decimal import Decimal
+import typing
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import (
+    cast,
+    CompoundSelect,
+    Date,
+    func,
+    Select,
+    select,
+    union_all,
+)
+from sqlalchemy.engine import RowMapping
+from sqlmodel import col
+
+from models.transaction import AccountBalanceCheckpoint
+from schemas.analytics import (
+    AccountBalance,
+    BalanceEntry,
+    BalanceSeries,
+    Interval,
+)
+from services.analytics.base import BaseAnalytics
+from services.analytics.buckets import Buckets
+from services.analytics.query_builder import start_of_day, TransactionsQuery
+from services.ledger import balance_change, ledger_month, settled
+
+# intervals made of whole months, their changes are in the checkpoints
+_MONTHLY: typing.Final = frozenset(
+    {Interval.MONTH, Interval.QUARTER, Interval.YEAR},
+)
+
+
+class BalanceService(BaseAnalytics):
+    async def at(self, account_number: str, day: date) -> AccountBalance:
+        """The balance of the account at the end of the day."""
+        return await self.cached(
+            'balance',
+            (account_number, day),
+            lambda: self._compute_at(account_number, day),
+        )
+
+    async def series(
+        self,
+        account_number: str,
+        start: date,
+        end: date,
+        interval: Interval,
+    ) -> BalanceSeries:
+        """The balances of the account at the end of every interval."""
+        return await self.cached(
+            'balance_series',
+            (account_number, start, end, interval),
+            lambda: self._compute_series(
+                account_number,
+                start,
+                end,
+                Buckets(interval, start),
+            ),
+        )
+
+    async def _compute_at(
+        self,
+        account_number: str,
+        day: date,
+    ) -> AccountBalance:
+        opening = union_all(
+            *self._opening(account_number, day + timedelta(days=1)),
+        ).subquery('opening')
+        result = await self.execute(
+            select(func.coalesce(func.sum(opening.c.change), 0)),
+        )
+
+        return AccountBalance(
+            account_number=account_number,
+            date=day,
+            balance=result.scalar_one(),
+        )
+
+    async def _compute_series(
+        self,
+        account_number: str,
+        start: date,
+        end: date,
+        buckets: Buckets,
+    ) -> BalanceSeries:
+        dates = buckets.dates(start, end)
+        result = await self.execute(
+            self._build_series_query(account_number, dates, buckets),
+        )
+        rows = result.mappings().all()
+        if buckets.interval in _MONTHLY:
+            balances = _monthly_balances(rows, dates)
+        else:
+            balances = _daily_balances(rows, dates, buckets)
+
+        return BalanceSeries(
+            start=dates[0],
+            end=dates[-1] + buckets.delta,
+            account_number=account_number,
+            interval=buckets.interval,
+            entries=[
+                BalanceEntry(date=interval_start, balance=balance)
+                for interval_start, balance in zip(
+                    dates,
+                    balances,
+                    strict=True,
+                )
+            ],
+        )
+
+    def _build_series_query(
+        self,
+        account_number: str,
+        dates: Sequence[date],
+        buckets: Buckets,
+    ) -> CompoundSelect[typing.Any]:
+        """The changes of the balance within every interval
+        and, with a NULL date, the balance before the first one.
+
+        The intervals of days and weeks get the changes of every month
+        they cover from the checkpoints too, with a NULL date,
+        and their own changes split by the month.
+        """
+        first, last = dates[0], buckets.last_day(dates[-1])
+        month = col(AccountBalanceCheckpoint.month)
+        if buckets.interval in _MONTHLY:
+            interval_start = buckets.expression(month).label('date')
+            changes = (
+                self._checkpoints(account_number, interval_start)
+                .where(month >= first, month <= last)
+                .group_by(interval_start)
+            )
+            return union_all(
+                *self._opening(account_number, first),
+                changes,
+            )
+
+        first_month, last_month = first.replace(day=1), last.replace(day=1)
+        no_date = cast(None, Date).label('date')
+        opening = self._checkpoints(
+            account_number,
+            no_date,
+            cast(None, Date).label('month'),
+        ).where(month < first_month)
+        checkpoints = (
+            self._checkpoints(account_number, no_date, month.label('month'))
+            .where(month >= first_month, month < last_month)
+            .group_by(month)
+        )
+        query = TransactionsQuery.for_days(self.user_id, first_month, last)
+        interval_start = buckets.expression(query.day()).label('date')
+        transactions_month = ledger_month(query.column('occurred_at')).label(
+            'month',
+        )
+        changes = self._transactions(
+            account_number,
+            query,
+            interval_start,
+            transactions_month,
+        ).group_by(interval_start, transactions_month)
+
+        return union_all(opening, checkpoints, changes)
+
+    def _opening(
+        self,
+        account_number: str,
+        day: date,
+    ) -> list[Select[typing.Any]]:
+        """The parts of the balance at the start of the day:
+        the earlier months and the earlier days of its month."""
+        month = day.replace(day=1)
+        no_date = cast(None, Date).label('date')
+        checkpoints = self._checkpoints(account_number, no_date).where(
+            col(AccountBalanceCheckpoint.month) < month,
+        )
+        transactions = self._transactions(
+            account_number,
+            TransactionsQuery(
+                self.user_id,
+                start_at=start_of_day(month),
+                end_at=start_of_day(day),
+            ),
+            no_date,
+        )
+        return [checkpoints, transactions]
+
+    def _checkpoints(
+        self,
+        account_number: str,
+        *columns: typing.Any,
+    ) -> Select[typing.Any]:
+        change = func.sum(col(AccountBalanceCheckpoint.balance_change))
+        return select(change.label('change'), *columns).where(
+            col(AccountBalanceCheckpoint.user_id) == self.user_id,
+            col(AccountBalanceCheckpoint.account_number) == account_number,
+        )
+
+    @staticmethod
+    def _transactions(
+        account_number: str,
+        query: TransactionsQuery,
+        *columns: typing.Any,
+    ) -> Select[typing.Any]:
+        change = func.sum(balance_change(query.source))
+        return query.select(change.label('change'), *columns).where(
+            query.column('account_number') == account_number,
+            settled(query.source),
+        )
+
+
+def _monthly_balances(
+    rows: Sequence[RowMapping],
+    dates: Sequence[date],
+) -> list[Decimal]:
+    balance = Decimal(0)
+    changes: dict[date, Decimal] = {}
+    for row in rows:
+        if row['date'] is None:
+            balance += row['change'] or 0
+        else:
+            changes[row['date']] = row['change']
+
+    balances = []
+    for interval_start in dates:
+        balance += changes.get(interval_start, 0)
+        balances.append(balance)
+
+    return balances
+
+
+def _daily_balances(
+    rows: Sequence[RowMapping],
+    dates: Sequence[date],
+    buckets: Buckets,
+) -> list[Decimal]:
+    """The balance at the end of an interval is the one at the start
+    of its last month, from the checkpoints, and the changes
+    within that month up to the end of the interval."""
+    balance = Decimal(0)
+    checkpoints: dict[date, Decimal] = {}
+    changes: list[tuple[date, date, Decimal]] = []
+    for row in rows:
+        if row['month'] is None:
+            balance += row['change'] or 0
+        elif row['date'] is None:
+            checkpoints[row['month']] = row['change']
+        else:
+            changes.append((row['month'], row['date'], row['change']))
+
+    # popped from the end, the earliest first
+    changes.sort(reverse=True)
+    month, within = dates[0].replace(day=1), Decimal(0)
+    balances = []
+    for interval_start in dates:
+        last_month = buckets.last_day(interval_start).replace(day=1)
+        while month < last_month:
+            balance += checkpoints.get(month, 0)
+            month += relativedelta(months=1)
+            within = Decimal(0)
+
+        while changes and changes[-1][:2] <= (month, interval_start):
+            change_month, _, change = changes.pop()
+            # the earlier months are in the checkpoints
+            if change_month == month:
+                within += change
+
+        balances.append(balance + within)
+
+    return balances
@@ -1,30 +1,122 @@
-from functools import lru_cache
-from pathlib import Path
-from typing import ClassVar
+from collections.abc import Awaitable, Callable, Hashable, Mapping, Sequence
+from datetime import date
+import typing
+import warnings
 
-from sqlalchemy import text, TextClause
+from sqlalchemy import Executable, Result, Select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.config import settings
+from db.prepared import statements
 from models.user import User
+from schemas.analytics import AnalyticsFilters
+from services.analytics.cache import analytics_cache
+from services.analytics.cube import analytics_cubes, Cube
+from services.analytics.query_builder import (
+    analytics_query,
+    AnalyticsQuery,
+    TransactionsQuery,
+)
 
 
 class BaseAnalytics:
-    QUERIES_DIR: ClassVar[Path] = (
-        settings.BASE_DIR / 'services' / 'analytics' / 'queries'
-    )
-
-    query_template: ClassVar[Path | None] = None
-
     def __init__(self, session: AsyncSession, user: User):
         self.session = session
         self.user = user
 
-    def get_query(self) -> TextClause:
-        return _load_query(self.query_template)
+    @property
+    def user_id(self) -> int | None:
+        """The user whose data is analysed, None stands for all users."""
+        return typing.cast(int, self.user.id)
+
+    def query(
+        self,
+        start: date,
+        end: date,
+        filters: AnalyticsFilters | None,
+        sample_percent: float | None = None,
+    ) -> AnalyticsQuery:
+        return analytics_query(
+            self.user_id,
+            start,
+            end,
+            filters,
+            sample_percent,
+        )
+
+    def transactions_query(
+        self,
+        start: date,
+        end: date,
+        filters: AnalyticsFilters | None,
+    ) -> TransactionsQuery:
+        """For the statements the rollups can't serve at all."""
+        return TransactionsQuery.for_days(self.user_id, start, end, filters)
+
+    async def cached[T](
+        self,
+        name: str,
+        params: Hashable,
+        compute: Callable[[], Awaitable[T]],
+    ) -> T:
+        """Returns the result computed for the same user, name and params,
+        unless the user's transactions have been written since."""
+        return await analytics_cache.get_or_compute(
+            typing.cast(int, self.user.id),
+            name,
+            params,
+            compute,
+        )
+
+    async def cube(self, filters: AnalyticsFilters | None) -> Cube | None:
+        """The cube of the user's data, built by the first call after
+        a write, or None when the cubes are off or the filters
+        need more than its dimensions.
+
+        The dynamics and their comparisons are answered from it,
+        the dashboard needs the banks and the distribution
+        the single amounts, which it hasn't got.
+        """
+        user_id = self.user_id
+        if (
+            user_id is None
+            or not analytics_cubes.enabled
+            or not Cube.supports(filters)
+        ):
+            return None
+
+        # read before the scan, like the version of a cached result
+        version = analytics_cache.version(user_id)
+        cube = analytics_cubes.get(user_id, version)
+        if cube is None:
+            result = await self.execute(Cube.build_query(user_id))
+            cube = Cube(result.mappings().all())
+            analytics_cubes.put(user_id, version, cube)
+
+        return cube
+
+    async def rows(
+        self,
+        build: Callable[[], Select[typing.Any]],
+        prepared: str | None = None,
+        **params: typing.Any,
+    ) -> Sequence[Mapping[str, typing.Any]]:
+        """Executes the `prepared` statement with the user and the params
+        if the connection has got it, otherwise builds the statement."""
+        if prepared is not None and self.user_id is not None:
+            rows = await statements.fetch(
+                self.session,
+                prepared,
+                {'user_id': self.user_id, **params},
+            )
+            if rows is not None:
+                return rows
 
+        result = await self.execute(build())
+        return typing.cast(
+            Sequence[Mapping[str, typing.Any]],
+            result.mappings().all(),
+        )
 
-@lru_cache
-def _load_query(filepath: Path) -> TextClause:
-    with open(filepath, 'r') as f:
-        return text(f.read())
+    async def execute(self, query: Executable) -> Result[typing.Any]:
+        with warnings.catch_warnings(action='ignore'):
+            return await self.session.execute(query)
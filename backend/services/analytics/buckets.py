@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+import typing
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import cast, Date, DateTime, func
+
+from schemas.analytics import Comparison, Interval
+from services.common import inline_literal
+
+
+class Buckets:
+    """Splits days into the intervals of the dynamics.
+
+    The splitting is done twice: by the database to group the rows
+    and in Python to list every interval, the empty ones included.
+    Calendar intervals follow date_trunc, days are binned with date_bin
+    in `step`-day steps counted from `origin`.
+    """
+
+    def __init__(self, interval: Interval, origin: date, step: int = 1):
+        if step < 1 or (step != 1 and interval is not Interval.DAY):
+            raise ValueError('only day buckets can be stepped')
+
+        self.interval = interval
+        self.origin = origin
+        self.step = step
+
+    @property
+    def delta(self) -> relativedelta:
+        match self.interval:
+            case Interval.DAY:
+                return relativedelta(days=self.step)
+            case Interval.WEEK:
+                return relativedelta(weeks=1)
+            case Interval.MONTH:
+                return relativedelta(months=1)
+            case Interval.QUARTER:
+                return relativedelta(months=3)
+            case Interval.YEAR:
+                return relativedelta(years=1)
+            case _:
+                # Ensure all cases are exhausted
+                # otherwise mypy will throw an error
+                typing.assert_never(self.interval)
+
+    def truncate(self, day: date) -> date:
+        """Returns the start of the interval the day belongs to."""
+        match self.interval:
+            case Interval.DAY:
+                offset = (day - self.origin).days // self.step * self.step
+                return self.origin + timedelta(days=offset)
+            case Interval.WEEK:
+                return day - timedelta(days=day.weekday())
+            case Interval.MONTH:
+                return day.replace(day=1)
+            case Interval.QUARTER:
+                return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+            case Interval.YEAR:
+                return day.replace(month=1, day=1)
+            case _:
+                typing.assert_never(self.interval)
+
+    def expression(self, day: typing.Any) -> typing.Any:
+        """SQL counterpart of `truncate`."""
+        timestamp = cast(day, DateTime)
+        if self.interval is Interval.DAY:
+            truncated = func.date_bin(
+                inline_literal(timedelta(days=self.step)),
+                timestamp,
+                cast(inline_literal(self.origin), DateTime),
+            )
+        else:
+            truncated = func.date_trunc(
+                inline_literal(self.interval.value),
+                timestamp,
+            )
+
+        return cast(truncated, Date)
+
+    def previous(self, day: date, comparison: Comparison) -> date:
+        """The start of the interval the one starting on `day`
+        is compared to."""
+        if comparison is Comparison.PREVIOUS_PERIOD:
+            return day - self.delta
+        return self.truncate(day - relativedelta(years=1))
+
+    def dates(self, start: date, end: date) -> list[date]:
+        """The starts of the intervals covering the days
+        from `start` to `end` inclusive."""
+        last = self.truncate(end)
+
+        dates = [self.truncate(start)]
+        while dates[-1] + self.delta <= last:
+            dates.append(dates[-1] + self.delta)
+
+        return dates
+
+    def last_day(self, end: date) -> date:
+        """The last day of the interval `end` belongs to."""
+        return self.truncate(end) + self.delta - timedelta(days=1)
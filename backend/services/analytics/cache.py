@@ -0,0 +1,87 @@
+"""In-process cache of analytics results.
+
+Every user has a data version, which the transaction write paths bump
+right after their commit. The version is a part of the key, so a write
+makes all the user's cached results unreachable at once, and a result
+computed while a write was in flight is stored under the version read
+before the computation, where no one will look for it again.
+
+The results name the banks and the categories, so their updates bump
+a version shared by all users, which is a part of the key as well.
+"""
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+import typing
+
+MAX_ENTRIES: typing.Final = 10_000
+
+type _Key = tuple[int, int, int, str, Hashable]
+
+
+class CacheStats(typing.NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+
+
+class AnalyticsCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._versions: dict[int, int] = {}
+        self._shared_version = 0
+        # least recently used first
+        self._entries: OrderedDict[_Key, typing.Any] = OrderedDict()
+
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        for user_id in user_ids:
+            self._versions[user_id] = self.version(user_id) + 1
+
+    def invalidate_all(self) -> None:
+        self._shared_version += 1
+
+    async def get_or_compute[T](
+        self,
+        user_id: int,
+        name: str,
+        params: Hashable,
+        compute: Callable[[], Awaitable[T]],
+    ) -> T:
+        key = (
+            user_id,
+            self._shared_version,
+            self.version(user_id),
+            name,
+            params,
+        )
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return typing.cast(T, self._entries[key])
+
+        self.misses += 1
+        result = await compute()
+
+        self._entries[key] = result
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        return result
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, len(self._entries))
+
+    def clear(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._versions.clear()
+        self._shared_version = 0
+        self._entries.clear()
+
+
+analytics_cache = AnalyticsCache()
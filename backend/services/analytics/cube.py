@@ -0,0 +1,286 @@
+"""In-process cubes of the daily rollups of the users.
+
+A cube holds a user's rollups summed up to day x category x type
+x status cells, as columns of numpy arrays sorted by day, so a range
+of days is found by bisection and reduced without the database:
+the filters are boolean masks and the groups are summed up at once.
+It is built lazily from a single scan of the user's rollups and kept
+under the data version of the user, like the cached results: a write
+makes it unreachable and the next read builds it again.
+
+The cubes are evicted least recently used first to keep their total
+size within a memory budget, a zero budget turns them off.
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from datetime import date
+from decimal import Decimal
+import typing
+
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy import func, or_, Select, select
+from sqlmodel import col
+
+from core.config import settings
+from models.transaction import (
+    TransactionDailyRollup,
+    TransactionStatus,
+    TransactionType,
+)
+from schemas.analytics import AnalyticsFilters, SplitBy
+
+# the filters on the dimensions of the cube
+FILTERS: typing.Final = frozenset(
+    {'status', 'transaction_type', 'category_id'},
+)
+
+# the amounts are kept as integers of the smallest unit, so they add up
+# exactly and quickly, the rollups keep five decimal places
+_AMOUNT_EXPONENT: typing.Final = -5
+
+_TYPES: typing.Final = list(TransactionType)
+_STATUSES: typing.Final = list(TransactionStatus)
+
+
+class Cube:
+    def __init__(
+        self,
+        rows: Iterable[Mapping[typing.Any, typing.Any]],
+    ) -> None:
+        days: list[int] = []
+        category_ids: list[int] = []
+        types: list[int] = []
+        statuses: list[int] = []
+        counts: list[int] = []
+        amounts: list[int] = []
+        for row in rows:
+            days.append(row['day'].toordinal())
+            category_ids.append(row['category_id'])
+            types.append(_TYPES.index(row['transaction_type']))
+            statuses.append(_STATUSES.index(row['status']))
+            counts.append(row['count'])
+            amounts.append(int(row['amount'].scaleb(-_AMOUNT_EXPONENT)))
+
+        self.days = np.array(days, dtype=np.int32)
+        self.category_ids = np.array(category_ids, dtype=np.int64)
+        self.types = np.array(types, dtype=np.int8)
+        self.statuses = np.array(statuses, dtype=np.int8)
+        self.counts = np.array(counts, dtype=np.int64)
+        # int64 holds the sums of a few million of the largest amounts
+        self.amounts = np.array(amounts, dtype=np.int64)
+
+    @classmethod
+    def supports(cls, filters: AnalyticsFilters | None) -> bool:
+        if filters is None:
+            return True
+        return filters.model_dump(exclude_none=True).keys() <= FILTERS
+
+    @staticmethod
+    def build_query(user_id: int) -> Select[typing.Any]:
+        """The scan the cube of the user is built from."""
+        key = [
+            col(TransactionDailyRollup.day),
+            col(TransactionDailyRollup.category_id),
+            col(TransactionDailyRollup.transaction_type),
+            col(TransactionDailyRollup.status),
+        ]
+        count = func.sum(col(TransactionDailyRollup.transactions_count))
+        amount = func.sum(col(TransactionDailyRollup.amount_sum))
+        return (
+            select(*key, count.label('count'), amount.label('amount'))
+            .where(col(TransactionDailyRollup.user_id) == user_id)
+            .group_by(*key)
+            # the rollups of the keys whose transactions
+            # have all moved elsewhere are kept with zeros
+            .having(or_(count != 0, amount != 0))
+            .order_by(col(TransactionDailyRollup.day))
+        )
+
+    @property
+    def size(self) -> int:
+        """The memory taken by the cells, in bytes."""
+        columns = (
+            self.days,
+            self.category_ids,
+            self.types,
+            self.statuses,
+            self.counts,
+            self.amounts,
+        )
+        return sum(column.nbytes for column in columns)
+
+    def rows(
+        self,
+        start: date,
+        end: date,
+        truncate: Callable[[date], date],
+        filters: AnalyticsFilters | None = None,
+        split_by: Sequence[SplitBy] = (),
+    ) -> list[dict[str, typing.Any]]:
+        """Counts and amount sums of the days from `start` to `end`
+        inclusive, grouped by the interval `truncate` maps a day to
+        and by the split_by dimensions.
+
+        The rows are shaped like the ones of the dynamics statements.
+        """
+        cells = slice(
+            np.searchsorted(self.days, start.toordinal(), side='left'),
+            np.searchsorted(self.days, end.toordinal(), side='right'),
+        )
+        matches = self._mask(cells, filters)
+        days = self.days[cells][matches]
+        if days.size == 0:
+            return []
+
+        # the distinct days are few, each one is truncated once
+        distinct_days, day_positions = np.unique(days, return_inverse=True)
+        day_intervals = [
+            truncate(date.fromordinal(int(day))) for day in distinct_days
+        ]
+        intervals = sorted(set(day_intervals))
+        interval_positions = {day: i for i, day in enumerate(intervals)}
+        interval_of_day = np.array(
+            [interval_positions[day] for day in day_intervals],
+        )
+
+        keys = np.column_stack(
+            [
+                interval_of_day[day_positions],
+                *(
+                    self._column(dimension)[cells][matches]
+                    for dimension in split_by
+                ),
+            ],
+        )
+        # np.unique sorts the keys, so the rows come ordered by interval
+        groups, group_positions = np.unique(
+            keys,
+            axis=0,
+            return_inverse=True,
+        )
+        group_positions = group_positions.reshape(-1)
+        counts = np.zeros(len(groups), dtype=np.int64)
+        np.add.at(counts, group_positions, self.counts[cells][matches])
+        amounts = np.zeros(len(groups), dtype=np.int64)
+        np.add.at(amounts, group_positions, self.amounts[cells][matches])
+
+        return [
+            {
+                'date': intervals[interval],
+                **{
+                    dimension.value: _value(dimension, value)
+                    for dimension, value in zip(split_by, values, strict=True)
+                },
+                'count': count,
+                'amount': Decimal(amount).scaleb(_AMOUNT_EXPONENT),
+            }
+            for (interval, *values), count, amount in zip(
+                groups.tolist(),
+                counts.tolist(),
+                amounts.tolist(),
+                strict=True,
+            )
+        ]
+
+    def _mask(
+        self,
+        cells: slice,
+        filters: AnalyticsFilters | None,
+    ) -> npt.NDArray[np.bool_]:
+        matches = np.ones(len(self.days[cells]), dtype=np.bool_)
+        if filters is not None:
+            if filters.status is not None:
+                status = _STATUSES.index(filters.status)
+                matches &= self.statuses[cells] == status
+            if filters.transaction_type is not None:
+                transaction_type = _TYPES.index(filters.transaction_type)
+                matches &= self.types[cells] == transaction_type
+            if filters.category_id is not None:
+                matches &= self.category_ids[cells] == filters.category_id
+
+        return matches
+
+    def _column(self, dimension: SplitBy) -> npt.NDArray[np.integer]:
+        match dimension:
+            case SplitBy.TYPE:
+                return self.types
+            case SplitBy.STATUS:
+                return self.statuses
+            case SplitBy.CATEGORY:
+                return self.category_ids
+            case _:
+                typing.assert_never(dimension)
+
+
+def _value(dimension: SplitBy, value: int) -> typing.Any:
+    """The value of the dimension its column holds the code of."""
+    match dimension:
+        case SplitBy.TYPE:
+            return _TYPES[value]
+        case SplitBy.STATUS:
+            return _STATUSES[value]
+        case SplitBy.CATEGORY:
+            return value
+        case _:
+            typing.assert_never(dimension)
+
+
+class CubeStats(typing.NamedTuple):
+    hits: int
+    misses: int
+    cubes: int
+    size: int
+
+
+class CubeCache:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        # least recently used first
+        self._cubes: OrderedDict[int, tuple[int, Cube]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, user_id: int, version: int) -> Cube | None:
+        """Returns the cube of the user's data of the version."""
+        cached = self._cubes.get(user_id)
+        if cached is None or cached[0] != version:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._cubes.move_to_end(user_id)
+        return cached[1]
+
+    def put(self, user_id: int, version: int, cube: Cube) -> None:
+        self._discard(user_id)
+        if cube.size > self.max_bytes:
+            return
+
+        self._cubes[user_id] = (version, cube)
+        self.size += cube.size
+        while self.size > self.max_bytes:
+            self._discard(next(iter(self._cubes)))
+
+    def stats(self) -> CubeStats:
+        return CubeStats(self.hits, self.misses, len(self._cubes), self.size)
+
+    def clear(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._cubes.clear()
+
+    def _discard(self, user_id: int) -> None:
+        cached = self._cubes.pop(user_id, None)
+        if cached is not None:
+            self.size -= cached[1].size
+
+
+analytics_cubes = CubeCache(settings.ANALYTICS_CUBE_MEMORY_BYTES)
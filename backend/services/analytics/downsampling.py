@@ -0,0 +1,43 @@
+from collections.abc import Sequence
+import typing
+
+# the first, the last and at least one point in between
+MIN_POINTS: typing.Final = 3
+
+
+def lttb(values: Sequence[float], max_points: int) -> list[int]:
+    """Picks the indices of the points to chart, at most `max_points`.
+
+    Largest-Triangle-Three-Buckets: the first and the last points are
+    kept, the rest are split into equal buckets, and every bucket keeps
+    the point forming the largest triangle with the point kept before
+    and the average of the next bucket. Unlike taking every n-th point,
+    the peaks survive. The points are assumed to be equally spaced.
+    """
+    size = len(values)
+    if max_points >= size or max_points < MIN_POINTS:
+        return list(range(size))
+
+    every = (size - 2) / (max_points - 2)
+    indices = [0]
+    kept = 0
+    for bucket in range(max_points - 2):
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, size)
+        next_x = (next_start + next_end - 1) / 2
+        next_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = -1, -1.0
+        for i in range(int(bucket * every) + 1, next_start):
+            area = abs(
+                (kept - next_x) * (values[i] - values[kept])
+                - (kept - i) * (next_y - values[kept]),
+            )
+            if area > best_area:
+                best, best_area = i, area
+
+        indices.append(best)
+        kept = best
+
+    indices.append(size - 1)
+    return indices
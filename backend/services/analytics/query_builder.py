@@ -0,0 +1,259 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timedelta, timezone
+import typing
+from typing import Any
+
+from sqlalchemy import (
+    BindParameter,
+    ColumnElement,
+    Float,
+    FromClause,
+    func,
+    literal,
+    literal_column,
+    Select,
+    select,
+    tablesample,
+)
+from sqlalchemy.orm import class_mapper
+
+from models.base import BaseModel
+from models.transaction import Transaction, TransactionDailyRollup
+from schemas.analytics import AnalyticsFilters
+from services.rollups import rollup_day
+
+SAMPLE: typing.Final = 'sample'
+
+# a value or a parameter to bind it to when the statement is executed
+type SqlValue[T] = T | BindParameter[T]
+
+
+def start_of_day(day: date) -> datetime:
+    return datetime.combine(day, time(), tzinfo=timezone.utc)
+
+
+class AnalyticsQuery(ABC):
+    """Builds analytics statements over the data of a user.
+
+    The filters compile into plain comparisons of the raw columns,
+    so they narrow the index scan instead of being applied to its
+    result. The dimensions and the aggregates are exposed by name,
+    so a service builds the same statement over either source.
+    Without a user the statements cover the data of all users.
+    With a sample percent they read only the sampled pages of the table.
+    """
+
+    model: typing.ClassVar[type[BaseModel]]
+
+    def __init__(
+        self,
+        user_id: SqlValue[int] | None,
+        filters: AnalyticsFilters | None = None,
+        sample_percent: float | None = None,
+    ) -> None:
+        self.user_id = user_id
+        self.filters = filters
+        self.sample_percent = sample_percent
+
+        table = class_mapper(self.model).local_table
+        self.source: FromClause = table
+        if sample_percent is not None:
+            self.source = tablesample(
+                table,
+                func.system(
+                    literal(sample_percent, Float, literal_execute=True),
+                ),
+                name=SAMPLE,
+            )
+
+    def column(self, name: str) -> Any:
+        return self.source.c[name]
+
+    def page(self) -> Any:
+        """The number of the table page the row is stored in,
+        the unit TABLESAMPLE SYSTEM picks."""
+        name = (
+            self.model.__tablename__ if self.sample_percent is None else SAMPLE
+        )
+        return literal_column(f'({name}.ctid::text::point)[0]')
+
+    @abstractmethod
+    def day(self) -> Any: ...
+
+    @abstractmethod
+    def count(self) -> Any: ...
+
+    @abstractmethod
+    def amount_sum(self) -> Any: ...
+
+    def conditions(self) -> list[ColumnElement[bool]]:
+        return [
+            *self._user_conditions(),
+            *self._range_conditions(),
+            *self._filter_conditions(),
+        ]
+
+    def select(self, *columns: Any) -> Select[Any]:
+        return select(*columns).where(*self.conditions())
+
+    def _user_conditions(self) -> list[ColumnElement[bool]]:
+        if self.user_id is None:
+            return []
+        return [self.column('user_id') == self.user_id]
+
+    @abstractmethod
+    def _range_conditions(self) -> list[ColumnElement[bool]]: ...
+
+    def _filter_conditions(self) -> list[ColumnElement[bool]]:
+        if self.filters is None:
+            return []
+
+        conditions = []
+        for field, value in self.filters.model_dump(exclude_none=True).items():
+            match field:
+                case 'amount_min':
+                    conditions.append(self.column('amount') >= value)
+                case 'amount_max':
+                    conditions.append(self.column('amount') <= value)
+                case _:
+                    conditions.append(self.column(field) == value)
+
+        return conditions
+
+
+class TransactionsQuery(AnalyticsQuery):
+    """Reads the transactions themselves.
+
+    Every statement gets the user equality and a half-open range
+    on the raw `occurred_at`, which is the shape the (user_id, ...,
+    occurred_at) indexes serve with a single range scan.
+    Computed expressions (date_trunc and such) may be selected
+    and grouped by, but never filtered on.
+    """
+
+    model = Transaction
+
+    def __init__(
+        self,
+        user_id: int | None,
+        start_at: datetime,
+        end_at: datetime,
+        filters: AnalyticsFilters | None = None,
+        sample_percent: float | None = None,
+    ) -> None:
+        super().__init__(user_id, filters, sample_percent)
+        self.start_at = start_at
+        self.end_at = end_at
+
+    @classmethod
+    def for_days(
+        cls,
+        user_id: int | None,
+        start: date,
+        end: date,
+        filters: AnalyticsFilters | None = None,
+        sample_percent: float | None = None,
+    ) -> 'TransactionsQuery':
+        """Covers whole days from `start` to `end` inclusive."""
+        return cls(
+            user_id,
+            start_at=start_of_day(start),
+            end_at=start_of_day(end + timedelta(days=1)),
+            filters=filters,
+            sample_percent=sample_percent,
+        )
+
+    def day(self) -> Any:
+        return rollup_day(self.column('occurred_at'))
+
+    def count(self) -> Any:
+        return func.count()
+
+    def amount_sum(self) -> Any:
+        return func.sum(self.column('amount'))
+
+    def _range_conditions(self) -> list[ColumnElement[bool]]:
+        return [
+            self.column('occurred_at') >= self.start_at,
+            self.column('occurred_at') < self.end_at,
+        ]
+
+
+class RollupsQuery(AnalyticsQuery):
+    """Reads the daily rollups.
+
+    The cost depends on the number of days in the range
+    rather than on the number of transactions in it.
+    Only the filters on the rollup key are supported. They are never
+    sampled: a row stands for a whole day of a user, so a sample of
+    their few pages would save little and add a lot of variance.
+    """
+
+    model = TransactionDailyRollup
+
+    FILTERS: typing.ClassVar[frozenset[str]] = frozenset(
+        {
+            'sender_bank_id',
+            'recipient_bank_id',
+            'status',
+            'transaction_type',
+            'category_id',
+        },
+    )
+
+    def __init__(
+        self,
+        user_id: SqlValue[int] | None,
+        start: SqlValue[date],
+        end: SqlValue[date],
+        filters: AnalyticsFilters | None = None,
+    ) -> None:
+        if not self.supports(filters):
+            raise ValueError('the filters require the transactions')
+
+        super().__init__(user_id, filters)
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def supports(cls, filters: AnalyticsFilters | None) -> bool:
+        if filters is None:
+            return True
+        return filters.model_dump(exclude_none=True).keys() <= cls.FILTERS
+
+    def day(self) -> Any:
+        return self.column('day')
+
+    def count(self) -> Any:
+        return func.sum(self.column('transactions_count'))
+
+    def amount_sum(self) -> Any:
+        return func.sum(self.column('amount_sum'))
+
+    def _range_conditions(self) -> list[ColumnElement[bool]]:
+        return [
+            self.column('day') >= self.start,
+            self.column('day') <= self.end,
+        ]
+
+
+def analytics_query(
+    user_id: int | None,
+    start: date,
+    end: date,
+    filters: AnalyticsFilters | None = None,
+    sample_percent: float | None = None,
+) -> AnalyticsQuery:
+    """Reads the rollups unless a filter needs a column they don't keep
+    or the transactions are sampled, the days from `start` to `end`
+    are covered inclusively."""
+    if sample_percent is None and RollupsQuery.supports(filters):
+        return RollupsQuery(user_id, start, end, filters)
+
+    return TransactionsQuery.for_days(
+        user_id,
+        start,
+        end,
+        filters,
+        sample_percent,
+    )
@@ -0,0 +1,483 @@
+"""A columnar replica of the transactions for the heavy reports.
+
+The transactions are exported into Parquet files on local disk
+incrementally: every export copies the rows changed since the previous
+one into a new part, and a row changed several times is taken from
+the latest part it is in. A part is a directory of files partitioned
+by the month of the transactions, hive-style (`month=2024-07/`),
+so a report reads only the files of the months in its range.
+The reports of all users are computed from the parts by DuckDB,
+an embedded columnar engine, with the same statements
+as on the database, the rollups being aggregated from the transactions
+on the fly.
+
+Only the changes are copied, so the rows removed from the table
+for real (the API only marks them DELETED) stay in the replica until
+a full export replaces all the parts. The replica serves the reports
+as long as it is no older than the allowed staleness, otherwise
+they are read from the database.
+
+The reports of a single user are never read from the replica: they
+are a range scan of the user's rollups, cached until the user writes,
+and must show the user's own writes at once, which a replica lagging
+behind by minutes doesn't.
+"""
+
+import asyncio
+from collections.abc import Mapping, Sequence
+from datetime import date, datetime, timedelta, timezone
+import json
+from pathlib import Path
+import shutil
+import typing
+from typing import Any, Final
+
+from asyncpg import Connection
+import duckdb
+from sqlalchemy import (
+    column,
+    Date,
+    DateTime,
+    FromClause,
+    func,
+    Integer,
+    Numeric,
+    Select,
+    select,
+    table,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine.default import DefaultDialect
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.types import TypeEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.logging import logger
+from models.bank import Bank
+from models.base import BaseModel
+from models.transaction import (
+    Transaction,
+    TransactionCategory,
+    TransactionDailyRollup,
+)
+from services.rollups import aggregated_transactions
+
+MANIFEST: Final = 'manifest.json'
+
+# the month of a transaction in UTC, as the days of the reports,
+# which partitions the files of the parts
+_MONTH: Final = "strftime(timezone('UTC', occurred_at), '%Y-%m')"
+_MONTH_FORMAT: Final = '%Y-%m'
+_HIVE_TYPES: Final = "hive_types = {'month': 'VARCHAR'}"
+
+# the tables the reports read besides the transactions,
+# they are small and copied whole by every export
+_TABLES: Final[tuple[type[BaseModel], ...]] = (Bank, TransactionCategory)
+
+# the functions of Postgres the statements use
+# which DuckDB has under other names
+_MACROS: Final = (
+    'CREATE MACRO date_bin(stride, source, origin) AS '
+    'time_bucket(stride, source, origin)',
+    'CREATE MACRO make_interval(secs := 0) AS '
+    'to_microseconds(CAST(secs * 1000000 AS BIGINT))',
+)
+
+_ACTIVITY: Final = table(
+    'pg_stat_activity',
+    column('pid'),
+    column('datname'),
+    column('backend_type'),
+    column('xact_start'),
+)
+
+# the statements are rendered for Postgres, whose SQL DuckDB follows,
+# and their results are converted like those of any database
+_COMPILE_DIALECT: Final = postgresql.dialect()  # type: ignore[no-untyped-call]
+_RESULT_DIALECT: Final = DefaultDialect()
+
+
+class Manifest(typing.NamedTuple):
+    # the changes made before it are all in the parts
+    watermark: datetime
+    # the directories of the transactions parts, the oldest first
+    parts: list[str]
+    # the files of the other tables by their names
+    tables: dict[str, str]
+    # the number of the export which wrote it
+    batch: int
+
+
+def changed_at(source: FromClause) -> Any:
+    """When the row was last written, the rows never updated
+    have got no `updated_at`."""
+    return func.coalesce(source.c.updated_at, source.c.created_at)
+
+
+class ColumnarReplica:
+    def __init__(self, directory: Path, max_staleness: timedelta) -> None:
+        self.directory = directory
+        self.max_staleness = max_staleness
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_staleness > timedelta(0)
+
+    def manifest(self) -> Manifest | None:
+        """The contents of the replica, None before the first export
+        or if the manifest can't be read."""
+        try:
+            data = json.loads((self.directory / MANIFEST).read_text())
+            return Manifest(
+                watermark=datetime.fromisoformat(data['watermark']),
+                parts=list(data['parts']),
+                tables=dict(data['tables']),
+                batch=int(data['batch']),
+            )
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError, KeyError) as e:
+            # the reports fall back to the database
+            # and the next export copies everything again
+            logger.warning(f'the analytics replica manifest is invalid: {e}')
+            return None
+
+    def fresh(self) -> Manifest | None:
+        """The contents of the replica if it may serve the reports."""
+        if not self.enabled:
+            return None
+
+        manifest = self.manifest()
+        if manifest is None or (
+            datetime.now(timezone.utc) - manifest.watermark
+            > self.max_staleness
+        ):
+            return None
+
+        return manifest
+
+    async def export(
+        self,
+        session: AsyncSession,
+        full: bool = False,
+    ) -> Manifest:
+        """Copies the transactions changed since the previous export
+        into a new part, or all of them into the only one if `full`.
+        No part is added if nothing has changed.
+
+        The exports must not run concurrently. The files the replica
+        doesn't need anymore are removed by the next export, so the
+        reports being read from them while this one runs can finish.
+        """
+        current = self.manifest()
+        batch = 1 if current is None else current.batch + 1
+        since = None if full or current is None else current.watermark
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        connection = await session.connection()
+        # the timestamps are written out in UTC for DuckDB to read
+        await connection.execute(
+            select(func.set_config('TimeZone', 'UTC', True)),
+        )
+        watermark = (await connection.execute(_watermark())).scalar_one()
+
+        transactions = class_mapper(Transaction).local_table
+        query = select(transactions)
+        if since is not None:
+            query = query.where(changed_at(transactions) >= since)
+
+        statements: list[tuple[type[BaseModel], Select[Any]]] = [
+            (Transaction, query),
+            *((model, select(model)) for model in _TABLES),
+        ]
+        raw_connection = await connection.get_raw_connection()
+        driver = typing.cast(Connection, raw_connection.driver_connection)
+        copies: list[tuple[type[BaseModel], Path, int]] = []
+        for model, statement in statements:
+            path = self._file(model, batch, '.csv')
+            copied = await driver.copy_from_query(
+                _sql(statement),
+                output=path,
+                format='csv',
+                header=True,
+            )
+            copies.append((model, path, int(copied.split()[-1])))
+        await session.commit()
+
+        parts = [] if since is None or current is None else [*current.parts]
+        tables: dict[str, str] = {}
+        for model, path, rows in copies:
+            if model is Transaction:
+                # an empty part would only slow the reading down
+                if rows == 0:
+                    path.unlink()
+                    continue
+                parts.append(self._file(model, batch, '').name)
+            else:
+                name = typing.cast(str, model.__tablename__)
+                tables[name] = self._file(model, batch).name
+
+            await asyncio.to_thread(_to_parquet, path, model)
+
+        manifest = Manifest(watermark, parts, tables, batch)
+        self._write(manifest)
+        self._retire(manifest, current)
+        return manifest
+
+    async def fetch(
+        self,
+        statement: Select[Any],
+        start: date | None = None,
+        end: date | None = None,
+    ) -> Sequence[Mapping[str, Any]] | None:
+        """Executes the statement over the replica.
+
+        The statement must read only the transactions of the days
+        from `start` to `end` if they are given, the files of the other
+        months are skipped. Returns None if the replica is off, older than
+        the allowed staleness or can't be read, so the caller falls back
+        to executing the statement on the database.
+        """
+        manifest = self.fresh()
+        if manifest is None:
+            return None
+
+        try:
+            return await asyncio.to_thread(
+                self._fetch,
+                manifest,
+                statement,
+                start,
+                end,
+            )
+        except duckdb.Error as e:
+            logger.warning(f'the analytics replica is not read: {e}')
+            return None
+
+    def _fetch(
+        self,
+        manifest: Manifest,
+        statement: Select[Any],
+        start: date | None,
+        end: date | None,
+    ) -> list[dict[str, Any]]:
+        processors = [
+            column.type.dialect_impl(_RESULT_DIALECT).result_processor(
+                _RESULT_DIALECT,
+                None,
+            )
+            for column in statement.selected_columns
+        ]
+        with duckdb.connect() as replica:
+            self._attach(replica, manifest, start, end)
+            cursor = replica.execute(_sql(statement))
+            names = [description[0] for description in cursor.description]
+            records = cursor.fetchall()
+
+        return [
+            {
+                name: value if processor is None else processor(value)
+                for name, value, processor in zip(
+                    names,
+                    record,
+                    processors,
+                    strict=True,
+                )
+            }
+            for record in records
+        ]
+
+    def _attach(
+        self,
+        replica: duckdb.DuckDBPyConnection,
+        manifest: Manifest,
+        start: date | None,
+        end: date | None,
+    ) -> None:
+        for macro in _MACROS:
+            replica.execute(macro)
+
+        for name, file in manifest.tables.items():
+            replica.execute(
+                f'CREATE VIEW {name} AS '
+                f'SELECT * FROM read_parquet({self._quoted(file)})',
+            )
+
+        name = Transaction.__tablename__
+        if manifest.parts:
+            transactions = self._transactions(manifest.parts, start, end)
+            replica.execute(f'CREATE VIEW {name} AS {transactions}')
+        else:
+            columns = ', '.join(
+                f'{column} {type_}'
+                for column, type_ in _types(Transaction).items()
+            )
+            replica.execute(f'CREATE TABLE {name} ({columns})')
+        replica.execute(
+            f'CREATE VIEW {TransactionDailyRollup.__tablename__} AS '
+            f'{_sql(aggregated_transactions())}',
+        )
+
+    def _transactions(
+        self,
+        parts: Sequence[str],
+        start: date | None,
+        end: date | None,
+    ) -> str:
+        """The latest version of every transaction of the months
+        from `start` to `end`.
+
+        A row of a part is superseded by the same one in a later part,
+        whatever month the later one is in. The rows are compared by
+        the ids of the later parts rather than ranked among all the
+        parts, so the months condition still skips the files.
+        """
+        months = []
+        if start is not None:
+            months.append(f"month >= '{start.strftime(_MONTH_FORMAT)}'")
+        if end is not None:
+            months.append(f"month <= '{end.strftime(_MONTH_FORMAT)}'")
+
+        files = [self._quoted(f'{part}/*/*.parquet') for part in parts]
+        selects = []
+        for i, part in enumerate(files):
+            conditions = [*months]
+            if later := files[i + 1 :]:
+                conditions.append(
+                    'id NOT IN (SELECT id '
+                    f'FROM read_parquet([{", ".join(later)}]))',
+                )
+            where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+            selects.append(
+                f'SELECT * EXCLUDE (month) FROM read_parquet({part}, '
+                f'hive_partitioning = true, {_HIVE_TYPES}){where}',
+            )
+        return ' UNION ALL '.join(selects)
+
+    def _file(
+        self,
+        model: type[BaseModel],
+        batch: int,
+        suffix: str = '.parquet',
+    ) -> Path:
+        return self.directory / f'{model.__tablename__}-{batch:06d}{suffix}'
+
+    def _quoted(self, file: str) -> str:
+        path = str(self.directory / file).replace("'", "''")
+        return f"'{path}'"
+
+    def _write(self, manifest: Manifest) -> None:
+        data = {
+            'watermark': manifest.watermark.isoformat(),
+            'parts': manifest.parts,
+            'tables': manifest.tables,
+            'batch': manifest.batch,
+        }
+        # replaced at once, so the reports never see a partial one
+        temporary = self.directory / f'{MANIFEST}.tmp'
+        temporary.write_text(json.dumps(data))
+        temporary.replace(self.directory / MANIFEST)
+
+    def _retire(self, manifest: Manifest, previous: Manifest | None) -> None:
+        used = {*manifest.parts, *manifest.tables.values()}
+        if previous is not None:
+            used |= {*previous.parts, *previous.tables.values()}
+
+        for path in self.directory.iterdir():
+            if path.name in used:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.suffix in {'.parquet', '.csv'}:
+                path.unlink()
+
+
+def _watermark() -> Select[Any]:
+    """The time before which all the changes are visible.
+
+    A row is stamped with the start of the database transaction
+    writing it, so the changes of the transactions still open
+    may be older than now and are only copied by the next export.
+    """
+    activity = _ACTIVITY.c
+    open_since = (
+        select(func.min(activity.xact_start))
+        .where(
+            activity.datname == func.current_database(),
+            activity.backend_type == 'client backend',
+            activity.pid != func.pg_backend_pid(),
+        )
+        .scalar_subquery()
+    )
+    # LEAST ignores NULL, which is what there is without other transactions
+    return select(
+        func.least(func.now(), open_since, type_=DateTime(timezone=True)),
+    )
+
+
+def _sql(statement: Select[Any]) -> str:
+    return str(
+        statement.compile(
+            dialect=_COMPILE_DIALECT,
+            compile_kwargs={'literal_binds': True},
+        ),
+    )
+
+
+def _to_parquet(path: Path, model: type[BaseModel]) -> None:
+    """Converts the CSV copied from the table into Parquet,
+    the transactions into the directory of a part."""
+    with duckdb.connect() as replica:
+        rows = replica.read_csv(
+            str(path),
+            header=True,
+            dtype=_types(model),
+            # Postgres quotes the empty strings, not the NULLs
+            allow_quoted_nulls=False,
+        )
+        if model is Transaction:
+            _write_part(rows, path.with_suffix(''))
+        else:
+            rows.write_parquet(str(path.with_suffix('.parquet')))
+    path.unlink()
+
+
+def _write_part(rows: duckdb.DuckDBPyRelation, directory: Path) -> None:
+    """Writes the transactions into the files of their months,
+    ordered by the time, so the row groups of a file cover
+    short ranges of it too."""
+    rows.select(f'*, {_MONTH} AS month').order('occurred_at').write_parquet(
+        str(directory),
+        partition_by=['month'],
+    )
+
+
+def _types(model: type[BaseModel]) -> dict[str, str]:
+    return {
+        column.name: _replica_type(column.type)
+        for column in class_mapper(model).local_table.columns
+    }
+
+
+def _replica_type(type_: TypeEngine[Any]) -> str:
+    match type_:
+        case DateTime(timezone=True):
+            return 'TIMESTAMPTZ'
+        case DateTime():
+            return 'TIMESTAMP'
+        case Date():
+            return 'DATE'
+        case Numeric(precision=int() as precision, scale=int() as scale):
+            return f'DECIMAL({precision}, {scale})'
+        case Integer():
+            return 'BIGINT'
+        case _:
+            # the enums too, Postgres writes out their names
+            return 'VARCHAR'
+
+
+analytics_replica = ColumnarReplica(
+    settings.ANALYTICS_REPLICA_DIR,
+    timedelta(seconds=settings.ANALYTICS_REPLICA_MAX_STALENESS_SECONDS),
+)
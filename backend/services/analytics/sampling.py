@@ -0,0 +1,35 @@
+"""Estimation of counts from a TABLESAMPLE SYSTEM sample.
+
+SYSTEM picks whole table pages, every page with the same probability,
+so the rows of a page get into the sample together. The pages are
+the sampling units then: the sampled total scaled up by the inverse of
+the sampled fraction estimates the exact total (Horvitz-Thompson),
+and its variance is estimated from the per-page totals, which accounts
+for the rows of a page being alike.
+"""
+
+import math
+import typing
+
+# the normal quantile of the two-sided 95% confidence
+Z_95: typing.Final = 1.96
+
+
+class Estimate(typing.NamedTuple):
+    value: float
+    low: float
+    high: float
+
+
+def estimate(total: float, page_squares: float, fraction: float) -> Estimate:
+    """Estimates the exact total of a sample.
+
+    `total` is the sum of the sampled values, `page_squares` is
+    the sum of the squared per-page sums of them and `fraction`
+    is the probability of a page to be sampled.
+    """
+    value = total / fraction
+    variance = page_squares * (1 - fraction) / fraction**2
+    margin = Z_95 * math.sqrt(variance)
+    # the sampled values are known to exist
+    return Estimate(value, max(value - margin, total), value + margin)
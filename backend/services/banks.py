@@ -5,6 +5,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.bank import Bank
+from services.analytics.cache import analytics_cache
 from services.crud import BaseCRUD
 
 BANK_NAME_NOT_UNIQUE_EXCEPTION = HTTPException(
@@ -12,6 +13,11 @@ BANK_NAME_NOT_UNIQUE_EXCEPTION = HTTPException(
     detail='Bank name is not unique',
 )
 
+BANK_IN_USE_EXCEPTION = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='Bank is referenced by transactions',
+)
+
 
 class BankService(BaseCRUD[Bank]):
     def __init__(self, session: AsyncSession) -> None:
@@ -31,3 +37,13 @@ class BankService(BaseCRUD[Bank]):
             return await super().update(instance)
         except IntegrityError as e:
             raise BANK_NAME_NOT_UNIQUE_EXCEPTION from e
+        finally:
+            # the cached analytics have got the names
+            analytics_cache.invalidate_all()
+
+    @override
+    async def delete(self, instance_id: int) -> None:
+        try:
+            await super().delete(instance_id)
+        except IntegrityError as e:
+            raise BANK_IN_USE_EXCEPTION from e
@@ -1,4 +1,8 @@
+import typing
+
 from asyncpg import DataError as AsyncpgDataError
+from asyncpg import QueryCanceledError
+from sqlalchemy import literal
 from sqlalchemy.exc import DataError, DBAPIError
 
 
@@ -11,3 +15,18 @@ def is_data_error(exc: DBAPIError) -> bool:
         return isinstance(exc.orig.__cause__, AsyncpgDataError)
 
     return False
+
+
+def is_query_canceled(exc: DBAPIError) -> bool:
+    """The statement ran out of its timeout or was canceled."""
+    if exc.orig:
+        return isinstance(exc.orig.__cause__, QueryCanceledError)
+
+    return False
+
+
+def inline_literal(value: typing.Any, type_: typing.Any = None) -> typing.Any:
+    """A literal rendered into the statement instead of being bound,
+    so the same expression in SELECT and GROUP BY doesn't differ
+    in the bind parameters."""
+    return literal(value, type_, literal_execute=True)
@@ -1,16 +1,33 @@
-from collections.abc import Sequence
-from typing import Any
+from collections.abc import Mapping, Sequence
+from typing import Any, cast
+import warnings
 
 from fastapi import HTTPException, status
-from sqlalchemy import func, Select
+import orjson
+from sqlalchemy import Column, delete, func, insert, Select
+from sqlalchemy import select as sa_select
+from sqlalchemy.engine import Result
 from sqlalchemy.exc import DBAPIError
-from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.expression import (
+    ClauseElement,
+    ColumnElement,
+    Executable,
+    Label,
+)
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from dependencies.params import OrderByItem
+from dependencies.params import OrderByItem, TotalCount
 from models.base import BaseModel
 from services.common import is_data_error
+from services.pagination import (
+    encode_cursor,
+    keyset_condition,
+    with_tiebreaker,
+)
 
 type WhereClause = ColumnElement[bool] | bool
 
@@ -54,12 +71,231 @@ class BaseCRUD[T: BaseModel]:
         order_by: Sequence[OrderByItem] | None = None,
         offset: int | None = None,
         limit: int | None = None,
+        cursor: str | None = None,
     ) -> Sequence[T]:
-        query = select(self.model)
+        query = self._list_query(
+            select(self.model),
+            filters,
+            order_by,
+            offset,
+            limit,
+            cursor,
+        )
 
+        try:
+            result = await self.session.exec(query)
+        except DBAPIError as e:
+            if is_data_error(e):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                ) from e
+
+            raise e
+
+        return result.all()
+
+    async def list_with_count(  # noqa: PLR0913
+        self,
+        filters: Sequence[WhereClause] | None = None,
+        order_by: Sequence[OrderByItem] | None = None,
+        offset: int | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        total_count: TotalCount = TotalCount.EXACT,
+    ) -> tuple[Sequence[T], int | None]:
+        if total_count is not TotalCount.EXACT:
+            items = await self.list(filters, order_by, offset, limit, cursor)
+            if total_count is TotalCount.ESTIMATE:
+                return items, await self.estimate_count(filters)
+            return items, None
+
+        query = self._list_query(
+            select(self.model, self._total_count_column(filters)),
+            filters,
+            order_by,
+            offset,
+            limit,
+            cursor,
+        )
+
+        try:
+            result = await self.session.exec(query)
+        except DBAPIError as e:
+            if is_data_error(e):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                ) from e
+
+            raise e
+
+        rows = result.all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+
+        return [], await self._empty_page_count(filters, offset, cursor)
+
+    async def list_rows(  # noqa: PLR0913
+        self,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[WhereClause] | None = None,
+        order_by: Sequence[OrderByItem] | None = None,
+        offset: int | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> Sequence[Mapping[str, Any]]:
+        """Read-only counterpart of `list`.
+
+        Selects only the given columns (all of them by default) and returns
+        plain row mappings, which skips the ORM hydration and the identity
+        map. Meant to be serialized as is, see `api.responses.RowsResponse`.
+        """
+        query = self._list_query(
+            sa_select(*self._columns(columns)),
+            filters,
+            order_by,
+            offset,
+            limit,
+            cursor,
+        )
+        result = await self._execute_read(query)
+        return cast(Sequence[Mapping[str, Any]], result.mappings().all())
+
+    async def list_rows_with_count(  # noqa: PLR0913
+        self,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[WhereClause] | None = None,
+        order_by: Sequence[OrderByItem] | None = None,
+        offset: int | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        total_count: TotalCount = TotalCount.EXACT,
+    ) -> tuple[Sequence[Mapping[str, Any]], int | None]:
+        if total_count is not TotalCount.EXACT:
+            items = await self.list_rows(
+                columns,
+                filters,
+                order_by,
+                offset,
+                limit,
+                cursor,
+            )
+            if total_count is TotalCount.ESTIMATE:
+                return items, await self.estimate_count(filters)
+            return items, None
+
+        count_column = self._total_count_column(filters)
+        query = self._list_query(
+            sa_select(*self._columns(columns), count_column),
+            filters,
+            order_by,
+            offset,
+            limit,
+            cursor,
+        )
+        result = await self._execute_read(query)
+
+        rows = result.all()
+        if rows:
+            count = rows[0][-1]
+            keys = list(result.keys())[:-1]
+            items = [dict(zip(keys, row[:-1], strict=True)) for row in rows]
+            return items, count
+
+        return [], await self._empty_page_count(filters, offset, cursor)
+
+    async def estimate_count(
+        self,
+        filters: Sequence[WhereClause] | None = None,
+    ) -> int:
+        """Returns the row count the planner expects from its statistics.
+
+        Only the query is planned, so the cost doesn't depend
+        on the number of matching rows.
+        """
+        query = _apply_filters(select(self.model), filters)
+        with warnings.catch_warnings(action='ignore'):
+            result = await self.session.execute(_ExplainJSON(query))
+        plan = result.scalar_one()
+        if isinstance(plan, str | bytes):
+            plan = orjson.loads(plan)
+
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def next_cursor(
+        self,
+        instance: T | Mapping[str, Any],
+        order_by: Sequence[OrderByItem] | None = None,
+    ) -> str:
+        # the ordering must be the same as the one passed to `list`,
+        # a row must contain its columns
+        return encode_cursor(instance, with_tiebreaker(order_by))
+
+    def _columns(
+        self,
+        names: Sequence[str] | None,
+    ) -> Sequence[Column[Any]]:
+        columns = class_mapper(self.model).columns
+        if names is None:
+            return list(columns)
+        return [columns[name] for name in names]
+
+    def _total_count_column(
+        self,
+        filters: Sequence[WhereClause] | None,
+    ) -> Label[int]:
+        # The count goes into the same statement as a scalar subquery.
+        # Postgres evaluates it once as an InitPlan, and unlike
+        # count(*) OVER () it neither disables the early LIMIT stop
+        # nor gets narrowed by the cursor condition.
+        count_query = _apply_filters(
+            select(func.count()).select_from(self.model),
+            filters,
+        )
+        return (
+            count_query.correlate(None)
+            .scalar_subquery()
+            .label(
+                'total_count',
+            )
+        )
+
+    async def _empty_page_count(
+        self,
+        filters: Sequence[WhereClause] | None,
+        offset: int | None,
+        cursor: str | None,
+    ) -> int:
+        # an empty page beyond the last one tells nothing about the total
+        if offset or cursor is not None:
+            return await self.count(filters)
+
+        return 0
+
+    async def _execute_read(self, query: Select[Any]) -> Result[Any]:
+        try:
+            with warnings.catch_warnings(action='ignore'):
+                return await self.session.execute(query)
+        except DBAPIError as e:
+            if is_data_error(e):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                ) from e
+
+            raise e
+
+    def _list_query[TQuery: Select[Any]](  # noqa: PLR0913
+        self,
+        query: TQuery,
+        filters: Sequence[WhereClause] | None,
+        order_by: Sequence[OrderByItem] | None,
+        offset: int | None,
+        limit: int | None,
+        cursor: str | None,
+    ) -> TQuery:
         query = _apply_filters(query, filters)
 
-        if order_by is not None:
+        if order_by is not None or cursor is not None:
+            order_by = with_tiebreaker(order_by)
             order_by_seq = (
                 getattr(self.model, order_column.field).desc()
                 if order_column.desc
@@ -68,14 +304,23 @@ class BaseCRUD[T: BaseModel]:
             )
             query = query.order_by(*order_by_seq)
 
+            if cursor is not None:
+                query = query.where(
+                    keyset_condition(self.model, order_by, cursor),
+                )
+
         if offset is not None:
             query = query.offset(offset)
 
         if limit is not None:
             query = query.limit(limit)
 
+        return query
+
+    async def create(self, instance: T) -> T:
         try:
-            result = await self.session.exec(query)
+            self.session.add(instance)
+            await self.session.commit()
         except DBAPIError as e:
             if is_data_error(e):
                 raise HTTPException(
@@ -84,11 +329,31 @@ class BaseCRUD[T: BaseModel]:
 
             raise e
 
-        return result.all()
+        return instance
+
+    async def create_many(
+        self,
+        rows: Sequence[Mapping[str, Any]],
+    ) -> Sequence[int]:
+        """Inserts rows in a single transaction and returns their ids
+        in the same order.
+
+        SQLAlchemy sends them as multi-row INSERT ... RETURNING batches,
+        so no ORM instances are built and there's a single commit.
+        """
+        if not rows:
+            return []
+
+        primary_key = class_mapper(self.model).primary_key[0]
+        query = insert(self.model).returning(
+            primary_key,
+            sort_by_parameter_order=True,
+        )
 
-    async def create(self, instance: T) -> T:
         try:
-            self.session.add(instance)
+            with warnings.catch_warnings(action='ignore'):
+                result = await self.session.execute(query, rows)
+            ids = result.scalars().all()
             await self.session.commit()
         except DBAPIError as e:
             if is_data_error(e):
@@ -98,7 +363,7 @@ class BaseCRUD[T: BaseModel]:
 
             raise e
 
-        return instance
+        return ids
 
     async def update(self, instance: T) -> T:
         try:
@@ -115,9 +380,16 @@ class BaseCRUD[T: BaseModel]:
         return instance
 
     async def delete(self, instance_id: int) -> None:
-        instance = await self.get(instance_id)
+        primary_key = class_mapper(self.model).primary_key[0]
+        query = (
+            delete(self.model)
+            .where(primary_key == instance_id)
+            .returning(primary_key)
+        )
         try:
-            await self.session.delete(instance)
+            with warnings.catch_warnings(action='ignore'):
+                result = await self.session.execute(query)
+            deleted_id = result.scalar_one_or_none()
             await self.session.commit()
         except DBAPIError as e:
             if is_data_error(e):
@@ -127,6 +399,11 @@ class BaseCRUD[T: BaseModel]:
 
             raise e
 
+        if deleted_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+
 
 def _apply_filters[TQuery: Select[Any]](
     query: TQuery,
@@ -142,3 +419,20 @@ def _apply_filters[TQuery: Select[Any]](
             query = query.where(where_condition)
 
     return query
+
+
+class _ExplainJSON(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select[Any]) -> None:
+        self.statement = statement
+
+
+@compiles(_ExplainJSON, 'postgresql')
+def _compile_explain(
+    element: _ExplainJSON,
+    compiler: SQLCompiler,
+    **kwargs: Any,
+) -> str:
+    statement = compiler.process(element.statement, **kwargs)
+    return f'EXPLAIN (FORMAT JSON) {statement}'
@@ -0,0 +1,144 @@
+"""Maintenance of the `account_balance_checkpoints` table.
+
+A transaction moves the balance of its `account_number`: a credit adds
+its amount and a debit subtracts it, unless it never went through.
+The writes turn the touched rows into deltas like for the daily
+rollups, and the deltas are upserted into the monthly checkpoints
+in the same database transaction as the write itself.
+
+A checkpoint holds the change of its month rather than the closing
+balance, so the upserts of concurrent writes commute and a write into
+the past touches a single checkpoint instead of all the later ones.
+"""
+
+from collections.abc import Sequence
+import typing
+
+from sqlalchemy import (
+    case,
+    Date,
+    FromClause,
+    func,
+    Insert,
+    Integer,
+    literal,
+    Select,
+    select,
+)
+from sqlalchemy.engine import RowMapping
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.transaction import (
+    AccountBalanceCheckpoint,
+    TransactionStatus,
+    TransactionType,
+)
+from services.common import inline_literal
+from services.rollups import (
+    rebuild_derived,
+    rollup_day,
+    transactions_table,
+    upsert_deltas,
+    verify_derived,
+)
+
+LEDGER_KEY: typing.Final = ('user_id', 'account_number', 'month')
+
+# the transactions which don't move the balance
+NOT_SETTLED: typing.Final = (
+    TransactionStatus.DELETED,
+    TransactionStatus.CANCELLED,
+    TransactionStatus.REFUNDED,
+)
+
+
+def ledger_month(occurred_at: typing.Any) -> typing.Any:
+    """The month a transaction is accounted for, always in UTC."""
+    month = inline_literal('month')
+    return func.date_trunc(month, rollup_day(occurred_at)).cast(Date)
+
+
+def balance_change(source: FromClause) -> typing.Any:
+    """The change of the balance made by a transaction."""
+    return case(
+        (
+            source.c.transaction_type == TransactionType.DEBIT,
+            -source.c.amount,
+        ),
+        else_=source.c.amount,
+    )
+
+
+def settled(source: FromClause) -> typing.Any:
+    return source.c.status.not_in(NOT_SETTLED)
+
+
+def ledger_deltas(source: FromClause, sign: int) -> Select[typing.Any]:
+    """Turns transactions rows into checkpoint deltas.
+
+    `source` must have the columns of `transactions`, its rows
+    are added to the checkpoints with sign 1 and subtracted with -1.
+    """
+    return select(
+        source.c.user_id,
+        source.c.account_number,
+        ledger_month(source.c.occurred_at).label('month'),
+        literal(sign, Integer, literal_execute=True).label(
+            'transactions_count',
+        ),
+        (balance_change(source) * sign).label('balance_change'),
+    ).where(settled(source))
+
+
+def apply_ledger_deltas(*deltas: Select[typing.Any]) -> Insert:
+    """Builds the upsert adding the deltas to the checkpoints."""
+    return upsert_deltas(
+        AccountBalanceCheckpoint,
+        LEDGER_KEY,
+        ('transactions_count', 'balance_change'),
+        *deltas,
+    )
+
+
+def _aggregated_transactions() -> Select[typing.Any]:
+    transactions = transactions_table()
+    key = [
+        transactions.c.user_id,
+        transactions.c.account_number,
+        ledger_month(transactions.c.occurred_at).label('month'),
+    ]
+    return (
+        select(
+            *key,
+            func.count().label('transactions_count'),
+            func.sum(balance_change(transactions)).label('balance_change'),
+        )
+        .where(settled(transactions))
+        .group_by(*key)
+    )
+
+
+async def rebuild_ledger(session: AsyncSession) -> None:
+    """Recomputes all the checkpoints from `transactions`."""
+    await rebuild_derived(
+        session,
+        AccountBalanceCheckpoint,
+        LEDGER_KEY,
+        ('transactions_count', 'balance_change'),
+        _aggregated_transactions(),
+    )
+
+
+async def verify_ledger(session: AsyncSession) -> Sequence[RowMapping]:
+    """Returns the checkpoint keys which don't match `transactions`.
+
+    Every row holds the key and both the expected
+    and the stored count and change.
+    """
+    return await verify_derived(
+        session,
+        AccountBalanceCheckpoint,
+        LEDGER_KEY,
+        {'transactions_count': 'count', 'balance_change': 'change'},
+        _aggregated_transactions(),
+    )
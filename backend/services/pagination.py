@@ -0,0 +1,170 @@
+import base64
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from fastapi import HTTPException, status
+import orjson
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import and_, Column, false, or_, true
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.sql.expression import ColumnElement
+
+from dependencies.params import OrderByItem
+from models.base import BaseModel
+
+TIEBREAKER_FIELD = 'id'
+
+INVALID_CURSOR_EXCEPTION = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='Invalid cursor',
+)
+
+
+def with_tiebreaker(
+    order_by: Sequence[OrderByItem] | None,
+) -> list[OrderByItem]:
+    """Appends the primary key to the ordering, so it becomes total.
+
+    The tiebreaker follows the direction of the last ordering column,
+    which lets a single (..., column DESC, id DESC) index serve
+    both directions.
+    """
+    items = list(order_by or ())
+    if all(item.field != TIEBREAKER_FIELD for item in items):
+        desc = items[-1].desc if items else False
+        items.append(OrderByItem(field=TIEBREAKER_FIELD, desc=desc))
+
+    return items
+
+
+def encode_cursor(
+    instance: BaseModel | Mapping[str, Any],
+    order_by: Sequence[OrderByItem],
+) -> str:
+    if isinstance(instance, Mapping):
+        values = [instance[item.field] for item in order_by]
+    else:
+        values = [getattr(instance, item.field) for item in order_by]
+
+    payload = {'o': [_order_key(item) for item in order_by], 'v': values}
+    raw = orjson.dumps(payload, default=str)
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def keyset_condition(
+    model: type[BaseModel],
+    order_by: Sequence[OrderByItem],
+    cursor: str,
+) -> ColumnElement[bool]:
+    """Builds a condition selecting the rows that follow the cursor.
+
+    Apart from the row-by-row comparison, the condition contains
+    a redundant bound on the leading column, so Postgres can start
+    the index scan right at the cursor position instead of filtering
+    out every preceding row.
+    """
+    values = _decode_cursor(cursor, order_by)
+    columns = class_mapper(model).columns
+    keys = [
+        _Key(columns[item.field], item.desc, value)
+        for item, value in zip(order_by, values, strict=True)
+    ]
+
+    alternatives = []
+    equal_so_far: list[ColumnElement[bool]] = []
+    for key in keys:
+        alternatives.append(and_(*equal_so_far, key.after()))
+        equal_so_far.append(key.equal())
+
+    return and_(keys[0].at_or_after(), or_(*alternatives))
+
+
+def _decode_cursor(
+    cursor: str,
+    order_by: Sequence[OrderByItem],
+) -> list[Any]:
+    # ValueError covers the padding, the non-ASCII and the JSON errors
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = orjson.loads(raw)
+        keys, values = payload['o'], payload['v']
+    except (ValueError, TypeError, KeyError) as e:
+        raise INVALID_CURSOR_EXCEPTION from e
+
+    # the cursor must be issued for the very same ordering
+    if keys != [_order_key(item) for item in order_by]:
+        raise INVALID_CURSOR_EXCEPTION
+
+    if not isinstance(values, list) or len(values) != len(order_by):
+        raise INVALID_CURSOR_EXCEPTION
+
+    return values
+
+
+def _order_key(item: OrderByItem) -> str:
+    return f'-{item.field}' if item.desc else item.field
+
+
+class _Key:
+    """A single column of the keyset.
+
+    Mirrors the default Postgres NULL ordering:
+    NULLS LAST for ascending and NULLS FIRST for descending columns.
+    """
+
+    def __init__(
+        self,
+        column: Column[Any],
+        desc: bool,
+        raw_value: Any,
+    ) -> None:
+        self.column = column
+        self.desc = desc
+        self.nullable = bool(column.nullable)
+        self.value = self._parse(raw_value)
+
+    def _parse(self, raw_value: Any) -> Any:
+        if raw_value is None:
+            if not self.nullable:
+                raise INVALID_CURSOR_EXCEPTION
+            return None
+
+        try:
+            python_type = self.column.type.python_type
+            return TypeAdapter(python_type).validate_python(raw_value)
+        except ValidationError as e:
+            raise INVALID_CURSOR_EXCEPTION from e
+
+    def equal(self) -> ColumnElement[bool]:
+        if self.value is None:
+            return self.column.is_(None)
+
+        condition: ColumnElement[bool] = self.column == self.value
+        return condition
+
+    def after(self) -> ColumnElement[bool]:
+        if self.value is None:
+            return self.column.is_not(None) if self.desc else false()
+
+        condition: ColumnElement[bool]
+        if self.desc:
+            condition = self.column < self.value
+            return condition
+
+        return self._or_null(self.column > self.value)
+
+    def at_or_after(self) -> ColumnElement[bool]:
+        if self.value is None:
+            return true() if self.desc else self.column.is_(None)
+
+        condition: ColumnElement[bool]
+        if self.desc:
+            condition = self.column <= self.value
+            return condition
+
+        return self._or_null(self.column >= self.value)
+
+    def _or_null(self, condition: ColumnElement[bool]) -> ColumnElement[bool]:
+        if self.nullable:
+            return or_(condition, self.column.is_(None))
+        return condition
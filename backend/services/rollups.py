@@ -0,0 +1,237 @@
+"""Maintenance of the `transaction_daily_rollups` table.
+
+Every write to `transactions` turns the touched rows into deltas:
+the old state of a row is subtracted from its rollup and the new one
+is added. The deltas are applied with a single upsert in the same
+database transaction as the write itself.
+"""
+
+from collections.abc import Mapping, Sequence
+import typing
+import warnings
+
+from sqlalchemy import (
+    and_,
+    Date,
+    delete,
+    FromClause,
+    func,
+    Insert,
+    Integer,
+    literal,
+    or_,
+    Select,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.orm import class_mapper
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.base import BaseModel
+from models.transaction import Transaction, TransactionDailyRollup
+
+ROLLUP_KEY: typing.Final = (
+    'user_id',
+    'day',
+    'transaction_type',
+    'status',
+    'category_id',
+    'sender_bank_id',
+    'recipient_bank_id',
+)
+
+
+def rollup_day(occurred_at: typing.Any) -> typing.Any:
+    """The day a transaction is accounted for, always in UTC."""
+    return func.timezone('UTC', occurred_at).cast(Date)
+
+
+def transaction_deltas(source: FromClause, sign: int) -> Select[typing.Any]:
+    """Turns transactions rows into rollup deltas.
+
+    `source` must have the columns of `transactions`, its rows
+    are added to the rollups with sign 1 and subtracted with -1.
+    """
+    return select(
+        source.c.user_id,
+        rollup_day(source.c.occurred_at).label('day'),
+        source.c.transaction_type,
+        source.c.status,
+        source.c.category_id,
+        source.c.sender_bank_id,
+        source.c.recipient_bank_id,
+        literal(sign, Integer, literal_execute=True).label(
+            'transactions_count',
+        ),
+        (source.c.amount * sign).label('amount_sum'),
+    )
+
+
+def apply_deltas(*deltas: Select[typing.Any]) -> Insert:
+    """Builds the upsert adding the deltas to the rollups."""
+    return upsert_deltas(
+        TransactionDailyRollup,
+        ROLLUP_KEY,
+        ('transactions_count', 'amount_sum'),
+        *deltas,
+    )
+
+
+def upsert_deltas(
+    model: type[BaseModel],
+    key: Sequence[str],
+    values: Sequence[str],
+    *deltas: Select[typing.Any],
+) -> Insert:
+    """Builds the upsert adding the deltas to the `values` of the rows
+    of a derived table.
+
+    The deltas of the same key are summed up first, so a row
+    changed in place without touching its key costs nothing.
+    """
+    combined = union_all(*deltas).subquery('deltas')
+    sums = [func.sum(combined.c[name]) for name in values]
+
+    aggregated = (
+        select(*(combined.c[name] for name in key), *sums)
+        .group_by(*(combined.c[name] for name in key))
+        .having(or_(*(value != 0 for value in sums)))
+    )
+
+    statement = insert(model).from_select([*key, *values], aggregated)
+    table = class_mapper(model).local_table
+    return statement.on_conflict_do_update(
+        index_elements=key,
+        set_={
+            name: table.c[name] + statement.excluded[name] for name in values
+        },
+    )
+
+
+def transactions_table() -> FromClause:
+    return class_mapper(Transaction).local_table
+
+
+def aggregated_transactions() -> Select[typing.Any]:
+    """The rollups computed from `transactions` themselves."""
+    transactions = transactions_table()
+    key = [
+        transactions.c.user_id,
+        rollup_day(transactions.c.occurred_at).label('day'),
+        transactions.c.transaction_type,
+        transactions.c.status,
+        transactions.c.category_id,
+        transactions.c.sender_bank_id,
+        transactions.c.recipient_bank_id,
+    ]
+    return select(
+        *key,
+        func.count().label('transactions_count'),
+        func.sum(transactions.c.amount).label('amount_sum'),
+    ).group_by(*key)
+
+
+async def rebuild_rollups(session: AsyncSession) -> None:
+    """Recomputes all the rollups from `transactions`."""
+    await rebuild_derived(
+        session,
+        TransactionDailyRollup,
+        ROLLUP_KEY,
+        ('transactions_count', 'amount_sum'),
+        aggregated_transactions(),
+    )
+
+
+async def verify_rollups(session: AsyncSession) -> Sequence[RowMapping]:
+    """Returns the rollup keys which don't match `transactions`.
+
+    Every row holds the key and both the expected
+    and the stored count and sum.
+    """
+    return await verify_derived(
+        session,
+        TransactionDailyRollup,
+        ROLLUP_KEY,
+        {'transactions_count': 'count', 'amount_sum': 'sum'},
+        aggregated_transactions(),
+    )
+
+
+async def rebuild_derived(
+    session: AsyncSession,
+    model: type[BaseModel],
+    key: Sequence[str],
+    values: Sequence[str],
+    aggregated: Select[typing.Any],
+) -> None:
+    """Replaces all the rows of a derived table
+    with the ones aggregated from `transactions`."""
+    table_name = typing.cast(str, model.__tablename__)
+    with warnings.catch_warnings(action='ignore'):
+        # the writers wait for the rebuild instead of
+        # applying their deltas to the rows being replaced
+        await session.execute(
+            text(f'LOCK TABLE {table_name} IN EXCLUSIVE MODE'),
+        )
+        await session.execute(delete(model))
+        await session.execute(
+            insert(model).from_select([*key, *values], aggregated),
+        )
+    await session.commit()
+
+
+async def verify_derived(
+    session: AsyncSession,
+    model: type[BaseModel],
+    key: Sequence[str],
+    values: Mapping[str, str],
+    aggregated: Select[typing.Any],
+) -> Sequence[RowMapping]:
+    """Returns the keys of a derived table whose rows don't match
+    the ones aggregated from `transactions`.
+
+    Every row holds the key and both the expected and the stored
+    `values`, labeled `expected_<label>` and `stored_<label>`.
+    The stored rows whose deltas cancelled out are not compared.
+    """
+    expected = aggregated.subquery('expected')
+    table = class_mapper(model).local_table
+    stored = (
+        select(table)
+        .where(or_(*(table.c[name] != 0 for name in values)))
+        .subquery('stored')
+    )
+    on = and_(*(expected.c[name] == stored.c[name] for name in key))
+
+    query = (
+        select(
+            *(
+                func.coalesce(expected.c[name], stored.c[name]).label(name)
+                for name in key
+            ),
+            *(
+                column
+                for name, label in values.items()
+                for column in (
+                    expected.c[name].label(f'expected_{label}'),
+                    stored.c[name].label(f'stored_{label}'),
+                )
+            ),
+        )
+        .select_from(expected.outerjoin(stored, on, full=True))
+        .where(
+            or_(
+                *(
+                    expected.c[name].is_distinct_from(stored.c[name])
+                    for name in values
+                ),
+            ),
+        )
+    )
+    with warnings.catch_warnings(action='ignore'):
+        result = await session.execute(query)
+
+    return result.mappings().all()
@@ -1,12 +1,36 @@
-from collections.abc import Mapping, Sequence, Set
+from collections.abc import AsyncIterator, Mapping, Sequence, Set
+import contextlib
 import typing
 from typing import override
+import warnings
 
 from fastapi import HTTPException, status
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import (
+    any_,
+    ARRAY,
+    CompoundSelect,
+    CTE,
+    Executable,
+    false,
+    Insert,
+    insert,
+    Integer,
+    literal,
+    Row,
+    Select,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.engine import Result
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import aliased, class_mapper
+from sqlalchemy.sql.expression import ColumnElement
+from sqlmodel import col
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from dependencies.params import OrderByItem
+from dependencies.params import OrderByItem, PaginationParams
+from models.bank import Bank
 from models.transaction import (
     Transaction,
     TransactionCategory,
@@ -14,14 +38,36 @@ from models.transaction import (
 )
 from models.user import User
 from schemas.common import SequenceResponse
-from schemas.transactions import TransactionCreate, TransactionUpdate
-from services.crud import BaseCRUD
+from schemas.transactions import (
+    BatchItemStatus,
+    BulkRejection,
+    TransactionBatchItemResult,
+    TransactionBatchResult,
+    TransactionBulkResult,
+    TransactionCreate,
+    TransactionFilters,
+    TransactionUpdate,
+)
+from services.analytics.cache import analytics_cache
+from services.common import is_data_error
+from services.crud import BaseCRUD, WhereClause
+from services.ledger import apply_ledger_deltas, ledger_deltas
+from services.rollups import (
+    apply_deltas,
+    transaction_deltas,
+    transactions_table,
+)
 
 CATEGORY_NAME_NOT_UNIQUE_EXCEPTION = HTTPException(
     status_code=status.HTTP_400_BAD_REQUEST,
     detail='Category name is not unique',
 )
 
+CATEGORY_IN_USE_EXCEPTION = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='Category is referenced by transactions',
+)
+
 
 class TransactionCategoryService(BaseCRUD[TransactionCategory]):
     def __init__(self, session: AsyncSession) -> None:
@@ -45,6 +91,30 @@ class TransactionCategoryService(BaseCRUD[TransactionCategory]):
             return await super().update(instance)
         except IntegrityError as e:
             raise CATEGORY_NAME_NOT_UNIQUE_EXCEPTION from e
+        finally:
+            # the cached analytics have got the names
+            analytics_cache.invalidate_all()
+
+    async def delete(self, instance_id: int) -> None:
+        try:
+            await super().delete(instance_id)
+        except IntegrityError as e:
+            raise CATEGORY_IN_USE_EXCEPTION from e
+
+
+# the guard passed on the state read by the statement,
+# but the row was changed before it could be updated
+CONCURRENT_MODIFICATION_EXCEPTION = HTTPException(
+    status_code=status.HTTP_409_CONFLICT,
+    detail='Transaction has been modified concurrently',
+)
+
+
+class GuardedUpdateRow(typing.NamedTuple):
+    id: int
+    user_id: int
+    status: TransactionStatus
+    updated: bool
 
 
 class TransactionCRUD(BaseCRUD[Transaction]):
@@ -54,17 +124,229 @@ class TransactionCRUD(BaseCRUD[Transaction]):
 
     @override
     async def create(self, instance: Transaction) -> Transaction:
-        try:
-            return await super().create(instance)
-        except IntegrityError as e:
-            self._handle_integrity_error(e)
+        async with self._writing() as written_users:
+            self.session.add(instance)
+            await self.session.flush()
+            await self._execute(self._derive_inserted([instance.id]))
+            written_users.add(instance.user_id)
+
+        return instance
 
     @override
     async def update(self, instance: Transaction) -> Transaction:
+        # the derived tables are moved along by the guarded updates only
+        raise NotImplementedError('use guarded_update_one')
+
+    @override
+    async def create_many(
+        self,
+        rows: Sequence[Mapping[str, typing.Any]],
+    ) -> Sequence[int]:
+        if not rows:
+            return []
+
+        query = insert(Transaction).returning(
+            col(Transaction.id),
+            sort_by_parameter_order=True,
+        )
+        async with self._writing() as written_users:
+            result = await self._execute(query, rows)
+            ids = result.scalars().all()
+            await self._execute(self._derive_inserted(ids))
+            written_users.update(row['user_id'] for row in rows)
+
+        return ids
+
+    @override
+    async def delete(self, instance_id: int) -> None:
+        # the transactions are only marked DELETED, by the guarded updates
+        raise NotImplementedError('use guarded_update_one')
+
+    async def existing_references(
+        self,
+        bank_ids: Set[int],
+        category_ids: Set[int],
+    ) -> tuple[Set[int], Set[int]]:
+        """Returns which of the given banks and categories exist,
+        both are checked with a single statement."""
+        query: CompoundSelect[tuple[str, int]] = union_all(
+            select(literal('bank'), col(Bank.id)).where(
+                col(Bank.id).in_(bank_ids),
+            ),
+            select(literal('category'), col(TransactionCategory.id)).where(
+                col(TransactionCategory.id).in_(category_ids),
+            ),
+        )
+        with warnings.catch_warnings(action='ignore'):
+            result = await self.session.execute(query)
+
+        existing: dict[str, set[int]] = {'bank': set(), 'category': set()}
+        for related_entity, entity_id in result.all():
+            existing[related_entity].add(entity_id)
+
+        return existing['bank'], existing['category']
+
+    async def guarded_update(
+        self,
+        ids: Set[int],
+        values: Mapping[str, typing.Any],
+        conditions: Sequence[ColumnElement[bool]],
+    ) -> Sequence[GuardedUpdateRow]:
+        """Updates the rows matching the conditions in one statement.
+
+        Every requested row that exists is returned with its state
+        before the update and a flag telling whether it was updated,
+        so the caller can explain the rejections without extra queries.
+        """
+        ids_param = literal(sorted(ids), ARRAY(Integer))
+        target, updated, derived = self._guarded_update_ctes(
+            col(Transaction.id) == any_(ids_param),
+            values,
+            conditions,
+        )
+        query = (
+            select(
+                target.c.id,
+                target.c.user_id,
+                target.c.status,
+                updated.c.id.is_not(None).label('updated'),
+            )
+            .select_from(
+                target.outerjoin(updated, updated.c.id == target.c.id),
+            )
+            .add_cte(*derived)
+        )
+
+        result = await self._execute_guarded(query)
+        return [GuardedUpdateRow(*row) for row in result]
+
+    async def guarded_update_one(
+        self,
+        instance_id: int,
+        values: Mapping[str, typing.Any],
+        conditions: Sequence[ColumnElement[bool]],
+    ) -> tuple[GuardedUpdateRow, Transaction | None]:
+        """Single-row version of `guarded_update`.
+
+        Returns the updated transaction as well, or None
+        when the conditions rejected the update.
+        """
+        target, updated, derived = self._guarded_update_ctes(
+            col(Transaction.id) == instance_id,
+            values,
+            conditions,
+        )
+        updated_transaction = aliased(Transaction, updated)
+        query = (
+            select(
+                target.c.id,
+                target.c.user_id,
+                target.c.status,
+                updated.c.id.is_not(None).label('updated'),
+                updated_transaction,
+            )
+            .select_from(
+                target.outerjoin(updated, updated.c.id == target.c.id),
+            )
+            .add_cte(*derived)
+            .execution_options(populate_existing=True)
+        )
+
+        result = await self._execute_guarded(query)
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+
+        *row, transaction = result[0]
+        return GuardedUpdateRow(*row), transaction
+
+    @staticmethod
+    def _guarded_update_ctes(
+        match: ColumnElement[bool],
+        values: Mapping[str, typing.Any],
+        conditions: Sequence[ColumnElement[bool]],
+    ) -> tuple[CTE, CTE, Sequence[CTE]]:
+        """Returns the locked rows, the updated ones and the statements
+        moving the derived tables along."""
+        # `target` locks the rows and holds the state the conditions
+        # are checked against, the update joins it, so it can't see
+        # a newer version of a row than the one subtracted from rollups
+        columns = class_mapper(Transaction).columns
+        target = select(*columns).where(match).with_for_update().cte('target')
+        updated = (
+            update(Transaction)
+            .where(col(Transaction.id) == target.c.id, *conditions)
+            .values(values)
+            .returning(*columns)
+            .cte('updated')
+        )
+        rollup = apply_deltas(
+            transaction_deltas(target, -1).where(
+                target.c.id.in_(select(updated.c.id)),
+            ),
+            transaction_deltas(updated, 1),
+        ).cte('rollup')
+        ledger = apply_ledger_deltas(
+            ledger_deltas(target, -1).where(
+                target.c.id.in_(select(updated.c.id)),
+            ),
+            ledger_deltas(updated, 1),
+        ).cte('ledger')
+        return target, updated, (rollup, ledger)
+
+    def _derive_inserted(self, ids: Sequence[int | None]) -> Insert:
+        transactions = transactions_table()
+        inserted = (
+            select(transactions)
+            .where(transactions.c.id == any_(literal(ids, ARRAY(Integer))))
+            .subquery('inserted')
+        )
+        ledger = apply_ledger_deltas(ledger_deltas(inserted, 1)).cte('ledger')
+        return apply_deltas(transaction_deltas(inserted, 1)).add_cte(ledger)
+
+    async def _execute(
+        self,
+        query: Executable,
+        params: Sequence[Mapping[str, typing.Any]] | None = None,
+    ) -> Result[typing.Any]:
+        with warnings.catch_warnings(action='ignore'):
+            return await self.session.execute(query, params)
+
+    async def _execute_guarded(
+        self,
+        query: Select[typing.Any],
+    ) -> Sequence[Row[typing.Any]]:
+        async with self._writing() as written_users:
+            result = await self._execute(query)
+            rows = result.all()
+            written_users.update(row.user_id for row in rows if row.updated)
+            return rows
+
+    @contextlib.asynccontextmanager
+    async def _writing(self) -> AsyncIterator[set[int]]:
+        """Commits the statements executed inside,
+        so the derived tables never diverge from the transactions.
+
+        Yields a set to collect the owners of the written rows,
+        their cached analytics are invalidated once the commit is over,
+        even a failed one, as it may have reached the database anyway.
+        """
+        written_users: set[int] = set()
         try:
-            return await super().update(instance)
+            yield written_users
+            await self.session.commit()
         except IntegrityError as e:
             self._handle_integrity_error(e)
+        except DBAPIError as e:
+            if is_data_error(e):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                ) from e
+
+            raise e
+        finally:
+            analytics_cache.invalidate(written_users)
 
     @staticmethod
     def _handle_integrity_error(error: IntegrityError) -> typing.NoReturn:
@@ -83,10 +365,76 @@ class TransactionCRUD(BaseCRUD[Transaction]):
 
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'{related_entity} does not exist',
+            detail=missing_reference_detail(related_entity),
         ) from error
 
 
+def missing_reference_detail(related_entity: str) -> str:
+    return f'{related_entity} does not exist'
+
+
+def compile_transaction_filters(
+    filters: TransactionFilters,
+) -> list[WhereClause]:
+    """Every condition here is backed by a (user_id, <column>, ...) index,
+    keep them in sync when adding new filters."""
+    if (
+        filters.occurred_from is not None
+        and filters.occurred_to is not None
+        and filters.occurred_from > filters.occurred_to
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='occurred_from must not be later than occurred_to',
+        )
+
+    if (
+        filters.amount_min is not None
+        and filters.amount_max is not None
+        and filters.amount_min > filters.amount_max
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='amount_min must not be greater than amount_max',
+        )
+
+    clauses: list[WhereClause] = []
+
+    for field in _EQUALITY_FILTERS:
+        value = getattr(filters, field)
+        if value is not None:
+            clauses.append(col(getattr(Transaction, field)) == value)
+
+    if filters.occurred_from is not None:
+        clauses.append(col(Transaction.occurred_at) >= filters.occurred_from)
+    if filters.occurred_to is not None:
+        clauses.append(col(Transaction.occurred_at) <= filters.occurred_to)
+    if filters.amount_min is not None:
+        clauses.append(col(Transaction.amount) >= filters.amount_min)
+    if filters.amount_max is not None:
+        clauses.append(col(Transaction.amount) <= filters.amount_max)
+
+    return clauses
+
+
+_EQUALITY_FILTERS: typing.Final = (
+    'sender_bank_id',
+    'recipient_bank_id',
+    'status',
+    'recipient_inn',
+    'transaction_type',
+    'category_id',
+)
+
+
+class GuardedTransaction(typing.Protocol):
+    @property
+    def user_id(self) -> int: ...
+
+    @property
+    def status(self) -> TransactionStatus: ...
+
+
 class TransactionGuard:
     EDIT_FORBIDDEN_STATUSES: typing.ClassVar[Set[TransactionStatus]] = {
         TransactionStatus.CONFIRMED,
@@ -117,10 +465,39 @@ class TransactionGuard:
         'recipient_phone',
     }
 
-    def __init__(self, transaction: Transaction, user: User) -> None:
+    def __init__(self, transaction: GuardedTransaction, user: User) -> None:
         self.transaction = transaction
         self.user = user
 
+    @classmethod
+    def editable_conditions(cls, user: User) -> list[ColumnElement[bool]]:
+        """SQL counterpart of `ensure_editable` (except the fields check)."""
+        return [
+            *cls._owner_or_admin_conditions(user),
+            col(Transaction.status).not_in(cls.EDIT_FORBIDDEN_STATUSES),
+        ]
+
+    @classmethod
+    def deletable_conditions(cls, user: User) -> list[ColumnElement[bool]]:
+        """SQL counterpart of `ensure_deletable`."""
+        return [
+            *cls._owner_or_admin_conditions(user),
+            col(Transaction.status).not_in(cls.DELETE_FORBIDDEN_STATUSES),
+        ]
+
+    @staticmethod
+    def _owner_or_admin_conditions(user: User) -> list[ColumnElement[bool]]:
+        if user.is_admin:
+            return []
+        return [col(Transaction.user_id) == user.id]
+
+    @classmethod
+    def fields_are_editable(
+        cls,
+        update_data: Mapping[str, typing.Any],
+    ) -> bool:
+        return all(field in cls.ALLOWED_UPDATE_FIELDS for field in update_data)
+
     def ensure_editable(self, update_data: Mapping[str, typing.Any]) -> None:
         self._ensure_user_is_owner_or_admin()
 
@@ -174,44 +551,239 @@ class TransactionService:
         )
         return await self.crud.create(transaction_with_user)
 
+    async def create_transactions(
+        self,
+        transactions: Sequence[TransactionCreate],
+    ) -> TransactionBatchResult:
+        """Creates transactions in bulk.
+
+        Items referencing missing banks or categories are reported
+        as failed, the rest are inserted within a single transaction.
+        """
+        (
+            existing_banks,
+            existing_categories,
+        ) = await self.crud.existing_references(
+            bank_ids={
+                bank_id
+                for t in transactions
+                for bank_id in (t.sender_bank_id, t.recipient_bank_id)
+            },
+            category_ids={t.category_id for t in transactions},
+        )
+
+        results: list[TransactionBatchItemResult] = []
+        rows: list[dict[str, typing.Any]] = []
+        for index, transaction in enumerate(transactions):
+            detail = None
+            if transaction.category_id not in existing_categories:
+                detail = missing_reference_detail('category')
+            elif (
+                not {
+                    transaction.sender_bank_id,
+                    transaction.recipient_bank_id,
+                }
+                <= existing_banks
+            ):
+                detail = missing_reference_detail('bank')
+
+            if detail is not None:
+                results.append(
+                    TransactionBatchItemResult(
+                        index=index,
+                        status=BatchItemStatus.FAILED,
+                        detail=detail,
+                    ),
+                )
+                continue
+
+            results.append(
+                TransactionBatchItemResult(
+                    index=index,
+                    status=BatchItemStatus.CREATED,
+                ),
+            )
+            rows.append(transaction.model_dump() | {'user_id': self.user.id})
+
+        ids = iter(await self.crud.create_many(rows))
+        for result in results:
+            if result.status is BatchItemStatus.CREATED:
+                result.id = next(ids)
+
+        return TransactionBatchResult(items=results)
+
     async def update_transaction(
         self,
         transaction_id: int,
         updated_transaction: TransactionUpdate,
     ) -> Transaction:
-        current_transaction = await self.crud.get(transaction_id)
-
         update_data = updated_transaction.model_dump(
             exclude_unset=True,
             exclude_defaults=True,
         )
-        TransactionGuard(current_transaction, self.user).ensure_editable(
-            update_data,
+        conditions = TransactionGuard.editable_conditions(self.user)
+        if not TransactionGuard.fields_are_editable(update_data):
+            # let the guard report the error in its usual order
+            conditions.append(false())
+
+        row, transaction = await self.crud.guarded_update_one(
+            transaction_id,
+            values=update_data,
+            conditions=conditions,
         )
+        if transaction is None:
+            TransactionGuard(row, self.user).ensure_editable(update_data)
+            raise CONCURRENT_MODIFICATION_EXCEPTION
 
-        current_transaction.sqlmodel_update(update_data)
-        return await self.crud.update(current_transaction)
+        return transaction
 
     async def delete_transaction(self, transaction_id: int) -> None:
-        transaction = await self.crud.get(transaction_id)
+        row, transaction = await self.crud.guarded_update_one(
+            transaction_id,
+            values={'status': TransactionStatus.DELETED},
+            conditions=TransactionGuard.deletable_conditions(self.user),
+        )
+        if transaction is None:
+            TransactionGuard(row, self.user).ensure_deletable()
+            raise CONCURRENT_MODIFICATION_EXCEPTION
+
+    async def delete_transactions(
+        self,
+        transaction_ids: Set[int],
+    ) -> TransactionBulkResult:
+        rows = await self.crud.guarded_update(
+            transaction_ids,
+            values={'status': TransactionStatus.DELETED},
+            conditions=TransactionGuard.deletable_conditions(self.user),
+        )
+        return self._bulk_result(
+            transaction_ids,
+            rows,
+            check=TransactionGuard.ensure_deletable,
+        )
 
-        TransactionGuard(transaction, self.user).ensure_deletable()
+    async def update_transactions_status(
+        self,
+        transaction_ids: Set[int],
+        new_status: TransactionStatus,
+    ) -> TransactionBulkResult:
+        rows = await self.crud.guarded_update(
+            transaction_ids,
+            values={'status': new_status},
+            conditions=TransactionGuard.editable_conditions(self.user),
+        )
+        return self._bulk_result(
+            transaction_ids,
+            rows,
+            check=lambda guard: guard.ensure_editable({'status': new_status}),
+        )
+
+    def _bulk_result(
+        self,
+        transaction_ids: Set[int],
+        rows: Sequence[GuardedUpdateRow],
+        check: typing.Callable[[TransactionGuard], None],
+    ) -> TransactionBulkResult:
+        """Rebuilds the guard's verdicts for the rejected rows
+        from their state before the update."""
+        result = TransactionBulkResult(updated=[], rejected=[])
+
+        for row in rows:
+            if row.updated:
+                result.updated.append(row.id)
+                continue
+
+            try:
+                check(TransactionGuard(row, self.user))
+                raise CONCURRENT_MODIFICATION_EXCEPTION
+            except HTTPException as e:
+                result.rejected.append(
+                    BulkRejection(
+                        id=row.id,
+                        status_code=e.status_code,
+                        detail=e.detail,
+                    ),
+                )
+
+        found = {row.id for row in rows}
+        result.rejected.extend(
+            BulkRejection(
+                id=transaction_id,
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Transaction not found',
+            )
+            for transaction_id in sorted(transaction_ids - found)
+        )
 
-        transaction.status = TransactionStatus.DELETED
-        await self.crud.update(transaction)
+        result.updated.sort()
+        result.rejected.sort(key=lambda rejection: rejection.id)
+        return result
 
     async def user_transactions(
         self,
+        fields: Sequence[str],
         order_by: Sequence[OrderByItem] | None = None,
-        offset: int | None = None,
-        limit: int | None = None,
-    ) -> SequenceResponse[Transaction]:
-        user_filter = (Transaction.user_id == self.user.id,)
-        count = await self.crud.count(filters=user_filter)
-        items = await self.crud.list(
-            filters=(user_filter),
+        pagination: PaginationParams | None = None,
+        filters: TransactionFilters | None = None,
+    ) -> SequenceResponse[Mapping[str, typing.Any]]:
+        """Returns a page of the user's transactions as plain rows.
+
+        Only the given fields are selected, the id is always included.
+        The ordering fields are selected as well to build the cursor,
+        but are not returned unless asked.
+        """
+        pagination = self._check_pagination(pagination)
+
+        returned = list(dict.fromkeys(['id', *fields]))
+        order_fields = [item.field for item in order_by or ()]
+        selected = list(dict.fromkeys([*returned, *order_fields]))
+
+        rows, count = await self.crud.list_rows_with_count(
+            selected,
+            filters=self._user_filters(filters),
             order_by=order_by,
-            offset=offset,
-            limit=limit,
+            offset=pagination.offset,
+            limit=pagination.limit + 1,
+            cursor=pagination.cursor,
+            total_count=pagination.total_count,
+        )
+
+        next_cursor = None
+        if len(rows) > pagination.limit:
+            rows = rows[: pagination.limit]
+            next_cursor = self.crud.next_cursor(rows[-1], order_by)
+
+        if len(selected) > len(returned):
+            rows = [{field: row[field] for field in returned} for row in rows]
+
+        # the rows come straight from the database, skip the validation
+        return SequenceResponse[Mapping[str, typing.Any]].model_construct(
+            items=rows,
+            total_count=count,
+            next_cursor=next_cursor,
         )
-        return SequenceResponse(items=items, total_count=count)
+
+    @staticmethod
+    def _check_pagination(
+        pagination: PaginationParams | None,
+    ) -> PaginationParams:
+        if pagination is None:
+            return PaginationParams()
+
+        if pagination.cursor is not None and pagination.offset:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Cursor cannot be combined with offset',
+            )
+
+        return pagination
+
+    def _user_filters(
+        self,
+        filters: TransactionFilters | None,
+    ) -> list[WhereClause]:
+        where: list[WhereClause] = [Transaction.user_id == self.user.id]
+        if filters is not None:
+            where.extend(compile_transaction_filters(filters))
+
+        return where
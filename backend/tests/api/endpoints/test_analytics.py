@@ -0,0 +1,124 @@
+from fastapi import status
+from httpx import AsyncClient
+import pytest
+
+PARAMS = {'start': '2024-07-01', 'end': '2024-07-31'}
+
+
+@pytest.mark.parametrize(
+    ('path', 'params'),
+    [
+        ('/api/v1/analytics/admin/dashboard', PARAMS),
+        (
+            '/api/v1/analytics/admin/dynamics_by_interval',
+            PARAMS | {'interval': 'week'},
+        ),
+    ],
+)
+async def test_all_users_analytics_are_for_admins(
+    authenticated_client: AsyncClient,
+    admin_client: AsyncClient,
+    path: str,
+    params: dict[str, str],
+) -> None:
+    response = await authenticated_client.get(path, params=params)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = await admin_client.get(path, params=params)
+    assert response.status_code == status.HTTP_200_OK
+
+
+async def test_approximate_dynamics_are_for_all_users(
+    authenticated_client: AsyncClient,
+    admin_client: AsyncClient,
+) -> None:
+    params = PARAMS | {
+        'interval': 'month',
+        'accuracy': 'approximate',
+        'sample_percent': '100',
+    }
+    response = await admin_client.get(
+        '/api/v1/analytics/admin/dynamics_by_interval',
+        params=params,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['sample_percent'] == 100  # noqa: PLR2004
+
+    response = await authenticated_client.get(
+        '/api/v1/analytics/dynamics_by_interval',
+        params=params,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['sample_percent'] is None
+
+
+async def test_only_day_buckets_are_stepped(
+    authenticated_client: AsyncClient,
+) -> None:
+    response = await authenticated_client.get(
+        '/api/v1/analytics/dynamics_by_interval',
+        params=PARAMS | {'interval': 'week', 'step': 2},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_dynamics_comparison(
+    authenticated_client: AsyncClient,
+) -> None:
+    response = await authenticated_client.get(
+        '/api/v1/analytics/dynamics_by_interval/comparison',
+        params=PARAMS | {'interval': 'month', 'compare_to': 'previous_year'},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    [entry] = response.json()['entries']
+    assert entry['date'] == '2024-07-01'
+    assert entry['previous_date'] == '2023-07-01'
+    assert entry['count_percent'] is None
+
+
+async def test_balance(authenticated_client: AsyncClient) -> None:
+    response = await authenticated_client.get(
+        '/api/v1/analytics/balance',
+        params={'account_number': '123456', 'date': '2024-07-01'},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        'account_number': '123456',
+        'date': '2024-07-01',
+        'balance': '0',
+    }
+
+
+async def test_unfiltered_analytics_use_prepared_statements(
+    authenticated_client: AsyncClient,
+    admin_client: AsyncClient,
+) -> None:
+    async def calls() -> dict[str, int]:
+        response = await admin_client.get('/api/v1/ping/statements')
+        return {
+            name: stats['calls'] for name, stats in response.json().items()
+        }
+
+    before = await calls()
+    params = {'start': '2023-03-01', 'end': '2023-05-31'}
+    response = await authenticated_client.get(
+        '/api/v1/analytics/dashboard',
+        params=params,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = await authenticated_client.get(
+        '/api/v1/analytics/dynamics_by_interval',
+        params=params | {'interval': 'month'},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    # a filtered one is built as usual
+    response = await authenticated_client.get(
+        '/api/v1/analytics/dashboard',
+        params=params | {'status': 'NEW'},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    after = await calls()
+    assert after['dashboard'] == before['dashboard'] + 1
+    assert after['dynamics_by_month'] == before['dynamics_by_month'] + 1
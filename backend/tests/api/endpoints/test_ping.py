@@ -20,3 +20,45 @@ async def test_ping_extra(admin_client: AsyncClient, migrated_db: str) -> None:
 async def test_ping_extra_unauthorized(client: AsyncClient) -> None:
     response = await client.get('/api/v1/ping/extra')
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_prepared_statements(
+    authenticated_client: AsyncClient,
+    admin_client: AsyncClient,
+) -> None:
+    response = await authenticated_client.get('/api/v1/ping/statements')
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = await admin_client.get('/api/v1/ping/statements')
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()['dashboard']) == {
+        'prepares',
+        'prepare_seconds',
+        'calls',
+        'seconds',
+    }
+
+
+async def test_analytics_caches(
+    authenticated_client: AsyncClient,
+    admin_client: AsyncClient,
+) -> None:
+    response = await authenticated_client.get('/api/v1/ping/caches')
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = await admin_client.get('/api/v1/ping/caches')
+    assert response.status_code == status.HTTP_200_OK
+    before = response.json()['results']
+
+    for _ in range(2):
+        response = await authenticated_client.get(
+            '/api/v1/analytics/dashboard',
+            params={'start': '2023-01-01', 'end': '2023-01-31'},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    response = await admin_client.get('/api/v1/ping/caches')
+    after = response.json()
+    assert after['results']['misses'] == before['misses'] + 1
+    assert after['results']['hits'] == before['hits'] + 1
+    assert set(after['cubes']) == {'hits', 'misses', 'cubes', 'size'}
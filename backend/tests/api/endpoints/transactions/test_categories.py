@@ -4,6 +4,7 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.transaction import (
+    Transaction,
     TransactionCategory,
 )
 
@@ -69,6 +70,26 @@ async def test_delete_category(
     assert deleted is None
 
 
+async def test_delete_category_in_use(
+    admin_client: AsyncClient,
+    transaction: Transaction,
+) -> None:
+    response = await admin_client.delete(
+        f'/api/v1/transactions/categories/{transaction.category_id}',
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert (
+        response.json()['detail'] == 'Category is referenced by transactions'
+    )
+
+
+async def test_delete_category_not_found(admin_client: AsyncClient) -> None:
+    response = await admin_client.delete(
+        '/api/v1/transactions/categories/99999',
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 async def test_all_categories(
     session: AsyncSession,
     admin_client: AsyncClient,
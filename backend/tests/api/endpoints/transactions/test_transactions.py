@@ -1,11 +1,12 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import typing
 from typing import Any
 
 from fastapi import status
 from httpx import AsyncClient
 import pytest
 from pytest_lazy_fixtures import lf
-from sqlmodel import select
+from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.bank import Bank
@@ -98,3 +99,310 @@ async def test_transaction_update_success(
             original_transaction,
             field,
         )
+
+
+@pytest.fixture
+async def many_transactions(
+    session: AsyncSession,
+    transaction: Transaction,
+) -> list[Transaction]:
+    transactions = [transaction]
+    for i in range(6):
+        copy = Transaction.model_validate(
+            transaction.model_dump(exclude={'id', 'created_at'}),
+        )
+        # a couple of rows share occurred_at to exercise the tiebreaker
+        copy.occurred_at = transaction.occurred_at - timedelta(days=i // 2)
+        transactions.append(copy)
+
+    session.add_all(transactions)
+    await session.commit()
+    return transactions
+
+
+async def test_transactions_cursor_pagination(
+    authenticated_client: AsyncClient,
+    many_transactions: list[Transaction],
+) -> None:
+    url = '/api/v1/transactions'
+    params: dict[str, Any] = {'order_by': '-occurred_at', 'limit': 3}
+
+    response = await authenticated_client.get(
+        url,
+        params=params | {'limit': 99},
+    )
+    expected_ids = [item['id'] for item in response.json()['items']]
+    assert len(expected_ids) == len(many_transactions)
+
+    got_ids: list[int] = []
+    while True:
+        response = await authenticated_client.get(url, params=params)
+        assert response.status_code == status.HTTP_200_OK
+
+        data = response.json()
+        got_ids.extend(item['id'] for item in data['items'])
+        if data['next_cursor'] is None:
+            break
+        params['cursor'] = data['next_cursor']
+
+    assert got_ids == expected_ids
+
+
+async def test_transactions_cursor_with_offset(
+    authenticated_client: AsyncClient,
+    many_transactions: list[Transaction],
+) -> None:
+    response = await authenticated_client.get(
+        '/api/v1/transactions',
+        params={'limit': 3},
+    )
+    cursor = response.json()['next_cursor']
+
+    response = await authenticated_client.get(
+        '/api/v1/transactions',
+        params={'limit': 3, 'offset': 3, 'cursor': cursor},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize(
+    ('total_count', 'expected'),
+    [
+        ('exact', 7),
+        ('none', None),
+    ],
+)
+async def test_transactions_total_count_mode(
+    authenticated_client: AsyncClient,
+    many_transactions: list[Transaction],
+    total_count: str,
+    expected: int | None,
+) -> None:
+    response = await authenticated_client.get(
+        '/api/v1/transactions',
+        params={'limit': 3, 'total_count': total_count},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['total_count'] == expected
+
+
+async def test_transactions_sparse_fields(
+    authenticated_client: AsyncClient,
+    many_transactions: list[Transaction],
+) -> None:
+    url = '/api/v1/transactions'
+    params: dict[str, Any] = {
+        'fields': ['amount', 'status', 'occurred_at'],
+        'order_by': '-created_at',
+        'limit': 4,
+    }
+
+    response = await authenticated_client.get(url, params=params)
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert data['total_count'] == len(many_transactions)
+    for item in data['items']:
+        assert set(item) == {'id', 'amount', 'status', 'occurred_at'}
+
+    # the ordering field is not returned, but the cursor still works
+    response = await authenticated_client.get(
+        url,
+        params=params | {'cursor': data['next_cursor']},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    ids = [item['id'] for item in data['items']]
+    ids += [item['id'] for item in response.json()['items']]
+    assert sorted(ids) == sorted(
+        typing.cast(int, t.id) for t in many_transactions
+    )
+
+
+async def test_transactions_unknown_field(
+    authenticated_client: AsyncClient,
+) -> None:
+    response = await authenticated_client.get(
+        '/api/v1/transactions',
+        params={'fields': 'user_id'},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_transactions_filters(
+    authenticated_client: AsyncClient,
+    session: AsyncSession,
+    many_transactions: list[Transaction],
+    another_category: TransactionCategory,
+) -> None:
+    matching = many_transactions[:2]
+    for transaction in matching:
+        transaction.category_id = typing.cast(int, another_category.id)
+        transaction.status = TransactionStatus.CONFIRMED
+    session.add_all(matching)
+    await session.commit()
+
+    response = await authenticated_client.get(
+        '/api/v1/transactions',
+        params={
+            'category_id': another_category.id,
+            'status': TransactionStatus.CONFIRMED.value,
+            'amount_min': 100,
+            'amount_max': 100,
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert data['total_count'] == len(matching)
+    assert {item['id'] for item in data['items']} == {
+        transaction.id for transaction in matching
+    }
+
+
+@pytest.mark.parametrize(
+    'params',
+    [
+        {'amount_min': 10, 'amount_max': 5},
+        {
+            'occurred_from': '2025-01-02T00:00:00Z',
+            'occurred_to': '2025-01-01T00:00:00Z',
+        },
+    ],
+)
+async def test_transactions_filters_with_empty_range(
+    authenticated_client: AsyncClient,
+    params: dict[str, Any],
+) -> None:
+    response = await authenticated_client.get(
+        '/api/v1/transactions',
+        params=params,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_transactions_batch_create(
+    authenticated_client: AsyncClient,
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    item = {
+        'party_type': PartyType.INDIVIDUAL.value,
+        'transaction_type': TransactionType.DEBIT.value,
+        'amount': 10.5,
+        'occurred_at': datetime.now(timezone.utc).isoformat(),
+        'sender_bank_id': bank.id,
+        'account_number': '123456',
+        'recipient_bank_id': bank.id,
+        'recipient_inn': '6449013711',
+        'recipient_account_number': '123456',
+        'category_id': category.id,
+        'recipient_phone': '+79999999999',
+    }
+    items = [
+        item,
+        item | {'category_id': 99999},
+        item | {'recipient_bank_id': 99999},
+        item | {'comment': 'second'},
+    ]
+
+    response = await authenticated_client.post(
+        url='/api/v1/transactions/batch',
+        json={'items': items},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    results = response.json()['items']
+    assert [r['status'] for r in results] == [
+        'created',
+        'failed',
+        'failed',
+        'created',
+    ]
+    assert results[1]['detail'] == 'category does not exist'
+    assert results[2]['detail'] == 'bank does not exist'
+
+    created_ids = [results[0]['id'], results[3]['id']]
+    query = select(Transaction).where(col(Transaction.id).in_(created_ids))
+    created = (await session.exec(query)).all()
+    assert len(created) == len(created_ids)
+    assert all(t.user_id == user.id for t in created)
+
+
+async def test_transactions_batch_create_empty(
+    authenticated_client: AsyncClient,
+) -> None:
+    response = await authenticated_client.post(
+        url='/api/v1/transactions/batch',
+        json={'items': []},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_transactions_bulk_delete(
+    authenticated_client: AsyncClient,
+    session: AsyncSession,
+    many_transactions: list[Transaction],
+    admin_user: User,
+) -> None:
+    confirmed, foreign, *deletable = many_transactions
+    confirmed.status = TransactionStatus.CONFIRMED
+    assert admin_user.id is not None
+    foreign.user_id = admin_user.id
+    session.add_all([confirmed, foreign])
+    await session.commit()
+
+    ids = [typing.cast(int, t.id) for t in many_transactions]
+    missing_id = max(ids) + 1
+    response = await authenticated_client.post(
+        url='/api/v1/transactions/batch/delete',
+        json={'ids': [*ids, missing_id]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert data['updated'] == ids[2:]
+    rejected = {r['id']: r['status_code'] for r in data['rejected']}
+    assert rejected == {
+        confirmed.id: status.HTTP_400_BAD_REQUEST,
+        foreign.id: status.HTTP_403_FORBIDDEN,
+        missing_id: status.HTTP_404_NOT_FOUND,
+    }
+
+    for t in many_transactions:
+        await session.refresh(t)
+    assert all(t.status == TransactionStatus.DELETED for t in deletable)
+    assert confirmed.status == TransactionStatus.CONFIRMED
+    assert foreign.status == TransactionStatus.NEW
+
+
+async def test_transactions_bulk_status_update(
+    authenticated_client: AsyncClient,
+    session: AsyncSession,
+    many_transactions: list[Transaction],
+) -> None:
+    executed, *editable = many_transactions
+    executed.status = TransactionStatus.EXECUTED
+    session.add(executed)
+    await session.commit()
+
+    response = await authenticated_client.post(
+        url='/api/v1/transactions/batch/status',
+        json={
+            'ids': [t.id for t in many_transactions],
+            'status': TransactionStatus.CONFIRMED,
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert data['updated'] == [t.id for t in editable]
+    assert data['rejected'] == [
+        {
+            'id': executed.id,
+            'status_code': status.HTTP_400_BAD_REQUEST,
+            'detail': "Transaction with status 'EXECUTED' cannot be edited",
+        },
+    ]
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import orjson
+
+from api.responses import RowsResponse
+from models.transaction import TransactionStatus
+from schemas.transactions import TransactionOutSparse
+
+
+def test_rows_response_matches_pydantic_encoding() -> None:
+    row = {
+        'id': 1,
+        'amount': Decimal('100.50000'),
+        'status': TransactionStatus.NEW,
+        'occurred_at': datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+        'updated_at': None,
+    }
+
+    response = RowsResponse([row])
+
+    expected = TransactionOutSparse.model_validate(row).model_dump(
+        mode='json',
+        exclude_unset=True,
+    )
+    assert orjson.loads(response.body) == [expected]
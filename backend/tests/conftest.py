@@ -11,7 +11,7 @@ from asgi_lifespan import LifespanManager
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 import pytest
-from sqlalchemy import NullPool
+from sqlalchemy import NullPool, text
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncEngine
 from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.types import ASGIApp
@@ -20,6 +20,10 @@ from api.v1.router import api_router
 from core.config import settings
 from db.session import create_async_engine, create_async_session_factory
 from models.user import User
+from services.analytics.cache import analytics_cache
+from services.analytics.cube import analytics_cubes
+from services.ledger import rebuild_ledger
+from services.rollups import rebuild_rollups
 from services.users import create_user
 from tests.utils import get_alembic_config, tmp_database
 
@@ -36,6 +40,14 @@ def event_loop_policy() -> AbstractEventLoopPolicy:
         return uvloop.EventLoopPolicy()
 
 
+@pytest.fixture(autouse=True)
+def clear_analytics_cache() -> Generator[None]:
+    # every test gets a fresh database, where the user ids start over
+    yield
+    analytics_cache.clear()
+    analytics_cubes.clear()
+
+
 @pytest.fixture(scope='session')
 def db_url() -> str:
     return os.getenv('TEST_DATABASE_URL', settings.DATABASE_URL)
@@ -135,3 +147,72 @@ async def admin_user(session: AsyncSession) -> User:
         password='password',
         is_admin=True,
     )
+
+
+LARGE_SEED_USERS = 50
+LARGE_SEED_TRANSACTIONS = 20_000
+
+
+@pytest.fixture
+async def large_seed(session: AsyncSession, user: User) -> User:
+    """
+    Fills the database with transactions of many users, `user` included,
+    and collects statistics, so the planner sees a realistic distribution.
+    """
+    statements = (
+        """
+        INSERT INTO users (username, password, is_admin)
+        SELECT 'seed_user_' || g, '', false
+        FROM generate_series(1, :users) g
+        """,
+        """
+        INSERT INTO banks (name)
+        SELECT 'seed_bank_' || g FROM generate_series(1, 10) g
+        """,
+        """
+        INSERT INTO transaction_categories (name)
+        SELECT 'seed_category_' || g FROM generate_series(1, 10) g
+        """,
+        """
+        INSERT INTO transactions (
+            party_type, occurred_at, transaction_type, comment, amount,
+            status, sender_bank_id, account_number, recipient_bank_id,
+            recipient_inn, recipient_account_number, category_id,
+            recipient_phone, user_id
+        )
+        SELECT
+            (ARRAY['INDIVIDUAL', 'LEGAL_ENTITY'])[1 + g % 2]::partytype,
+            timestamptz '2020-01-01' + (g % 1827) * interval '1 day',
+            (ARRAY['CREDIT', 'DEBIT'])[1 + g / 3 % 2]::transactiontype,
+            '',
+            1 + g % 100000 / 100.0,
+            (ARRAY[
+                'NEW', 'CONFIRMED', 'PROCESSING', 'CANCELLED',
+                'EXECUTED', 'DELETED', 'REFUNDED'
+            ])[1 + g % 7]::transactionstatus,
+            b.ids[1 + g % array_length(b.ids, 1)],
+            '123456',
+            b.ids[1 + g / 7 % array_length(b.ids, 1)],
+            '6449013711',
+            '123456',
+            c.ids[1 + g / 11 % array_length(c.ids, 1)],
+            '+79999999999',
+            u.ids[1 + g % array_length(u.ids, 1)]
+        FROM generate_series(1, :transactions) g,
+            (SELECT array_agg(id) AS ids FROM banks) b,
+            (SELECT array_agg(id) AS ids FROM transaction_categories) c,
+            (SELECT array_agg(id) AS ids FROM users) u
+        """,
+    )
+    params = {
+        'users': LARGE_SEED_USERS,
+        'transactions': LARGE_SEED_TRANSACTIONS,
+    }
+    for statement in statements:
+        await session.execute(text(statement), params)
+
+    await rebuild_rollups(session)
+    await rebuild_ledger(session)
+    await session.execute(text('ANALYZE'))
+    await session.commit()
+    return user
@@ -0,0 +1,103 @@
+from datetime import date
+
+from asyncpg.exceptions import InvalidCachedStatementError
+import pytest
+from sqlalchemy import bindparam, Date, Integer, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db.prepared import (
+    _driver,
+    INFO_KEY,
+    PreparedStatements,
+    statements,
+    StatementStats,
+)
+from models.transaction import TransactionDailyRollup
+from models.user import User
+from schemas.analytics import Interval
+from services.analytics.analytics import (
+    DashboardService,
+    DynamicsByIntervalService,
+)
+
+
+def test_arguments() -> None:
+    registry = PreparedStatements()
+    registry.register(
+        'rollups',
+        select(TransactionDailyRollup).where(
+            col(TransactionDailyRollup.day)
+            >= bindparam('start', date(2024, 1, 1), type_=Date),
+            col(TransactionDailyRollup.user_id)
+            == bindparam('user_id', None, type_=Integer),
+        ),
+    )
+    statement = registry._statements['rollups']
+
+    assert '$1' in statement.sql
+    assert '$2' in statement.sql
+    assert statement.arguments({'user_id': 1}) == [date(2024, 1, 1), 1]
+    assert registry.stats() == {'rollups': StatementStats(0, 0.0, 0, 0.0)}
+
+
+async def test_analytics_use_prepared_statements(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    before = statements.stats()
+    start, end = date(2024, 1, 1), date(2024, 12, 31)
+
+    await DashboardService(session, user).get(start, end)
+    await DynamicsByIntervalService(session, user).get(
+        start,
+        end,
+        Interval.MONTH,
+    )
+
+    after = statements.stats()
+    assert after['dashboard'].calls == before['dashboard'].calls + 1
+    assert (
+        after['dynamics_by_month'].calls
+        == before['dynamics_by_month'].calls + 1
+    )
+    assert after['dashboard'].prepares > 0
+
+
+async def test_invalidated_statement_is_prepared_again(
+    engine: AsyncEngine,
+    user: User,
+) -> None:
+    registry = PreparedStatements()
+    registry.register(
+        'username',
+        select(col(User.username)).where(
+            col(User.id) == bindparam('user_id', None, type_=Integer),
+        ),
+    )
+    alter = 'ALTER TABLE users ALTER COLUMN username TYPE {}'
+    params = {'user_id': user.id}
+
+    async with engine.connect() as connection:
+        driver = await _driver(connection)
+        prepared = connection.info[INFO_KEY]
+        prepared |= await registry._prepare(driver)
+        prepares = registry.stats()['username'].prepares
+        session = AsyncSession(bind=connection)
+
+        # out of a transaction it is retried right away
+        await driver.execute(alter.format('text'))
+        rows = await registry.fetch(session, 'username', params)
+        assert rows == [{'username': 'user'}]
+        assert registry.stats()['username'].prepares == prepares + 1
+
+        # the transaction is aborted, the statement is built from now on
+        transaction = driver.transaction()
+        await transaction.start()
+        await driver.execute(alter.format('varchar'))
+        with pytest.raises(InvalidCachedStatementError):
+            await registry.fetch(session, 'username', params)
+        await transaction.rollback()
+        assert 'username' not in prepared
+        assert await registry.fetch(session, 'username', params) is None
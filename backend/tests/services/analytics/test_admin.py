@@ -0,0 +1,100 @@
+from datetime import date
+import time
+
+from fastapi import HTTPException, status
+import pytest
+from sqlalchemy import func, select
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from models.transaction import Transaction, TransactionStatus
+from models.user import User
+from schemas.analytics import ConfidenceInterval, Interval
+from services.analytics.admin import (
+    AllUsersDashboardService,
+    AllUsersDynamicsByIntervalService,
+)
+
+# the whole large seed, generous for a slow CI runner
+LATENCY_BUDGET_SECONDS = 2
+
+
+@pytest.mark.usefixtures('large_seed')
+async def test_all_users_analytics(
+    session: AsyncSession,
+    admin_user: User,
+) -> None:
+    start, end = date(2020, 1, 1), date(2024, 12, 31)
+    transactions = (
+        await session.execute(select(func.count()).select_from(Transaction))
+    ).scalar_one()
+    deleted = (
+        await session.execute(
+            select(func.count()).where(
+                col(Transaction.status) == TransactionStatus.DELETED,
+            ),
+        )
+    ).scalar_one()
+
+    started = time.perf_counter()
+    dynamics = await AllUsersDynamicsByIntervalService(
+        session,
+        admin_user,
+    ).get(start, end, Interval.YEAR)
+    dashboard = await AllUsersDashboardService(session, admin_user).get(
+        start,
+        end,
+    )
+    elapsed = time.perf_counter() - started
+
+    assert sum(entry.count for entry in dynamics.entries) == transactions
+    assert (
+        sum(stats.total_transactions for stats in dashboard.by_type.values())
+        == transactions - deleted
+    )
+    assert elapsed < LATENCY_BUDGET_SECONDS
+
+
+@pytest.mark.usefixtures('large_seed')
+async def test_approximate_dynamics_of_whole_sample_are_exact(
+    session: AsyncSession,
+    admin_user: User,
+) -> None:
+    service = AllUsersDynamicsByIntervalService(session, admin_user)
+    start, end = date(2020, 1, 1), date(2024, 12, 31)
+
+    exact = await service.get(start, end, Interval.YEAR)
+    approximate = await service.get(
+        start,
+        end,
+        Interval.YEAR,
+        sample_percent=100,
+    )
+
+    assert approximate.sample_percent == 100  # noqa: PLR2004
+    assert [
+        (entry.date, entry.count, entry.confidence_interval)
+        for entry in approximate.entries
+    ] == [
+        (
+            entry.date,
+            entry.count,
+            ConfidenceInterval(low=entry.count, high=entry.count),
+        )
+        for entry in exact.entries
+    ]
+
+
+async def test_all_users_analytics_time_out(
+    session: AsyncSession,
+    admin_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, 'ADMIN_ANALYTICS_STATEMENT_TIMEOUT_MS', 1)
+    service = AllUsersDashboardService(session, admin_user)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.execute(select(func.pg_sleep(1)))
+
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
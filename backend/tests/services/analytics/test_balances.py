@@ -0,0 +1,145 @@
+# ruff: noqa: PLR2004
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.bank import Bank
+from models.transaction import (
+    PartyType,
+    Transaction,
+    TransactionCategory,
+    TransactionStatus,
+    TransactionType,
+)
+from models.user import User
+from schemas.analytics import BalanceEntry, Interval
+from services.analytics.balances import BalanceService
+from services.transactions import TransactionCRUD
+
+ACCOUNT = '123456'
+
+
+@pytest.fixture
+async def transactions(
+    session: AsyncSession,
+    user: User,
+    another_user: User,
+    bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    transactions = [
+        (user, ACCOUNT, '2024-01-15', TransactionType.CREDIT, 1000),
+        (user, ACCOUNT, '2024-03-10', TransactionType.DEBIT, 300),
+        (user, ACCOUNT, '2024-03-20', TransactionType.DEBIT, 200),
+        (user, ACCOUNT, '2024-05-02', TransactionType.CREDIT, 50),
+        (user, '654321', '2024-03-10', TransactionType.CREDIT, 7),
+        (another_user, ACCOUNT, '2024-03-10', TransactionType.CREDIT, 9),
+    ]
+    crud = TransactionCRUD(session)
+    for owner, account, day, transaction_type, amount in transactions:
+        await crud.create(
+            Transaction(
+                user_id=owner.id,
+                party_type=PartyType.INDIVIDUAL,
+                status=TransactionStatus.NEW,
+                transaction_type=transaction_type,
+                amount=Decimal(amount),
+                occurred_at=datetime.fromisoformat(f'{day}T10:00:00Z'),
+                sender_bank_id=bank.id,
+                account_number=account,
+                recipient_bank_id=bank.id,
+                recipient_inn='6449013711',
+                recipient_account_number='123456',
+                category_id=category.id,
+                recipient_phone='+79999999999',
+            ),
+        )
+
+
+@pytest.mark.parametrize(
+    ('day', 'expected'),
+    [
+        (date(2024, 1, 14), 0),
+        (date(2024, 1, 15), 1000),
+        (date(2024, 3, 15), 700),
+        (date(2024, 3, 31), 500),
+        (date(2025, 1, 1), 550),
+    ],
+)
+@pytest.mark.usefixtures('transactions')
+async def test_balance_at(
+    session: AsyncSession,
+    user: User,
+    day: date,
+    expected: int,
+) -> None:
+    balance = await BalanceService(session, user).at(ACCOUNT, day)
+
+    assert balance.date == day
+    assert balance.balance == Decimal(expected)
+
+
+@pytest.mark.parametrize(
+    ('start', 'interval', 'expected'),
+    [
+        (
+            date(2024, 2, 1),
+            Interval.MONTH,
+            [
+                ('2024-02-01', 1000),
+                ('2024-03-01', 500),
+                ('2024-04-01', 500),
+                ('2024-05-01', 550),
+            ],
+        ),
+        (
+            date(2024, 3, 4),
+            Interval.WEEK,
+            [
+                ('2024-03-04', 700),
+                ('2024-03-11', 700),
+                ('2024-03-18', 500),
+            ],
+        ),
+        (
+            date(2024, 3, 9),
+            Interval.DAY,
+            [
+                ('2024-03-09', 1000),
+                ('2024-03-10', 700),
+                ('2024-03-11', 700),
+            ],
+        ),
+        # a week across the months, seeded from the checkpoints of April
+        (
+            date(2024, 4, 22),
+            Interval.WEEK,
+            [
+                ('2024-04-22', 500),
+                ('2024-04-29', 550),
+                ('2024-05-06', 550),
+            ],
+        ),
+    ],
+)
+@pytest.mark.usefixtures('transactions')
+async def test_balance_series(
+    session: AsyncSession,
+    user: User,
+    start: date,
+    interval: Interval,
+    expected: list[tuple[str, int]],
+) -> None:
+    series = await BalanceService(session, user).series(
+        ACCOUNT,
+        start=start,
+        end=date.fromisoformat(expected[-1][0]),
+        interval=interval,
+    )
+
+    assert series.entries == [
+        BalanceEntry(date=date.fromisoformat(day), balance=Decimal(balance))
+        for day, balance in expected
+    ]
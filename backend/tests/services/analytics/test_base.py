@@ -1,8 +1,131 @@
-from services.analytics.base import BaseAnalytics
+from datetime import date
+import typing
 
+import pytest
+from sqlalchemy import Select
 
-def test_queries_exist() -> None:
-    all_analytic_services = BaseAnalytics.__subclasses__()
-    for service in all_analytic_services:
-        if service.query_template is not None:
-            assert service.query_template.exists()
+from models.user import User
+from schemas.analytics import AnalyticsFilters, Interval, SplitBy
+from services.analytics.analytics import (
+    DashboardService,
+    DynamicsByIntervalService,
+)
+from services.analytics.query_builder import (
+    analytics_query,
+    RollupsQuery,
+    TransactionsQuery,
+)
+
+START: typing.Final = date(2024, 7, 10)
+END: typing.Final = date(2024, 7, 20)
+
+
+def test_transactions_query_bounds_whole_days() -> None:
+    query = TransactionsQuery.for_days(1, START, END)
+
+    assert query.start_at.isoformat() == '2024-07-10T00:00:00+00:00'
+    assert query.end_at.isoformat() == '2024-07-21T00:00:00+00:00'
+
+
+def _dynamics_query(user: User) -> Select[typing.Any]:
+    service = DynamicsByIntervalService(None, user)  # type: ignore[arg-type]
+    return service.build_query(START, END, Interval.WEEK)
+
+
+def _dashboard_query(user: User) -> Select[typing.Any]:
+    service = DashboardService(None, user)  # type: ignore[arg-type]
+    return service.build_query(START, END)
+
+
+@pytest.mark.parametrize('build', [_dynamics_query, _dashboard_query])
+def test_queries_read_rollups_by_raw_day(
+    build: typing.Callable[[User], Select[typing.Any]],
+) -> None:
+    user = User(id=1, username='user', password='')
+    statement = str(build(user))
+    source = statement.split('FROM', 1)[1].split('WHERE', 1)[0]
+    where = statement.split('WHERE', 1)[1].split('GROUP BY', 1)[0]
+
+    assert source.strip() == 'transaction_daily_rollups'
+    assert 'transaction_daily_rollups.user_id =' in where
+    assert 'transaction_daily_rollups.day >=' in where
+    assert 'transaction_daily_rollups.day <=' in where
+    assert 'date_trunc' not in where
+
+
+@pytest.mark.parametrize(
+    ('filters', 'source', 'condition'),
+    [
+        ({'status': 'NEW'}, 'transaction_daily_rollups', 'status ='),
+        ({'category_id': 1}, 'transaction_daily_rollups', 'category_id ='),
+        ({'recipient_inn': '6449013711'}, 'transactions', 'recipient_inn ='),
+        ({'amount_min': '10'}, 'transactions', 'amount >='),
+        ({'amount_max': '10', 'status': 'NEW'}, 'transactions', 'amount <='),
+    ],
+)
+def test_filters_pick_the_source(
+    filters: dict[str, typing.Any],
+    source: str,
+    condition: str,
+) -> None:
+    query = analytics_query(
+        1,
+        START,
+        END,
+        AnalyticsFilters.model_validate(filters),
+    )
+    statement = str(query.select(query.count()))
+    where = statement.split('WHERE', 1)[1]
+
+    assert statement.split('FROM', 1)[1].split('WHERE', 1)[0].strip() == source
+    assert f'{source}.{condition}' in where
+    assert f'{source}.user_id =' in where
+
+
+def test_rollups_query_rejects_transaction_filters() -> None:
+    filters = AnalyticsFilters(recipient_inn='6449013711')
+
+    with pytest.raises(ValueError, match='require the transactions'):
+        RollupsQuery(1, START, END, filters)
+
+
+def test_dynamics_split_by_groups_by_dimensions() -> None:
+    user = User(id=1, username='user', password='')
+    service = DynamicsByIntervalService(None, user)  # type: ignore[arg-type]
+    query = service.build_query(
+        START,
+        END,
+        Interval.WEEK,
+        split_by=[SplitBy.TYPE, SplitBy.CATEGORY],
+    )
+
+    assert [c.name for c in query.selected_columns] == [
+        'date',
+        'type',
+        'category',
+        'count',
+        'amount',
+    ]
+    group_by = str(query).split('GROUP BY', 1)[1]
+    assert 'transaction_daily_rollups.transaction_type' in group_by
+    assert 'transaction_daily_rollups.category_id' in group_by
+
+
+@pytest.mark.parametrize(
+    'filters',
+    [None, AnalyticsFilters(recipient_inn='6449013711')],
+)
+def test_sampled_query_reads_sampled_pages(
+    filters: AnalyticsFilters | None,
+) -> None:
+    query = analytics_query(None, START, END, filters, sample_percent=2.5)
+    statement = str(
+        query.select(query.count())
+        .group_by(query.page())
+        .compile(compile_kwargs={'render_postcompile': True}),
+    )
+
+    # the rollups are never sampled, their rows are whole days
+    assert 'FROM transactions AS sample TABLESAMPLE system(2.5)' in statement
+    assert 'user_id' not in statement
+    assert 'GROUP BY (sample.ctid::text::point)[0]' in statement
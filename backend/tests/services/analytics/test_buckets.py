@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import column, Date
+from sqlalchemy.dialects import postgresql
+
+from schemas.analytics import Comparison, Interval
+from services.analytics.buckets import Buckets
+
+
+def test_day_buckets_are_counted_from_origin() -> None:
+    buckets = Buckets(Interval.DAY, origin=date(2024, 7, 3), step=7)
+
+    assert buckets.truncate(date(2024, 7, 9)) == date(2024, 7, 3)
+    assert buckets.truncate(date(2024, 7, 10)) == date(2024, 7, 10)
+    assert buckets.truncate(date(2024, 7, 2)) == date(2024, 6, 26)
+    assert buckets.dates(date(2024, 7, 3), date(2024, 7, 20)) == [
+        date(2024, 7, 3),
+        date(2024, 7, 10),
+        date(2024, 7, 17),
+    ]
+    assert buckets.last_day(date(2024, 7, 20)) == date(2024, 7, 23)
+
+
+def test_day_buckets_are_binned_in_sql() -> None:
+    buckets = Buckets(Interval.DAY, origin=date(2024, 7, 3), step=7)
+
+    sql = str(
+        buckets.expression(column('day', Date)).compile(
+            dialect=postgresql.dialect(),  # type: ignore[no-untyped-call]
+            compile_kwargs={'render_postcompile': True},
+        ),
+    )
+
+    assert 'date_bin' in sql
+    assert '2024-07-03' in sql
+
+
+@pytest.mark.parametrize('interval', [Interval.WEEK, Interval.MONTH])
+def test_only_day_buckets_are_stepped(interval: Interval) -> None:
+    with pytest.raises(ValueError, match='stepped'):
+        Buckets(interval, origin=date(2024, 7, 3), step=2)
+
+
+@pytest.mark.parametrize(
+    ('buckets', 'comparison', 'day', 'expected'),
+    [
+        (
+            Buckets(Interval.MONTH, origin=date(2024, 3, 1)),
+            Comparison.PREVIOUS_PERIOD,
+            date(2024, 3, 1),
+            date(2024, 2, 1),
+        ),
+        (
+            Buckets(Interval.QUARTER, origin=date(2024, 4, 1)),
+            Comparison.PREVIOUS_YEAR,
+            date(2024, 4, 1),
+            date(2023, 4, 1),
+        ),
+        (
+            Buckets(Interval.WEEK, origin=date(2024, 7, 1)),
+            Comparison.PREVIOUS_YEAR,
+            date(2024, 7, 1),
+            date(2023, 6, 26),
+        ),
+        (
+            Buckets(Interval.DAY, origin=date(2024, 7, 3), step=7),
+            Comparison.PREVIOUS_PERIOD,
+            date(2024, 7, 3),
+            date(2024, 6, 26),
+        ),
+    ],
+)
+def test_previous_buckets(
+    buckets: Buckets,
+    comparison: Comparison,
+    day: date,
+    expected: date,
+) -> None:
+    previous = buckets.previous(day, comparison)
+
+    assert previous == expected
+    assert buckets.truncate(previous) == previous
@@ -0,0 +1,70 @@
+# ruff: noqa: PLR2004
+from collections.abc import Hashable
+
+from services.analytics.cache import AnalyticsCache
+
+
+async def _get(
+    cache: AnalyticsCache,
+    user_id: int,
+    params: Hashable,
+    value: int,
+) -> int:
+    async def compute() -> int:
+        return value
+
+    return await cache.get_or_compute(user_id, 'query', params, compute)
+
+
+async def test_get_or_compute() -> None:
+    cache = AnalyticsCache()
+
+    assert await _get(cache, 1, (1,), value=1) == 1
+    assert await _get(cache, 1, (1,), value=2) == 1
+    assert await _get(cache, 2, (1,), value=3) == 3
+
+    assert cache.stats() == (1, 2, 2)
+
+
+async def test_invalidate() -> None:
+    cache = AnalyticsCache()
+    await _get(cache, 1, (), value=1)
+    await _get(cache, 2, (), value=1)
+
+    cache.invalidate([1])
+
+    assert await _get(cache, 1, (), value=2) == 2
+    assert await _get(cache, 2, (), value=2) == 1
+
+
+async def test_invalidate_all() -> None:
+    cache = AnalyticsCache()
+    await _get(cache, 1, (), value=1)
+    await _get(cache, 2, (), value=1)
+
+    cache.invalidate_all()
+
+    assert await _get(cache, 1, (), value=2) == 2
+    assert await _get(cache, 2, (), value=2) == 2
+
+
+async def test_result_computed_during_write_is_not_served() -> None:
+    cache = AnalyticsCache()
+
+    async def compute_while_written() -> int:
+        cache.invalidate([1])
+        return 1
+
+    await cache.get_or_compute(1, 'query', (), compute_while_written)
+
+    assert await _get(cache, 1, (), value=2) == 2
+
+
+async def test_least_recently_used_entry_is_evicted() -> None:
+    cache = AnalyticsCache(max_entries=2)
+    for params in (1, 2, 1, 3):
+        await _get(cache, 1, params, value=0)
+
+    assert cache.stats().entries == 2
+    assert await _get(cache, 1, 1, value=1) == 0
+    assert await _get(cache, 1, 2, value=2) == 2
@@ -0,0 +1,217 @@
+# ruff: noqa: PLR2004
+from collections.abc import Generator
+from datetime import date, datetime
+from decimal import Decimal
+import typing
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.bank import Bank
+from models.transaction import (
+    PartyType,
+    Transaction,
+    TransactionCategory,
+    TransactionStatus,
+    TransactionType,
+)
+from models.user import User
+from schemas.analytics import AnalyticsFilters, Comparison, Interval, SplitBy
+from services.analytics.analytics import DynamicsByIntervalService
+from services.analytics.buckets import Buckets
+from services.analytics.cache import analytics_cache
+from services.analytics.cube import analytics_cubes, Cube, CubeCache
+from services.transactions import TransactionCRUD
+
+
+def _cube(*cells: tuple[str, int, TransactionType, int, str]) -> Cube:
+    return Cube(
+        {
+            'day': date.fromisoformat(day),
+            'category_id': category_id,
+            'transaction_type': transaction_type,
+            'status': TransactionStatus.NEW,
+            'count': count,
+            'amount': Decimal(amount),
+        }
+        for day, category_id, transaction_type, count, amount in cells
+    )
+
+
+START, END = date(2024, 7, 1), date(2024, 8, 31)
+
+CUBE = _cube(
+    ('2024-06-30', 1, TransactionType.CREDIT, 5, '1'),
+    ('2024-07-01', 1, TransactionType.CREDIT, 2, '10.5'),
+    ('2024-07-01', 2, TransactionType.DEBIT, 1, '0.00001'),
+    ('2024-07-20', 1, TransactionType.DEBIT, 3, '7'),
+    ('2024-08-02', 2, TransactionType.CREDIT, 4, '2'),
+)
+
+
+def test_rows() -> None:
+    buckets = Buckets(Interval.MONTH, date(2024, 7, 1))
+
+    assert CUBE.rows(
+        date(2024, 7, 1),
+        date(2024, 8, 31),
+        buckets.truncate,
+    ) == [
+        {'date': date(2024, 7, 1), 'count': 6, 'amount': Decimal('17.50001')},
+        {'date': date(2024, 8, 1), 'count': 4, 'amount': Decimal(2)},
+    ]
+
+
+def test_rows_filtered_and_split() -> None:
+    buckets = Buckets(Interval.WEEK, date(2024, 7, 1))
+
+    rows = CUBE.rows(
+        date(2024, 7, 1),
+        date(2024, 7, 31),
+        buckets.truncate,
+        AnalyticsFilters(category_id=1),
+        [SplitBy.TYPE],
+    )
+
+    assert rows == [
+        {
+            'date': date(2024, 7, 1),
+            'type': TransactionType.CREDIT,
+            'count': 2,
+            'amount': Decimal('10.5'),
+        },
+        {
+            'date': date(2024, 7, 15),
+            'type': TransactionType.DEBIT,
+            'count': 3,
+            'amount': Decimal(7),
+        },
+    ]
+
+
+def test_only_dimension_filters_are_supported() -> None:
+    assert Cube.supports(AnalyticsFilters(status=TransactionStatus.NEW))
+    assert not Cube.supports(AnalyticsFilters(sender_bank_id=1))
+
+
+def test_least_recently_used_cubes_are_evicted() -> None:
+    cubes = CubeCache(max_bytes=CUBE.size * 2)
+    cubes.put(1, 0, CUBE)
+    cubes.put(2, 0, CUBE)
+    assert cubes.get(1, 0) is CUBE
+
+    cubes.put(3, 0, CUBE)
+
+    assert cubes.get(2, 0) is None
+    assert cubes.get(1, 0) is CUBE
+    assert cubes.get(1, 1) is None
+    assert cubes.stats() == (2, 2, 2, CUBE.size * 2)
+
+
+@pytest.fixture
+def cubes_on() -> Generator[None]:
+    analytics_cubes.max_bytes = 1 << 20
+    yield
+    analytics_cubes.max_bytes = 0
+
+
+async def _create_transaction(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+    occurred_at: str,
+) -> None:
+    await TransactionCRUD(session).create(
+        Transaction(
+            user_id=user.id,
+            party_type=PartyType.INDIVIDUAL,
+            status=TransactionStatus.NEW,
+            transaction_type=TransactionType.CREDIT,
+            amount=Decimal('100.0'),
+            occurred_at=datetime.fromisoformat(occurred_at),
+            sender_bank_id=bank.id,
+            account_number='123456',
+            recipient_bank_id=bank.id,
+            recipient_inn='6449013711',
+            recipient_account_number='123456',
+            category_id=category.id,
+            recipient_phone='+79999999999',
+        ),
+    )
+
+
+@pytest.mark.usefixtures('cubes_on')
+async def test_dynamics_are_answered_from_cube(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    service = DynamicsByIntervalService(session, user)
+    for occurred_at in ('2024-07-01T10:00:00Z', '2024-08-01T10:00:00Z'):
+        await _create_transaction(session, user, bank, category, occurred_at)
+
+    result = await service.get(
+        date(2024, 7, 1),
+        date(2024, 8, 31),
+        Interval.MONTH,
+    )
+    assert [entry.count for entry in result.entries] == [1, 1]
+
+    # a write makes the cube stale, the next read builds it again
+    await _create_transaction(
+        session,
+        user,
+        bank,
+        category,
+        '2024-08-02T10:00:00Z',
+    )
+    result = await service.get(
+        date(2024, 7, 1),
+        date(2024, 8, 31),
+        Interval.MONTH,
+    )
+    assert [entry.count for entry in result.entries] == [1, 2]
+
+    series = await service.series(START, END, Interval.MONTH)
+    assert series.series[0].amounts == [Decimal(100), Decimal(200)]
+    # only the reads right after the writes have built the cube
+    assert analytics_cubes.stats()[:2] == (1, 2)
+
+
+async def test_comparison_is_answered_from_cube(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    for occurred_at in (
+        '2023-07-03T10:00:00Z',
+        '2024-07-01T10:00:00Z',
+        '2024-07-02T10:00:00Z',
+        '2024-08-01T10:00:00Z',
+    ):
+        await _create_transaction(session, user, bank, category, occurred_at)
+
+    async def compare() -> list[dict[str, typing.Any]]:
+        result = await DynamicsByIntervalService(session, user).compare(
+            START,
+            END,
+            Interval.MONTH,
+            Comparison.PREVIOUS_YEAR,
+        )
+        return [entry.model_dump() for entry in result.entries]
+
+    expected = await compare()
+    assert analytics_cubes.stats().misses == 0
+
+    analytics_cache.clear()
+    analytics_cubes.max_bytes = 1 << 20
+    try:
+        assert await compare() == expected
+    finally:
+        analytics_cubes.max_bytes = 0
+
+    assert analytics_cubes.stats().misses == 1
+    assert expected[0]['count_percent'] == 100
@@ -0,0 +1,187 @@
+# ruff: noqa: PLR2004
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.bank import Bank
+from models.transaction import (
+    PartyType,
+    Transaction,
+    TransactionCategory,
+    TransactionStatus,
+    TransactionType,
+)
+from models.user import User
+from schemas.analytics import AnalyticsFilters
+from services.analytics.analytics import DashboardService
+from services.banks import BankService
+from services.rollups import rebuild_rollups
+from services.transactions import TransactionCategoryService
+
+
+@pytest.fixture
+async def another_bank(session: AsyncSession) -> Bank:
+    bank = Bank(name='Another bank')
+    session.add(bank)
+    await session.commit()
+    return bank
+
+
+@pytest.fixture
+async def transactions(  # noqa: PLR0913
+    session: AsyncSession,
+    user: User,
+    another_user: User,
+    bank: Bank,
+    another_bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    rows = [
+        # user, type, status, amount, sender bank, occurred at
+        (user, 'CREDIT', 'EXECUTED', '100', bank, '2024-07-01T10:00:00Z'),
+        (user, 'CREDIT', 'NEW', '50', another_bank, '2024-07-31T23:00:00Z'),
+        (user, 'DEBIT', 'EXECUTED', '40', bank, '2024-07-10T10:00:00Z'),
+        (user, 'DEBIT', 'CANCELLED', '10', bank, '2024-07-11T10:00:00Z'),
+        (user, 'DEBIT', 'DELETED', '1000', bank, '2024-07-12T10:00:00Z'),
+        # out of the range
+        (user, 'CREDIT', 'EXECUTED', '1000', bank, '2024-08-01T00:00:00Z'),
+        (another_user, 'DEBIT', 'NEW', '1000', bank, '2024-07-15T10:00:00Z'),
+    ]
+
+    for owner, type_, status, amount, sender_bank, occurred_at in rows:
+        session.add(
+            Transaction(
+                user_id=owner.id,
+                party_type=PartyType.INDIVIDUAL,
+                status=TransactionStatus(status),
+                transaction_type=TransactionType(type_),
+                amount=Decimal(amount),
+                occurred_at=datetime.fromisoformat(occurred_at),
+                sender_bank_id=sender_bank.id,
+                account_number='123456',
+                recipient_bank_id=bank.id,
+                recipient_inn='6449013711',
+                recipient_account_number='123456',
+                category_id=category.id,
+                recipient_phone='+79999999999',
+            ),
+        )
+    await session.commit()
+    await rebuild_rollups(session)
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_dashboard(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    another_bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    service = DashboardService(session, user)
+    result = await service.get(start=date(2024, 7, 1), end=date(2024, 7, 31))
+
+    credit = result.by_type[TransactionType.CREDIT]
+    debit = result.by_type[TransactionType.DEBIT]
+    assert (credit.total_transactions, credit.total_funds) == (
+        2,
+        Decimal(150),
+    )
+    assert (debit.total_transactions, debit.total_funds) == (2, Decimal(50))
+
+    assert result.received_and_spent.total_received == 150
+    assert result.received_and_spent.total_spent == 50
+    assert result.received_and_spent.received_to_spent == 3
+
+    assert result.by_status.total_successful_transactions == 2
+    assert result.by_status.total_cancelled_transactions == 1
+
+    sender_banks: dict[int | None, tuple[str, int, Decimal]] = {
+        s.bank.id: (s.bank.name, s.total_transactions, s.total_funds)
+        for s in result.by_banks.sender_banks
+    }
+    assert sender_banks == {
+        bank.id: (bank.name, 3, Decimal(150)),
+        another_bank.id: (another_bank.name, 1, Decimal(50)),
+    }
+    [recipient_bank] = result.by_banks.recipient_banks
+    assert recipient_bank.bank.id == bank.id
+    assert recipient_bank.total_transactions == 4
+
+    [income] = result.by_categories.income_categories
+    [spending] = result.by_categories.spending_categories
+    assert income.category.id == spending.category.id == category.id
+    assert income.total_funds == 150
+    assert spending.total_funds == 50
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_dashboard_names_are_not_cached(
+    session: AsyncSession,
+    user: User,
+    another_bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    service = DashboardService(session, user)
+    await service.get(start=date(2024, 7, 1), end=date(2024, 7, 31))
+
+    another_bank.name = 'Renamed bank'
+    await BankService(session).update(another_bank)
+    category.name = 'Renamed category'
+    await TransactionCategoryService(session).update(category)
+
+    result = await service.get(start=date(2024, 7, 1), end=date(2024, 7, 31))
+    assert 'Renamed bank' in {
+        s.bank.name for s in result.by_banks.sender_banks
+    }
+    [income] = result.by_categories.income_categories
+    assert income.category.name == 'Renamed category'
+
+
+@pytest.mark.parametrize(
+    ('filters', 'expected'),
+    [
+        # served by the rollups
+        ({'transaction_type': 'DEBIT'}, (0, 2, Decimal(50))),
+        ({'status': 'EXECUTED'}, (1, 1, Decimal(40))),
+        # served by the transactions
+        ({'amount_min': '40', 'amount_max': '60'}, (1, 1, Decimal(40))),
+        ({'recipient_inn': '7743880975'}, (0, 0, Decimal(0))),
+    ],
+)
+@pytest.mark.usefixtures('transactions')
+async def test_dashboard_filters(
+    session: AsyncSession,
+    user: User,
+    filters: dict[str, str],
+    expected: tuple[int, int, Decimal],
+) -> None:
+    service = DashboardService(session, user)
+    result = await service.get(
+        start=date(2024, 7, 1),
+        end=date(2024, 7, 31),
+        filters=AnalyticsFilters.model_validate(filters),
+    )
+
+    credit = result.by_type[TransactionType.CREDIT]
+    debit = result.by_type[TransactionType.DEBIT]
+    assert (
+        credit.total_transactions,
+        debit.total_transactions,
+        debit.total_funds,
+    ) == expected
+
+
+async def test_dashboard_without_transactions(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DashboardService(session, user)
+    result = await service.get(start=date(2024, 7, 1), end=date(2024, 7, 31))
+
+    assert all(t.total_transactions == 0 for t in result.by_type.values())
+    assert result.received_and_spent.received_to_spent == 0
+    assert not result.by_banks.sender_banks
+    assert not result.by_categories.income_categories
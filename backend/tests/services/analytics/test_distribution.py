@@ -0,0 +1,105 @@
+# ruff: noqa: PLR2004
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.responses import RowsResponse
+from models.bank import Bank
+from models.transaction import (
+    PartyType,
+    Transaction,
+    TransactionCategory,
+    TransactionStatus,
+    TransactionType,
+)
+from models.user import User
+from schemas.analytics import AmountBucket, AmountDistributions, SplitBy
+from services.analytics.analytics import AmountDistributionService
+from services.transactions import TransactionCRUD
+
+
+@pytest.fixture
+async def transactions(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    rows = [
+        *(
+            (TransactionType.CREDIT, TransactionStatus.NEW, amount)
+            for amount in range(1, 11)
+        ),
+        (TransactionType.DEBIT, TransactionStatus.NEW, 100),
+        (TransactionType.DEBIT, TransactionStatus.DELETED, 1000),
+    ]
+    for transaction_type, status, amount in rows:
+        await TransactionCRUD(session).create(
+            Transaction(
+                user_id=user.id,
+                party_type=PartyType.INDIVIDUAL,
+                status=status,
+                transaction_type=transaction_type,
+                amount=Decimal(amount),
+                occurred_at=datetime.fromisoformat('2024-07-01T10:00:00Z'),
+                sender_bank_id=bank.id,
+                account_number='123456',
+                recipient_bank_id=bank.id,
+                recipient_inn='6449013711',
+                recipient_account_number='123456',
+                category_id=category.id,
+                recipient_phone='+79999999999',
+            ),
+        )
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_amount_distribution(session: AsyncSession, user: User) -> None:
+    service = AmountDistributionService(session, user)
+
+    result = await service.get(
+        start=date(2024, 7, 1),
+        end=date(2024, 7, 31),
+        split_by=[SplitBy.TYPE],
+        bins=3,
+    )
+
+    # the result is serialized as is
+    distributions = AmountDistributions.model_validate_json(
+        RowsResponse(result).body,
+    )
+    credit, debit = distributions.distributions
+    assert credit.key == {SplitBy.TYPE: TransactionType.CREDIT}
+    assert credit.count == 10
+    assert (credit.min, credit.max) == (Decimal(1), Decimal(10))
+    assert credit.percentiles[50] == Decimal('5.5')
+    assert credit.percentiles[25] == Decimal('3.25')
+    assert credit.buckets == [
+        AmountBucket(low=Decimal(1), high=Decimal(4), count=3),
+        AmountBucket(low=Decimal(4), high=Decimal(7), count=3),
+        AmountBucket(low=Decimal(7), high=Decimal(10), count=4),
+    ]
+
+    # deleted transactions are left out
+    assert debit.count == 1
+    assert debit.buckets == [
+        AmountBucket(low=Decimal(100), high=Decimal(100), count=1),
+    ]
+    assert set(debit.percentiles.values()) == {Decimal(100)}
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_amount_distribution_bins_are_adaptive(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = AmountDistributionService(session, user)
+
+    result = await service.get(start=date(2024, 7, 1), end=date(2024, 7, 31))
+
+    [distribution] = result['distributions']
+    # Sturges' rule for 11 amounts
+    assert len(distribution['buckets']) == 5
+    assert sum(bucket['count'] for bucket in distribution['buckets']) == 11
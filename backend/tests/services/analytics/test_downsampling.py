@@ -0,0 +1,22 @@
+# ruff: noqa: PLR2004
+from services.analytics.downsampling import lttb
+
+
+def test_lttb_keeps_edges_and_peaks() -> None:
+    values = [0.0] * 100
+    values[37] = 10.0
+    values[71] = -10.0
+
+    indices = lttb(values, max_points=10)
+
+    assert len(indices) == 10
+    assert indices == sorted(indices)
+    assert indices[0] == 0
+    assert indices[-1] == 99
+    assert {37, 71} <= set(indices)
+
+
+def test_lttb_keeps_short_series() -> None:
+    assert lttb([1.0, 2.0, 3.0], max_points=3) == [0, 1, 2]
+    assert lttb([1.0, 2.0], max_points=10) == [0, 1]
+    assert lttb([], max_points=10) == []
@@ -1,8 +1,10 @@
 # ruff: noqa: PLR2004
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
+import typing
 
 from dateutil.relativedelta import relativedelta
+from fastapi import HTTPException, status
 import pytest
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -15,8 +17,15 @@ from models.transaction import (
     TransactionType,
 )
 from models.user import User
-from schemas.analytics import DynamicsByIntervalEntry, Interval
+from schemas.analytics import (
+    Comparison,
+    DynamicsByIntervalEntry,
+    Interval,
+    SplitBy,
+)
 from services.analytics.analytics import DynamicsByIntervalService
+from services.analytics.cache import analytics_cache
+from services.transactions import TransactionCRUD
 from services.users import create_user
 
 
@@ -52,8 +61,7 @@ async def _create_transaction(
         category_id=category.id,
         recipient_phone='+79999999999',
     )
-    session.add(transaction)
-    await session.commit()
+    await TransactionCRUD(session).create(transaction)
 
 
 @pytest.fixture
@@ -78,13 +86,13 @@ async def transactions(
         (user, '2025-02-13T10:00:00Z'),
     ]
 
-    for transaction_user, date in transactions:
+    for transaction_user, occurred_at in transactions:
         await _create_transaction(
             session,
             user=transaction_user,
             bank=bank,
             category=category,
-            occurred_at=datetime.fromisoformat(date),
+            occurred_at=datetime.fromisoformat(occurred_at),
         )
 
 
@@ -160,3 +168,188 @@ async def test_dynamics_by_interval(  # noqa: PLR0913
         strict=True,
     ):
         assert entry_got == entry_expected
+
+
+@pytest.mark.parametrize(
+    ('split_by', 'key'),
+    [
+        ([], {}),
+        ([SplitBy.TYPE], {SplitBy.TYPE: TransactionType.CREDIT}),
+        (
+            [SplitBy.STATUS, SplitBy.TYPE],
+            {
+                SplitBy.STATUS: TransactionStatus.NEW,
+                SplitBy.TYPE: TransactionType.CREDIT,
+            },
+        ),
+    ],
+)
+@pytest.mark.usefixtures('transactions')
+async def test_dynamics_by_interval_series(
+    session: AsyncSession,
+    user: User,
+    split_by: list[SplitBy],
+    key: dict[SplitBy, typing.Any],
+) -> None:
+    service = DynamicsByIntervalService(session=session, user=user)
+
+    result = await service.series(
+        start=datetime.fromisoformat('2024-07-15'),
+        end=datetime.fromisoformat('2024-09-15'),
+        interval=Interval.MONTH,
+        split_by=split_by,
+    )
+
+    assert [d.isoformat() for d in result.dates] == [
+        '2024-07-01',
+        '2024-08-01',
+        '2024-09-01',
+    ]
+    [series] = result.series
+    assert series.key == key
+    assert series.counts == [6, 0, 1]
+    assert series.amounts == [Decimal(600), Decimal(0), Decimal(100)]
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_dynamics_by_interval_is_cached_until_written(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+) -> None:
+    service = DynamicsByIntervalService(session=session, user=user)
+    start = datetime.fromisoformat('2024-07-01')
+    end = datetime.fromisoformat('2024-07-31')
+
+    first = await service.get(start=start, end=end, interval=Interval.MONTH)
+    assert await service.get(start, end, Interval.MONTH) is first
+    assert analytics_cache.stats()[:2] == (1, 1)
+
+    await _create_transaction(
+        session,
+        user=user,
+        bank=bank,
+        category=category,
+        occurred_at=datetime.fromisoformat('2024-07-02T10:00:00Z'),
+    )
+
+    result = await service.get(start, end, Interval.MONTH)
+    assert [entry.count for entry in result.entries] == [7]
+    assert analytics_cache.stats()[:2] == (1, 2)
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_dynamics_by_day_steps(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DynamicsByIntervalService(session=session, user=user)
+
+    result = await service.get(
+        start=date(2024, 7, 1),
+        end=date(2024, 7, 24),
+        interval=Interval.DAY,
+        step=7,
+    )
+
+    assert result.entries == [
+        DynamicsByIntervalEntry(date='2024-07-01', count=3),
+        DynamicsByIntervalEntry(date='2024-07-08', count=1),
+        DynamicsByIntervalEntry(date='2024-07-15', count=0),
+        DynamicsByIntervalEntry(date='2024-07-22', count=2),
+    ]
+    assert result.end == date(2024, 7, 29)
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_dynamics_by_day_are_downsampled(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DynamicsByIntervalService(session=session, user=user)
+
+    result = await service.series(
+        start=date(2024, 7, 1),
+        end=date(2024, 7, 31),
+        interval=Interval.DAY,
+        max_points=5,
+    )
+
+    [series] = result.series
+    assert len(result.dates) == len(series.counts) == 5
+    assert result.dates[0] == date(2024, 7, 1)
+    assert result.dates[-1] == date(2024, 7, 31)
+    # the busiest day survives the downsampling
+    assert series.counts[0] == 2
+    assert sum(series.counts) >= 3
+
+
+async def test_approximate_dynamics_are_not_per_user(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DynamicsByIntervalService(session=session, user=user)
+
+    with pytest.raises(HTTPException) as e:
+        await service.get(
+            start=date(2024, 7, 1),
+            end=date(2024, 9, 30),
+            interval=Interval.MONTH,
+            sample_percent=100,
+        )
+
+    assert e.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_dynamics_compared_to_previous_period(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DynamicsByIntervalService(session=session, user=user)
+
+    result = await service.compare(
+        start=date(2024, 8, 1),
+        end=date(2024, 9, 30),
+        interval=Interval.MONTH,
+        compare_to=Comparison.PREVIOUS_PERIOD,
+    )
+
+    august, september = result.entries
+    assert august.previous_date == date(2024, 7, 1)
+    assert (august.count, august.previous_count) == (0, 6)
+    assert august.count_delta == -6
+    assert august.count_percent == Decimal(-100)
+    assert august.amount_delta == Decimal(-600)
+    assert september.previous_date == date(2024, 8, 1)
+    assert (september.count, september.previous_count) == (1, 0)
+    # no change in percent of nothing
+    assert september.count_percent is None
+    assert september.amount_percent is None
+
+
+@pytest.mark.usefixtures('transactions')
+async def test_dynamics_compared_to_previous_year(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DynamicsByIntervalService(session=session, user=user)
+
+    result = await service.compare(
+        start=date(2025, 1, 1),
+        end=date(2025, 12, 31),
+        interval=Interval.YEAR,
+        compare_to=Comparison.PREVIOUS_YEAR,
+    )
+
+    [entry] = result.entries
+    assert entry.date == date(2025, 1, 1)
+    assert entry.previous_date == date(2024, 1, 1)
+    assert (entry.count, entry.previous_count) == (1, 7)
+    assert entry.count_percent == Decimal('-85.71')
+    assert (entry.amount, entry.previous_amount) == (
+        Decimal(100),
+        Decimal(700),
+    )
+    assert entry.amount_percent == Decimal('-85.71')
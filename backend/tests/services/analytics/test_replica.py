@@ -0,0 +1,254 @@
+# ruff: noqa: PLR2004
+from collections.abc import Mapping, Sequence
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+import typing
+
+import duckdb
+import pytest
+from sqlalchemy import delete, func, Select, select
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.bank import Bank
+from models.transaction import (
+    PartyType,
+    Transaction,
+    TransactionCategory,
+    TransactionStatus,
+    TransactionType,
+)
+from models.user import User
+from schemas.analytics import Interval, SplitBy
+from services.analytics.admin import (
+    AllUsersDashboardService,
+    AllUsersDynamicsByIntervalService,
+)
+from services.analytics.replica import (
+    _types,
+    _write_part,
+    analytics_replica,
+    ColumnarReplica,
+    MANIFEST,
+    Manifest,
+)
+from services.transactions import TransactionCRUD, TransactionService
+
+
+@pytest.fixture
+def replica(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> ColumnarReplica:
+    monkeypatch.setattr(analytics_replica, 'directory', tmp_path)
+    monkeypatch.setattr(
+        analytics_replica,
+        'max_staleness',
+        timedelta(minutes=5),
+    )
+    return analytics_replica
+
+
+def _by_status() -> Select[typing.Any]:
+    status = col(Transaction.status)
+    return select(status, func.count().label('count')).group_by(status)
+
+
+async def test_stale_replica_is_not_read(replica: ColumnarReplica) -> None:
+    assert await replica.fetch(_by_status()) is None
+
+    stale = Manifest(
+        watermark=datetime.now(timezone.utc) - timedelta(hours=1),
+        parts=['transactions-000001.parquet'],
+        tables={},
+        batch=1,
+    )
+    replica._write(stale)
+    assert replica.manifest() == stale
+    assert replica.fresh() is None
+
+    # the files of a fresh one are missing
+    replica._write(stale._replace(watermark=datetime.now(timezone.utc)))
+    assert replica.fresh() is not None
+    assert await replica.fetch(_by_status()) is None
+
+
+@pytest.mark.parametrize('content', ['{"watermark": "2024-', '[]', '{}'])
+async def test_invalid_manifest_is_not_read(
+    replica: ColumnarReplica,
+    tmp_path: Path,
+    content: str,
+) -> None:
+    (tmp_path / MANIFEST).write_text(content)
+
+    assert replica.manifest() is None
+    assert await replica.fetch(_by_status()) is None
+
+
+def _part(
+    directory: Path,
+    rows: list[tuple[int, str, TransactionStatus]],
+) -> None:
+    given = {'id', 'occurred_at', 'status'}
+    values = ', '.join(
+        f"({id_}, TIMESTAMPTZ '{occurred_at}', '{status.name}')"
+        for id_, occurred_at, status in rows
+    )
+    others = ', '.join(
+        f'CAST(NULL AS {type_}) AS {column}'
+        for column, type_ in _types(Transaction).items()
+        if column not in given
+    )
+    with duckdb.connect() as connection:
+        _write_part(
+            connection.sql(
+                f'SELECT *, {others} '
+                f'FROM (VALUES {values}) AS v(id, occurred_at, status)',
+            ),
+            directory,
+        )
+
+
+async def test_parts_are_read_by_month(
+    replica: ColumnarReplica,
+    tmp_path: Path,
+) -> None:
+    new, confirmed = TransactionStatus.NEW, TransactionStatus.CONFIRMED
+    _part(
+        tmp_path / 'transactions-000001',
+        [
+            (1, '2024-06-10 12:00:00+00', new),
+            (2, '2024-07-10 12:00:00+00', new),
+            (3, '2024-07-31 23:00:00+00', new),
+            (4, '2024-08-10 12:00:00+00', new),
+        ],
+    )
+    # the second export has moved a transaction to the next month
+    _part(
+        tmp_path / 'transactions-000002',
+        [(2, '2024-08-20 12:00:00+00', confirmed)],
+    )
+    replica._write(
+        Manifest(
+            watermark=datetime.now(timezone.utc),
+            parts=['transactions-000001', 'transactions-000002'],
+            tables={},
+            batch=2,
+        ),
+    )
+
+    def by_status(
+        rows: Sequence[Mapping[str, typing.Any]] | None,
+    ) -> dict[TransactionStatus, int]:
+        return {row['status']: row['count'] for row in rows or []}
+
+    assert by_status(await replica.fetch(_by_status())) == {
+        new: 3,
+        confirmed: 1,
+    }
+    # superseded by the later part although it isn't in the range
+    july = date(2024, 7, 1), date(2024, 7, 31)
+    assert by_status(await replica.fetch(_by_status(), *july)) == {new: 1}
+
+    # the files of the other months are not even opened
+    for part in tmp_path.glob('transactions-000001/month=2024-08/*'):
+        part.write_text('')
+    assert by_status(await replica.fetch(_by_status(), *july)) == {new: 1}
+    assert await replica.fetch(_by_status()) is None
+
+
+async def _create_transaction(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+) -> Transaction:
+    return await TransactionCRUD(session).create(
+        Transaction(
+            user_id=user.id,
+            party_type=PartyType.INDIVIDUAL,
+            status=TransactionStatus.NEW,
+            transaction_type=TransactionType.CREDIT,
+            amount=Decimal('100.0'),
+            occurred_at=datetime.fromisoformat('2024-07-01T10:00:00Z'),
+            sender_bank_id=bank.id,
+            account_number='123456',
+            recipient_bank_id=bank.id,
+            recipient_inn='6449013711',
+            recipient_account_number='123456',
+            category_id=category.id,
+            recipient_phone='+79999999999',
+        ),
+    )
+
+
+async def test_export_is_incremental(
+    session: AsyncSession,
+    user: User,
+    bank: Bank,
+    category: TransactionCategory,
+    replica: ColumnarReplica,
+) -> None:
+    first = await _create_transaction(session, user, bank, category)
+    second = await _create_transaction(session, user, bank, category)
+    manifest = await replica.export(session)
+    assert len(manifest.parts) == 1
+    assert await replica.fetch(_by_status()) == [
+        {'status': TransactionStatus.NEW, 'count': 2},
+    ]
+
+    # the changed row is taken from the latest part
+    await TransactionService(session, user).delete_transaction(
+        typing.cast(int, first.id),
+    )
+    manifest = await replica.export(session)
+    assert len(manifest.parts) == 2
+    rows = await replica.fetch(_by_status())
+    assert sorted(rows or [], key=lambda row: row['status']) == [
+        {'status': TransactionStatus.DELETED, 'count': 1},
+        {'status': TransactionStatus.NEW, 'count': 1},
+    ]
+
+    # a row removed for real, which the API never does, isn't a change,
+    # only a full export drops it
+    await session.execute(
+        delete(Transaction).where(col(Transaction.id) == second.id),
+    )
+    await session.commit()
+    manifest = await replica.export(session)
+    assert len(manifest.parts) == 2
+    assert len(await replica.fetch(_by_status()) or []) == 2
+
+    manifest = await replica.export(session, full=True)
+    assert len(manifest.parts) == 1
+    assert await replica.fetch(_by_status()) == [
+        {'status': TransactionStatus.DELETED, 'count': 1},
+    ]
+
+
+@pytest.mark.usefixtures('large_seed')
+async def test_reports_match_database(
+    session: AsyncSession,
+    admin_user: User,
+    replica: ColumnarReplica,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    start, end = date(2020, 1, 1), date(2024, 12, 31)
+    dashboard = AllUsersDashboardService(session, admin_user)
+    dynamics = AllUsersDynamicsByIntervalService(session, admin_user)
+
+    async def reports() -> tuple[typing.Any, ...]:
+        return (
+            await dashboard.get(start, end),
+            await dynamics.get(start, end, Interval.DAY, step=7),
+            await dynamics.series(start, end, Interval.MONTH, [SplitBy.TYPE]),
+        )
+
+    with monkeypatch.context() as patch:
+        patch.setattr(replica, 'max_staleness', timedelta(0))
+        expected = await reports()
+
+    await replica.export(session)
+    assert await replica.fetch(_by_status()) is not None
+    assert await reports() == expected
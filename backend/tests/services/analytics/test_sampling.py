@@ -0,0 +1,18 @@
+# ruff: noqa: PLR2004
+import pytest
+
+from services.analytics.sampling import estimate
+
+
+def test_estimate_of_whole_table_is_exact() -> None:
+    assert estimate(total=42, page_squares=900, fraction=1) == (42, 42, 42)
+
+
+def test_estimate_scales_sample_up() -> None:
+    value, low, high = estimate(total=10, page_squares=50, fraction=0.1)
+
+    assert value == pytest.approx(100)
+    # 1.96 standard deviations of the scaled up total
+    assert high - value == pytest.approx(131.48, abs=0.01)
+    # the sampled rows exist for sure
+    assert low == 10
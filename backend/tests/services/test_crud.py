@@ -2,6 +2,7 @@ from fastapi import HTTPException, status
 import pytest
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from dependencies.params import OrderByItem, TotalCount
 from models.bank import Bank
 from schemas.banks import BankOut
 from services.crud import BaseCRUD
@@ -63,6 +64,13 @@ async def test_delete(crud: BaseCRUD[Bank], bank: BankOut) -> None:
     assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
 
 
+async def test_delete_not_found(crud: BaseCRUD[Bank]) -> None:
+    with pytest.raises(HTTPException) as exc_info:
+        await crud.delete(99999)
+
+    assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+
 async def test_count_with_empty_filters(
     crud: BaseCRUD[Bank],
     session: AsyncSession,
@@ -93,3 +101,119 @@ async def test_count_with_single_filter(
 async def test_count_with_no_matches(crud: BaseCRUD[Bank]) -> None:
     count = await crud.count(filters=[Bank.name == 'Not a bank'])
     assert count == 0
+
+
+@pytest.mark.parametrize('desc', [False, True])
+async def test_list_with_cursor(
+    crud: BaseCRUD[Bank],
+    session: AsyncSession,
+    desc: bool,
+) -> None:
+    # banks created in one transaction share the same created_at,
+    # so the pages are separated by the id tiebreaker only
+    session.add_all([Bank(name=f'Bank {i}') for i in range(5)])
+    await session.commit()
+
+    order_by = [OrderByItem(field='created_at', desc=desc)]
+    expected = await crud.list(order_by=order_by)
+
+    got: list[Bank] = []
+    cursor = None
+    while True:
+        page = await crud.list(order_by=order_by, limit=2, cursor=cursor)
+        if not page:
+            break
+        got.extend(page)
+        cursor = crud.next_cursor(page[-1], order_by)
+
+    assert [b.id for b in got] == [b.id for b in expected]
+
+
+async def test_list_with_cursor_for_another_ordering(
+    crud: BaseCRUD[Bank],
+    bank: Bank,
+) -> None:
+    cursor = crud.next_cursor(bank, [OrderByItem(field='created_at')])
+
+    with pytest.raises(HTTPException) as exc_info:
+        await crud.list(
+            order_by=[OrderByItem(field='updated_at')],
+            cursor=cursor,
+        )
+
+    assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'é', 'W10'])
+async def test_list_with_malformed_cursor(
+    crud: BaseCRUD[Bank],
+    cursor: str,
+) -> None:
+    with pytest.raises(HTTPException) as exc_info:
+        await crud.list(cursor=cursor)
+
+    assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_list_with_exact_count(
+    crud: BaseCRUD[Bank],
+    session: AsyncSession,
+) -> None:
+    session.add_all([Bank(name=f'Bank {i}') for i in range(5)])
+    await session.commit()
+
+    items, count = await crud.list_with_count(
+        order_by=[OrderByItem(field='created_at')],
+        limit=2,
+    )
+    assert len(items) == 2  # noqa: PLR2004
+    assert count == await crud.count()
+
+
+async def test_list_with_exact_count_beyond_last_page(
+    crud: BaseCRUD[Bank],
+    bank: Bank,
+) -> None:
+    items, count = await crud.list_with_count(offset=10, limit=2)
+    assert not items
+    assert count == await crud.count()
+
+
+async def test_list_without_count(crud: BaseCRUD[Bank], bank: Bank) -> None:
+    items, count = await crud.list_with_count(total_count=TotalCount.NONE)
+    assert any(b.id == bank.id for b in items)
+    assert count is None
+
+
+async def test_list_with_estimated_count(
+    crud: BaseCRUD[Bank],
+    bank: Bank,
+) -> None:
+    _, count = await crud.list_with_count(total_count=TotalCount.ESTIMATE)
+    assert isinstance(count, int)
+    assert count >= 0
+
+
+async def test_list_rows(crud: BaseCRUD[Bank], bank: Bank) -> None:
+    rows = await crud.list_rows()
+    row = next(row for row in rows if row['id'] == bank.id)
+    assert dict(row) == bank.model_dump()
+
+    rows = await crud.list_rows(columns=['id', 'name'])
+    assert {'id': bank.id, 'name': bank.name} in [dict(row) for row in rows]
+
+
+async def test_list_rows_with_count(
+    crud: BaseCRUD[Bank],
+    session: AsyncSession,
+) -> None:
+    session.add_all([Bank(name=f'Bank {i}') for i in range(3)])
+    await session.commit()
+
+    rows, count = await crud.list_rows_with_count(
+        columns=['name'],
+        order_by=[OrderByItem(field='name', desc=True)],
+        limit=2,
+    )
+    assert rows == [{'name': 'Bank 2'}, {'name': 'Bank 1'}]
+    assert count == await crud.count()
@@ -0,0 +1,325 @@
+from datetime import date, timedelta
+import typing
+from typing import Any
+
+from dateutil.relativedelta import relativedelta
+import orjson
+import pytest
+from sqlalchemy import CompoundSelect, func, Select, text
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.transaction import (
+    Transaction,
+    TransactionDailyRollup,
+    TransactionStatus,
+    TransactionType,
+)
+from models.user import User
+from schemas.analytics import AnalyticsFilters, Interval
+from schemas.transactions import TransactionFilters
+from services.analytics.admin import (
+    AllUsersDashboardService,
+    AllUsersDynamicsByIntervalService,
+)
+from services.analytics.analytics import (
+    DashboardService,
+    DynamicsByIntervalService,
+)
+from services.analytics.balances import BalanceService
+from services.analytics.buckets import Buckets
+from services.analytics.query_builder import (
+    RollupsQuery,
+    start_of_day,
+)
+from services.transactions import compile_transaction_filters
+
+pytestmark = pytest.mark.usefixtures('large_seed')
+
+
+async def _explain(
+    session: AsyncSession,
+    statement: str,
+    params: dict[str, Any] | None = None,
+) -> str:
+    result = await session.execute(text(f'EXPLAIN {statement}'), params)
+    return '\n'.join(result.scalars())
+
+
+def _compile(
+    session: AsyncSession,
+    statement: Select[Any] | CompoundSelect[Any],
+) -> str:
+    return str(
+        statement.compile(
+            dialect=session.get_bind().dialect,
+            compile_kwargs={'literal_binds': True},
+        ),
+    )
+
+
+@pytest.mark.parametrize('field', ['occurred_at', 'created_at', 'updated_at'])
+async def test_transactions_list_uses_index(
+    session: AsyncSession,
+    user: User,
+    field: str,
+) -> None:
+    query = (
+        select(Transaction)
+        .where(Transaction.user_id == user.id)
+        .order_by(
+            col(getattr(Transaction, field)).desc(),
+            col(Transaction.id).desc(),
+        )
+        .limit(11)
+    )
+
+    plan = await _explain(session, _compile(session, query))
+
+    assert f'ix_transactions_user_id_{field}' in plan
+    assert 'Sort' not in plan
+
+
+@pytest.mark.parametrize(
+    ('field', 'value'),
+    [
+        ('status', TransactionStatus.NEW),
+        ('transaction_type', TransactionType.DEBIT),
+        ('recipient_inn', '6449013711'),
+    ],
+)
+async def test_filtered_transactions_list_uses_index(
+    session: AsyncSession,
+    user: User,
+    field: str,
+    value: Any,
+) -> None:
+    filters = TransactionFilters.model_validate({field: value})
+    query = (
+        select(Transaction)
+        .where(
+            Transaction.user_id == user.id,
+            *compile_transaction_filters(filters),
+        )
+        .order_by(
+            col(Transaction.occurred_at).desc(),
+            col(Transaction.id).desc(),
+        )
+        .limit(11)
+    )
+
+    plan = await _explain(session, _compile(session, query))
+
+    assert f'ix_transactions_user_id_{field}' in plan
+    assert 'Sort' not in plan
+
+
+async def test_transactions_count_uses_index(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    query = select(Transaction.id).where(Transaction.user_id == user.id)
+
+    plan = await _explain(session, _compile(session, query))
+
+    assert 'ix_transactions_user_id_' in plan
+    assert 'Seq Scan' not in plan
+
+
+async def test_dynamics_by_interval_uses_index(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DynamicsByIntervalService(session, user)
+    query = service.build_query(
+        start=date(2021, 1, 1),
+        end=date(2021, 12, 31),
+        interval=Interval.MONTH,
+    )
+
+    plan = await _explain(session, _compile(session, query))
+
+    assert 'pk_transaction_daily_rollups' in plan
+    assert 'Seq Scan on transaction_daily_rollups' not in plan
+
+
+async def test_dashboard_uses_index(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    service = DashboardService(session, user)
+    query = service.build_query(start=date(2021, 1, 1), end=date(2021, 1, 31))
+
+    plan = await _explain(session, _compile(session, query))
+
+    assert 'pk_transaction_daily_rollups' in plan
+    assert 'Seq Scan on transaction_daily_rollups' not in plan
+
+
+@pytest.mark.parametrize(
+    ('filters', 'index'),
+    [
+        ({'status': 'NEW'}, 'pk_transaction_daily_rollups'),
+        ({'recipient_inn': '6449013711'}, 'ix_transactions_user_id_'),
+    ],
+)
+async def test_filtered_dashboard_uses_index(
+    session: AsyncSession,
+    user: User,
+    filters: dict[str, Any],
+    index: str,
+) -> None:
+    service = DashboardService(session, user)
+    query = service.build_query(
+        start=date(2021, 1, 1),
+        end=date(2021, 1, 31),
+        filters=AnalyticsFilters.model_validate(filters),
+    )
+
+    plan = await _explain(session, _compile(session, query))
+
+    assert index in plan
+    assert 'Seq Scan' not in plan
+
+
+@pytest.mark.parametrize(
+    'service_class',
+    [AllUsersDashboardService, AllUsersDynamicsByIntervalService],
+)
+async def test_all_users_analytics_run_in_parallel(
+    session: AsyncSession,
+    admin_user: User,
+    service_class: type[
+        AllUsersDashboardService | AllUsersDynamicsByIntervalService
+    ],
+) -> None:
+    # the seed is too small for the planner to bother with workers
+    for setting in (
+        'parallel_setup_cost',
+        'parallel_tuple_cost',
+        'min_parallel_table_scan_size',
+    ):
+        await session.execute(text(f'SET LOCAL {setting} = 0'))
+
+    service = service_class(session, admin_user)
+    if isinstance(service, AllUsersDashboardService):
+        query = service.build_query(date(2020, 1, 1), date(2024, 12, 31))
+    else:
+        query = service.build_query(
+            date(2020, 1, 1),
+            date(2024, 12, 31),
+            Interval.MONTH,
+        )
+
+    plan = await _explain(session, _compile(session, query))
+
+    assert 'Gather' in plan
+    assert 'Partial' in plan
+
+
+async def _scanned_rows(
+    session: AsyncSession,
+    statement: str,
+    relation: str,
+) -> int:
+    """Executes the statement and returns how many rows
+    of the relation it read."""
+    result = await session.execute(
+        text(f'EXPLAIN (ANALYZE, FORMAT JSON) {statement}'),
+    )
+    plan = result.scalar_one()
+    if isinstance(plan, str | bytes):
+        plan = orjson.loads(plan)
+
+    def _walk(node: dict[str, Any]) -> int:
+        rows = 0
+        if node.get('Relation Name') == relation:
+            read = node['Actual Rows'] + node.get('Rows Removed by Filter', 0)
+            rows += read * node['Actual Loops']
+
+        return rows + sum(_walk(child) for child in node.get('Plans', ()))
+
+    return _walk(plan[0]['Plan'])
+
+
+@pytest.mark.parametrize('months', [1, 3, 12])
+async def test_analytics_cost_scales_with_range(
+    session: AsyncSession,
+    user: User,
+    months: int,
+) -> None:
+    """
+    The analytics statements read only the rollups of the days
+    in the range, neither the transactions nor the rest of the history.
+    """
+    start = date(2021, 1, 1)
+    end = start + relativedelta(months=months) - timedelta(days=1)
+    user_id = typing.cast(int, user.id)
+
+    rollups_in_range = (
+        await session.execute(
+            RollupsQuery(user_id, start, end).select(func.count()),
+        )
+    ).scalar_one()
+    history = (
+        await session.execute(
+            select(func.count()).where(
+                TransactionDailyRollup.user_id == user_id,
+            ),
+        )
+    ).scalar_one()
+    assert 0 < rollups_in_range < history
+
+    statements = (
+        DynamicsByIntervalService(session, user).build_query(
+            start,
+            end,
+            Interval.MONTH,
+        ),
+        DashboardService(session, user).build_query(start, end),
+    )
+    for statement in statements:
+        compiled = _compile(session, statement)
+        assert await _scanned_rows(session, compiled, 'transactions') == 0
+        scanned = await _scanned_rows(
+            session,
+            compiled,
+            'transaction_daily_rollups',
+        )
+        assert scanned == rollups_in_range
+
+
+async def test_daily_balance_series_reads_its_months(
+    session: AsyncSession,
+    user: User,
+) -> None:
+    """
+    A long series of days is seeded from the checkpoints and reads
+    only the account's transactions of its own months, with a range
+    scan of an index rather than the whole history.
+    """
+    start, end = date(2021, 3, 15), date(2023, 3, 14)
+    buckets = Buckets(Interval.DAY, start)
+    query = BalanceService(session, user)._build_series_query(
+        '123456',
+        buckets.dates(start, end),
+        buckets,
+    )
+    compiled = _compile(session, query)
+
+    plan = await _explain(session, compiled)
+    assert 'ix_transactions_user_id_' in plan
+    assert 'Seq Scan on transactions' not in plan
+
+    in_months = (
+        await session.execute(
+            select(func.count()).where(
+                Transaction.user_id == user.id,
+                Transaction.account_number == '123456',
+                col(Transaction.occurred_at) >= start_of_day(date(2021, 3, 1)),
+                col(Transaction.occurred_at) < start_of_day(date(2023, 3, 15)),
+            ),
+        )
+    ).scalar_one()
+    assert in_months > 0
+    assert await _scanned_rows(session, compiled, 'transactions') == in_months
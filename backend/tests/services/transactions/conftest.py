@@ -12,6 +12,8 @@ from models.transaction import (
     TransactionType,
 )
 from models.user import User
+from services.transactions import TransactionCRUD
+from services.users import create_user
 
 
 @pytest.fixture
@@ -53,6 +55,13 @@ async def transaction(
         category_id=category.id,
         recipient_phone='+79999999999',
     )
-    session.add(transaction)
-    await session.commit()
-    return transaction
+    return await TransactionCRUD(session).create(transaction)
+
+
+@pytest.fixture
+async def another_user(session: AsyncSession) -> User:
+    return await create_user(
+        session,
+        username='user2',
+        password='password',
+    )
@@ -0,0 +1,90 @@
+# ruff: noqa: PLR2004
+from decimal import Decimal
+import typing
+
+from sqlalchemy import update
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.transaction import (
+    AccountBalanceCheckpoint,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+)
+from models.user import User
+from schemas.transactions import TransactionCreate, TransactionUpdate
+from services.ledger import rebuild_ledger, verify_ledger
+from services.transactions import TransactionService
+
+
+async def _checkpoints(
+    session: AsyncSession,
+) -> dict[str, tuple[int, Decimal]]:
+    result = await session.exec(
+        select(AccountBalanceCheckpoint).where(
+            col(AccountBalanceCheckpoint.transactions_count) != 0,
+        ),
+    )
+    return {
+        checkpoint.account_number: (
+            checkpoint.transactions_count,
+            checkpoint.balance_change,
+        )
+        for checkpoint in result.all()
+    }
+
+
+async def test_checkpoints_follow_writes(
+    session: AsyncSession,
+    user: User,
+    transaction: Transaction,
+) -> None:
+    service = TransactionService(session, user)
+    transaction_id = typing.cast(int, transaction.id)
+    debit = TransactionCreate.model_validate(
+        transaction.model_dump()
+        | {'transaction_type': TransactionType.DEBIT, 'amount': 30},
+    )
+
+    batch = await service.create_transactions([debit] * 2)
+    assert await _checkpoints(session) == {'123456': (3, Decimal(40))}
+
+    await service.update_transaction(
+        transaction_id,
+        TransactionUpdate(amount=Decimal(50)),
+    )
+    assert await _checkpoints(session) == {'123456': (3, Decimal(-10))}
+
+    # a cancelled transaction doesn't move the balance
+    await service.update_transactions_status(
+        {transaction_id},
+        TransactionStatus.CANCELLED,
+    )
+    assert await _checkpoints(session) == {'123456': (2, Decimal(-60))}
+
+    await service.delete_transaction(typing.cast(int, batch.items[0].id))
+    assert await _checkpoints(session) == {'123456': (1, Decimal(-30))}
+    assert await verify_ledger(session) == []
+
+
+async def test_rebuild_ledger(
+    session: AsyncSession,
+    transaction: Transaction,
+) -> None:
+    await session.execute(
+        update(AccountBalanceCheckpoint).values(balance_change=5),
+    )
+    await session.commit()
+
+    mismatches = await verify_ledger(session)
+    assert len(mismatches) == 1
+    assert mismatches[0]['expected_change'] == transaction.amount
+    assert mismatches[0]['stored_change'] == 5
+
+    await rebuild_ledger(session)
+
+    assert await verify_ledger(session) == []
+    assert await _checkpoints(session) == {
+        transaction.account_number: (1, transaction.amount),
+    }
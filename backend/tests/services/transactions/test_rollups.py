@@ -0,0 +1,94 @@
+# ruff: noqa: PLR2004
+from decimal import Decimal
+import typing
+
+from sqlalchemy import update
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.transaction import (
+    Transaction,
+    TransactionDailyRollup,
+    TransactionStatus,
+)
+from models.user import User
+from schemas.transactions import TransactionCreate, TransactionUpdate
+from services.rollups import rebuild_rollups, verify_rollups
+from services.transactions import TransactionService
+
+
+async def _rollups(
+    session: AsyncSession,
+) -> dict[TransactionStatus, tuple[int, Decimal]]:
+    result = await session.exec(
+        select(TransactionDailyRollup).where(
+            col(TransactionDailyRollup.transactions_count) != 0,
+        ),
+    )
+    return {
+        rollup.status: (rollup.transactions_count, rollup.amount_sum)
+        for rollup in result.all()
+    }
+
+
+async def test_rollups_follow_writes(
+    session: AsyncSession,
+    user: User,
+    transaction: Transaction,
+) -> None:
+    service = TransactionService(session, user)
+    transaction_id = typing.cast(int, transaction.id)
+
+    batch = await service.create_transactions(
+        [TransactionCreate.model_validate(transaction.model_dump())] * 2,
+    )
+    assert await _rollups(session) == {
+        TransactionStatus.NEW: (3, Decimal(300)),
+    }
+
+    await service.update_transaction(
+        transaction_id,
+        TransactionUpdate(amount=Decimal(50)),
+    )
+    assert await _rollups(session) == {
+        TransactionStatus.NEW: (3, Decimal(250)),
+    }
+
+    await service.update_transactions_status(
+        {transaction_id},
+        TransactionStatus.CONFIRMED,
+    )
+    assert await _rollups(session) == {
+        TransactionStatus.NEW: (2, Decimal(200)),
+        TransactionStatus.CONFIRMED: (1, Decimal(50)),
+    }
+
+    await service.delete_transaction(typing.cast(int, batch.items[0].id))
+    assert await _rollups(session) == {
+        TransactionStatus.NEW: (1, Decimal(100)),
+        TransactionStatus.CONFIRMED: (1, Decimal(50)),
+        TransactionStatus.DELETED: (1, Decimal(100)),
+    }
+    assert await verify_rollups(session) == []
+
+
+async def test_rebuild_rollups(
+    session: AsyncSession,
+    transaction: Transaction,
+) -> None:
+    await session.execute(
+        update(TransactionDailyRollup).values(transactions_count=5),
+    )
+    await session.commit()
+
+    mismatches = await verify_rollups(session)
+    assert len(mismatches) == 1
+    assert mismatches[0]['expected_count'] == 1
+    assert mismatches[0]['stored_count'] == 5
+
+    await rebuild_rollups(session)
+
+    assert await verify_rollups(session) == []
+    assert await _rollups(session) == {
+        transaction.status: (1, transaction.amount),
+    }
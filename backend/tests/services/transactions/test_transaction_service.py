@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 import typing
 
-from fastapi import HTTPException
+from fastapi import HTTPException, status
 import pytest
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -101,3 +101,40 @@ async def test_delete_transaction_success(
     updated_transaction = await service.crud.get(transaction.id)
 
     assert updated_transaction.status == TransactionStatus.DELETED
+
+
+async def test_update_transaction_not_owner(
+    session: AsyncSession,
+    transaction: Transaction,
+    admin_user: User,
+    another_user: User,
+) -> None:
+    transaction_id = typing.cast(int, transaction.id)
+
+    # the ownership is checked before the editable fields
+    service = TransactionService(session, another_user)
+    update_data = TransactionUpdate(account_number='654321')
+    with pytest.raises(HTTPException) as exc_info:
+        await service.update_transaction(transaction_id, update_data)
+    assert exc_info.value.status_code == status.HTTP_403_FORBIDDEN
+
+    service = TransactionService(session, admin_user)
+    update_data = TransactionUpdate(comment='Updated by admin')
+    updated = await service.update_transaction(transaction_id, update_data)
+    assert updated.comment == 'Updated by admin'
+    assert updated.user_id == transaction.user_id
+
+
+async def test_update_transaction_not_found(
+    session: AsyncSession,
+    user: User,
+    transaction: Transaction,
+) -> None:
+    service = TransactionService(session, user)
+
+    update_data = TransactionUpdate(comment='Fail')
+    transaction_id = typing.cast(int, transaction.id) + 1
+    with pytest.raises(HTTPException) as exc_info:
+        await service.update_transaction(transaction_id, update_data)
+
+    assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND